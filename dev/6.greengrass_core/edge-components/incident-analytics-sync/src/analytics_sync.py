@@ -13,9 +13,9 @@ import time
 import logging
 import argparse
 import sqlite3
+import calendar
 from datetime import datetime, timedelta
-from collections import Counter
-from typing import Dict, List, Optional
+from typing import Dict, List
 
 # Add Greengrass IPC SDK
 from awsiot.greengrasscoreipc.clientv2 import GreengrassCoreIPCClientV2
@@ -25,7 +25,7 @@ from awsiot.greengrasscoreipc.model import QOS
 sys.path.insert(0, '/greengrass/v2/components/common')
 
 try:
-    from database import DatabaseManager, IncidentDAO, DeviceDAO
+    from database import DatabaseManager, IncidentDAO, ConfigurationDAO
 except ImportError:
     logging.error("Failed to import database modules. Ensure common components are deployed.")
     sys.exit(1)
@@ -37,6 +37,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Configuration key holding the end (Unix time) of the last published period
+WATERMARK_KEY = 'analytics_last_period_end'
+# Periods published from the rollups after downtime, at most
+MAX_CATCHUP_PERIODS = 24
+# Delay before retrying a failed publish
+RETRY_SECONDS = 60
+
+
+def _unix(value: datetime) -> int:
+    """Unix time of a naive UTC datetime"""
+    return calendar.timegm(value.utctimetuple())
+
 
 class IncidentAnalyticsSync:
     """
@@ -44,7 +56,8 @@ class IncidentAnalyticsSync:
     Runs continuously with configurable hourly intervals
     """
 
-    def __init__(self, site_id: str, topic_prefix: str, top_count: int = 10):
+    def __init__(self, site_id: str, topic_prefix: str, top_count: int = 10,
+                 incident_retention_days: int = 30):
         """
         Initialize analytics sync service
 
@@ -52,15 +65,18 @@ class IncidentAnalyticsSync:
             site_id: Site identifier (e.g., 'site-001')
             topic_prefix: MQTT topic prefix (e.g., 'aismc')
             top_count: Number of top affected devices to include
+            incident_retention_days: Keep resolved, synced raw incidents this
+                many days (0 keeps them forever; rollups are kept separately)
         """
         self.site_id = site_id
         self.topic_prefix = topic_prefix
         self.top_count = top_count
+        self.incident_retention_days = incident_retention_days
 
         # Initialize database
         self.db_manager = DatabaseManager()
         self.incident_dao = IncidentDAO(self.db_manager)
-        self.device_dao = DeviceDAO(self.db_manager)
+        self.config_dao = ConfigurationDAO(self.db_manager)
 
         # Initialize Greengrass IPC client
         try:
@@ -72,132 +88,55 @@ class IncidentAnalyticsSync:
 
         logger.info(f"Initialized IncidentAnalyticsSync for site: {site_id}")
 
-    def aggregate_incidents(self, since_timestamp: int) -> Optional[Dict]:
+    def aggregate_incidents(self, period_start: datetime, period_end: datetime) -> Dict:
         """
-        Aggregate incidents from SQLite since given timestamp
+        Aggregate incidents in a period from the rollup tables
+
+        Reads the minute/hour buckets maintained on incident insert/resolve
+        (IncidentDAO.get_rollup_summary), so the cost depends on the length
+        of the period, not on the number of incidents in it.
 
         Args:
-            since_timestamp: Unix timestamp
+            period_start: Start of aggregation period (naive UTC)
+            period_end: End of aggregation period (naive UTC, exclusive)
 
         Returns:
-            Aggregated incident statistics or None if no incidents
+            Aggregated incident statistics (zero counts if no incidents)
         """
-        try:
-            # Query incidents since timestamp
-            with self.db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-
-                query = """
-                    SELECT
-                        camera_id as device_id,
-                        severity,
-                        incident_type,
-                        'new' as status,
-                        detected_at as timestamp
-                    FROM incidents
-                    WHERE detected_at >= ?
-                    ORDER BY detected_at DESC
-                """
-
-                cursor.execute(query, (since_timestamp,))
-                incidents = cursor.fetchall()
-
-            if not incidents:
-                logger.info(f"No incidents found since {datetime.fromtimestamp(since_timestamp)}")
-                return None
-
-            # Convert to list of dicts
-            incident_list = []
-            for row in incidents:
-                incident_list.append({
-                    'device_id': row[0],
-                    'severity': row[1],
-                    'incident_type': row[2],
-                    'status': row[3],
-                    'timestamp': row[4]
-                })
-
-            # Count by severity
-            by_severity = Counter(i['severity'] for i in incident_list)
-
-            # Count by incident type
-            by_type = Counter(i['incident_type'] for i in incident_list)
-
-            # Count by status
-            by_status = Counter(i['status'] for i in incident_list)
-
-            # Count by device (for top affected)
-            device_counts = Counter(i['device_id'] for i in incident_list)
-            top_devices = [
-                {"device_id": dev_id, "incidents": count}
-                for dev_id, count in device_counts.most_common(self.top_count)
-            ]
-
-            # Get device details for aggregation by type and group
-            by_device_type = Counter()
-            by_host_group = Counter()
-
-            for incident in incident_list:
-                device = self.device_dao.get_by_id(incident['device_id'])
-                if device:
-                    # Count by device type
-                    device_type = device.get('device_type', 'unknown')
-                    by_device_type[device_type] += 1
-
-                    # Count by host groups (devices can be in multiple groups)
-                    host_groups_str = device.get('host_groups', '')
-                    if host_groups_str:
-                        # Parse host group IDs and count
-                        group_ids = host_groups_str.split(',')
-                        for group_id in group_ids:
-                            by_host_group[group_id] += 1
-
-            return {
-                "total": len(incident_list),
-                "new": sum(1 for i in incident_list if i['status'] == 'new'),
-                "recovered": sum(1 for i in incident_list if i['status'] == 'recovered'),
-                "ongoing": sum(1 for i in incident_list if i['status'] == 'ongoing'),
-                "by_severity": dict(by_severity),
-                "by_device_type": dict(by_device_type),
-                "by_incident_type": dict(by_type),
-                "by_host_group": dict(by_host_group),
-                "by_status": dict(by_status),
-                "top_affected_devices": top_devices
-            }
-
-        except Exception as e:
-            logger.error(f"Error aggregating incidents: {e}")
-            return None
-
-    def publish_summary(self, period_start: datetime, period_end: datetime):
+        summary = self.incident_dao.get_rollup_summary(
+            _unix(period_start), _unix(period_end), top_count=self.top_count
+        )
+
+        # new: detected in the period; recovered: resolved in the period,
+        # whenever they were detected. The rollups count resolutions by
+        # resolve time, so incidents still open are not reported
+        return {
+            "total": summary['total'],
+            "new": summary['total'],
+            "recovered": summary['resolved'],
+            "by_severity": summary['by_severity'],
+            "by_device_type": summary['by_device_type'],
+            "by_incident_type": summary['by_incident_type'],
+            "by_host_group": summary['by_host_group'],
+            "by_status": {"new": summary['total'], "recovered": summary['resolved']},
+            "top_affected_devices": summary['top_affected_devices']
+        }
+
+    def publish_summary(self, period_start: datetime, period_end: datetime) -> bool:
         """
         Publish incident analytics summary to AWS IoT Core
 
+        An empty summary is still published for monitoring.
+
         Args:
             period_start: Start of aggregation period
             period_end: End of aggregation period
+
+        Returns:
+            True if the summary was published
         """
         try:
-            since_timestamp = int(period_start.timestamp())
-
-            # Aggregate incidents
-            aggregates = self.aggregate_incidents(since_timestamp)
-
-            if not aggregates:
-                logger.info(f"No incidents in period {period_start} to {period_end}")
-                # Still publish empty summary for monitoring
-                aggregates = {
-                    "total": 0,
-                    "new": 0,
-                    "recovered": 0,
-                    "ongoing": 0,
-                    "by_severity": {},
-                    "by_device_type": {},
-                    "by_incident_type": {},
-                    "by_host_group": {},
-                    "by_status": {},
-                    "top_affected_devices": []
-                }
+            aggregates = self.aggregate_incidents(period_start, period_end)
 
             # Create summary message
             summary = {
@@ -224,9 +163,71 @@ class IncidentAnalyticsSync:
 
             logger.info(f"✅ Published analytics summary to {topic}")
             logger.info(f"   Incidents: {aggregates['total']} (new: {aggregates['new']}, recovered: {aggregates['recovered']})")
+            return True
 
         except Exception as e:
             logger.error(f"Error publishing summary: {e}")
+            return False
+
+    def pending_periods(self, now: datetime, interval: int) -> List[tuple]:
+        """
+        Complete periods not yet published, oldest first
+
+        Periods follow on from the stored watermark, so summaries missed
+        during downtime are published on restart (up to MAX_CATCHUP_PERIODS,
+        read from the rollups). Without a watermark the last interval is due.
+
+        Args:
+            now: Current time (naive UTC)
+            interval: Period length in seconds
+
+        Returns:
+            List of (period_start, period_end) datetimes
+        """
+        watermark = self.config_dao.get(WATERMARK_KEY)
+        if watermark and watermark.isdigit():
+            start = datetime.utcfromtimestamp(int(watermark))
+        else:
+            start = now.replace(second=0, microsecond=0) - timedelta(seconds=interval)
+
+        step = timedelta(seconds=interval)
+        earliest = now - step * MAX_CATCHUP_PERIODS
+        if start < earliest:
+            skipped = -((start - earliest) // step)
+            logger.warning(f"Skipping {skipped} analytics period(s) older than {MAX_CATCHUP_PERIODS} intervals")
+            start += step * skipped
+
+        periods = []
+        while start + step <= now:
+            periods.append((start, start + step))
+            start += step
+        return periods
+
+    def sync_once(self, interval: int) -> datetime:
+        """
+        Publish all pending periods, then prune old rollup buckets and
+        old raw incidents
+
+        Returns:
+            End of the next period (naive UTC)
+        """
+        now = datetime.utcnow()
+        for period_start, period_end in self.pending_periods(now, interval):
+            logger.info(f"Aggregating incidents from {period_start} to {period_end}")
+            if not self.publish_summary(period_start, period_end):
+                return now + timedelta(seconds=RETRY_SECONDS)
+            self.config_dao.set(WATERMARK_KEY, str(_unix(period_end)))
+
+        deleted = self.incident_dao.cleanup_old_rollups()
+        if deleted:
+            logger.info(f"Pruned {deleted} old rollup bucket(s)")
+        if self.incident_retention_days > 0:
+            deleted = self.incident_dao.cleanup_old_incidents(days=self.incident_retention_days)
+            if deleted:
+                logger.info(f"Deleted {deleted} incident(s) older than {self.incident_retention_days} days")
+
+        watermark = int(self.config_dao.get(WATERMARK_KEY) or _unix(now))
+        return datetime.utcfromtimestamp(watermark) + timedelta(seconds=interval)
 
     def run(self, interval: int):
         """
@@ -243,23 +244,19 @@ class IncidentAnalyticsSync:
 
         while True:
             try:
-                now = datetime.utcnow()
-                period_start = now - timedelta(seconds=interval)
-
-                logger.info(f"Aggregating incidents from {period_start} to {now}")
-
-                self.publish_summary(period_start, now)
+                next_end = self.sync_once(interval)
+                delay = max((next_end - datetime.utcnow()).total_seconds(), 1)
 
-                logger.info(f"Sleeping for {interval} seconds until next sync...")
-                time.sleep(interval)
+                logger.info(f"Sleeping for {delay:.0f} seconds until next sync...")
+                time.sleep(delay)
 
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal, shutting down...")
                 sys.exit(0)
             except Exception as e:
                 logger.error(f"Error in sync loop: {e}")
-                logger.info(f"Sleeping for {interval} seconds before retry...")
-                time.sleep(interval)
+                logger.info(f"Sleeping for {RETRY_SECONDS} seconds before retry...")
+                time.sleep(RETRY_SECONDS)
 
 
 def main():
@@ -269,6 +266,8 @@ def main():
     parser.add_argument('--interval', type=int, default=3600, help='Sync interval in seconds')
     parser.add_argument('--topic-prefix', default='aismc', help='MQTT topic prefix')
     parser.add_argument('--top-count', type=int, default=10, help='Number of top affected devices')
+    parser.add_argument('--incident-retention-days', type=int, default=30,
+                        help='Days to keep resolved, synced incidents (0 = forever)')
 
     args = parser.parse_args()
 
@@ -276,7 +275,8 @@ def main():
     sync = IncidentAnalyticsSync(
         site_id=args.site_id,
         topic_prefix=args.topic_prefix,
-        top_count=args.top_count
+        top_count=args.top_count,
+        incident_retention_days=args.incident_retention_days
     )
 
     sync.run(args.interval)
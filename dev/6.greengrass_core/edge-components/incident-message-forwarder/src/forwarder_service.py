@@ -6,18 +6,25 @@ Provides offline resilience with retry logic
 
 Component: com.aismc.IncidentMessageForwarder v1.0.0
 """
+import os
 import sys
 import json
 import time
+import socket
 import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 # Add DAO layer to path
 sys.path.insert(0, '/greengrass/v2/components/common')
 
-from database import DatabaseManager, IncidentDAO, MessageQueueDAO, ConfigurationDAO
-from database import CameraDAO, DeviceDAO
+from database import DatabaseManager, MessageQueueDAO, ConfigurationDAO, DataVersionWatcher
+from database.dao import OUTBOX_ENABLED_KEY
+from utils import encode_payload, pack_envelopes, ZSTD_AVAILABLE
 
 # Greengrass IPC for MQTT publish and Shadow update
 try:
@@ -40,6 +47,317 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for an IPC operation response
+IPC_TIMEOUT = 5.0
+# Seconds between statistics log lines
+STATS_INTERVAL = 100
+# Envelope modes: off (one message per payload), json (coalesced), gzip / zstd (coalesced, compressed)
+ENVELOPE_MODES = ('off', 'json', 'gzip', 'zstd')
+# Queue-to-cloud latency histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60, 300, 900)
+
+
+def incident_state(payload: Dict) -> Optional[tuple]:
+    """
+    (device_id, incident_id, status) of a queued payload, None if it names no device
+
+    Accepts flat payloads (device_id / incident_id / status) and the
+    NGSI-LD CameraIncident entities queued by the incident outbox.
+    """
+    if 'device_id' in payload:
+        return payload['device_id'], payload.get('incident_id'), payload.get('status', 'unknown')
+    device = payload.get('affectedDevice')
+    if not isinstance(device, dict) or not device.get('object'):
+        return None
+    # urn:ngsi-ld:<Type>:<id>
+    status = payload.get('status')
+    return (
+        device['object'].split(':', 3)[-1],
+        payload.get('id', '').split(':', 3)[-1] or None,
+        status.get('value', 'unknown') if isinstance(status, dict) else 'unknown'
+    )
+
+
+class ShadowUpdateAggregator:
+    """
+    Coalesces Device Shadow updates per device
+
+    report() only records the latest reported state of a device; a
+    background thread flushes the dirty devices together debounce seconds
+    after the first one became dirty (or at once when max_dirty devices
+    are waiting), so a flapping device costs one shadow update per flush
+    instead of one per incident. Intermediate states are dropped. Failed
+    updates are retried on the next flush unless a newer state arrived.
+    """
+
+    def __init__(self, flush: Callable[[List[tuple]], List[Optional[bool]]],
+                 debounce: float = 2.0, max_dirty: int = 100):
+        """
+        Initialize aggregator and start its flush thread
+
+        Args:
+            flush: Sends [(device_id, state)] and returns a result per update
+            debounce: Seconds to collect updates before flushing
+            max_dirty: Dirty devices that trigger an immediate flush
+        """
+        self._flush = flush
+        self.debounce = debounce
+        self.max_dirty = max_dirty
+
+        self._dirty = OrderedDict()  # device_id -> latest state
+        self._first_dirty_at = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._stats = {'reported': 0, 'superseded': 0, 'flushes': 0, 'updated': 0, 'failed': 0}
+
+        self._thread = threading.Thread(target=self._run, name='shadow-aggregator', daemon=True)
+        self._thread.start()
+
+    def report(self, device_id: str, state: Dict):
+        """Record the latest reported state of a device"""
+        with self._cond:
+            self._stats['reported'] += 1
+            if device_id in self._dirty:
+                self._stats['superseded'] += 1
+                del self._dirty[device_id]
+            elif not self._dirty:
+                self._first_dirty_at = time.monotonic()
+            self._dirty[device_id] = state
+            self._cond.notify()
+
+    def _run(self):
+        """Flush thread: wait for dirty devices, debounce, flush"""
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                deadline = self._first_dirty_at + self.debounce
+                while len(self._dirty) < self.max_dirty and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Shadow flush failed: {e}")
+
+    def flush(self) -> int:
+        """
+        Send the latest state of every dirty device
+
+        Returns:
+            Number of shadows updated
+        """
+        with self._cond:
+            if not self._dirty:
+                return 0
+            updates = list(self._dirty.items())
+            self._dirty.clear()
+
+        results = self._flush(updates)
+        failed = [update for update, result in zip(updates, results) if not result]
+
+        with self._cond:
+            # Retry failed updates unless a newer state was reported meanwhile
+            for device_id, state in failed:
+                if device_id not in self._dirty:
+                    if not self._dirty:
+                        self._first_dirty_at = time.monotonic()
+                    self._dirty[device_id] = state
+            self._stats['flushes'] += 1
+            self._stats['updated'] += len(updates) - len(failed)
+            self._stats['failed'] += len(failed)
+
+        if failed:
+            logger.warning(f"{len(failed)}/{len(updates)} shadow updates failed - will retry")
+        return len(updates) - len(failed)
+
+    def close(self):
+        """Stop the flush thread and flush what is left"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=IPC_TIMEOUT)
+        self.flush()
+
+    def stats(self) -> Dict:
+        """Get counters (reported, superseded, flushes, updated, failed) and dirty devices"""
+        with self._cond:
+            return {**self._stats, 'dirty': len(self._dirty)}
+
+
+class CircuitBreaker:
+    """
+    Stops publishing while IoT Core is unreachable
+
+    closed: publishes flow; failure_threshold consecutive failures open it.
+    open: nothing is published until probe_interval seconds have passed.
+    half_open: a single caller publishes one probe message; success closes
+    the breaker, failure opens it for another probe_interval.
+
+    Thread-safe, so the workers of one process share it (one uplink).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, probe_interval: float = 30.0):
+        """
+        Initialize breaker (closed)
+
+        Args:
+            failure_threshold: Consecutive publish failures that open the breaker
+            probe_interval: Seconds between probes while open
+        """
+        self.failure_threshold = max(failure_threshold, 1)
+        self.probe_interval = probe_interval
+
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._stats = {'opened': 0, 'probes': 0, 'rejected': 0}
+        self._open_seconds = 0.0
+
+    def allow(self) -> str:
+        """
+        Decide whether the caller may publish
+
+        Returns:
+            CLOSED: publish normally; HALF_OPEN: publish one probe message
+            (only one caller gets it); OPEN: do not publish
+        """
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() >= self._probe_at:
+                self.state = self.HALF_OPEN
+                self._stats['probes'] += 1
+                return self.HALF_OPEN
+            if self.state != self.CLOSED:
+                self._stats['rejected'] += 1
+                return self.OPEN
+            return self.CLOSED
+
+    def cancel_probe(self):
+        """Give back an unused probe (nothing to publish); the next caller may probe"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._probe_at = time.monotonic()
+
+    def record(self, success: bool):
+        """Record the outcome of one publish"""
+        with self._lock:
+            now = time.monotonic()
+            if success:
+                self._failures = 0
+                if self.state != self.CLOSED:
+                    outage = now - self._opened_at
+                    self._open_seconds += outage
+                    self.state = self.CLOSED
+                    logger.info(f"Circuit breaker closed - IoT Core reachable again after {outage:.0f}s")
+                return
+
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                if self.state == self.CLOSED:
+                    self._opened_at = now
+                    self._stats['opened'] += 1
+                    logger.warning(f"Circuit breaker opened after {self._failures} consecutive publish "
+                                   f"failures - probing every {self.probe_interval:.0f}s")
+                self.state = self.OPEN
+                self._probe_at = now + self.probe_interval
+
+    @property
+    def is_open(self) -> bool:
+        """True while publishing is paused (open or probing)"""
+        return self.state != self.CLOSED
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is due (0 unless open)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(self._probe_at - time.monotonic(), 0.0)
+
+    def stats(self) -> Dict:
+        """Breaker state and counters"""
+        with self._lock:
+            open_seconds = self._open_seconds
+            if self.state != self.CLOSED:
+                open_seconds += time.monotonic() - self._opened_at
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'open_seconds': round(open_seconds, 1),
+                'next_probe_in': round(max(self._probe_at - time.monotonic(), 0.0), 1)
+                if self.state == self.OPEN else 0.0,
+                **self._stats
+            }
+
+
+class LatencyHistogram:
+    """
+    Queue-to-cloud latency of sent messages, in LATENCY_BUCKETS
+
+    Latency runs from the message's created_at (enqueue, one-second
+    resolution) to the publish acknowledgement. Thread-safe, so the workers
+    of one lane share it.
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram
+
+        Args:
+            buckets: Ascending bucket upper bounds in seconds (plus an overflow bucket)
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, seconds: float):
+        """Record one latency"""
+        seconds = max(float(seconds), 0.0)
+        with self._lock:
+            self._counts[bisect_left(self.buckets, seconds)] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+
+    def _quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile q (max if it overflows); lock held"""
+        rank = q * self._count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if count and seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else round(self._max, 1)
+        return None
+
+    def stats(self) -> Dict:
+        """Count, average, max, bucketed p50/p95/p99 and per-bucket counts"""
+        with self._lock:
+            buckets = {f"le_{bound}": count for bound, count in zip(self.buckets, self._counts)}
+            buckets['inf'] = self._counts[-1]
+            return {
+                'count': self._count,
+                'avg': round(self._sum / self._count, 1) if self._count else 0.0,
+                'max': round(self._max, 1),
+                'p50': self._quantile(0.50),
+                'p95': self._quantile(0.95),
+                'p99': self._quantile(0.99),
+                'buckets': buckets
+            }
+
 
 class IncidentMessageForwarder:
     """
@@ -47,26 +365,70 @@ class IncidentMessageForwarder:
     Handles retry logic and offline resilience
     """
 
-    def __init__(self, site_id: str = "site-001", poll_interval: int = 10):
+    def __init__(self, site_id: str = "site-001", poll_interval: int = 10,
+                 batch_size: int = 100, max_in_flight: int = 20,
+                 min_poll_interval: float = 1.0, envelope: str = 'off',
+                 envelope_max_bytes: int = 5120, lease_seconds: int = 60,
+                 worker_id: Optional[str] = None, shadow_debounce: float = 2.0,
+                 shadow_max_dirty: int = 100,
+                 shadow_aggregator: Optional[ShadowUpdateAggregator] = None,
+                 breaker_threshold: int = 5, breaker_probe_interval: float = 30.0,
+                 circuit_breaker: Optional[CircuitBreaker] = None, lane: str = 'all',
+                 min_priority: Optional[int] = None, max_priority: Optional[int] = None,
+                 latency_histogram: Optional[LatencyHistogram] = None):
         """
         Initialize the forwarder service
 
         Args:
             site_id: Site identifier for MQTT topic routing
-            poll_interval: Seconds between queue polls
+            poll_interval: Max seconds between queue polls when idle
+            batch_size: Max messages read from the queue per cycle
+            max_in_flight: Max IPC publish/shadow operations awaiting a response
+            min_poll_interval: First idle delay; doubles per empty poll up to poll_interval
+            envelope: One of ENVELOPE_MODES; coalesced modes need a cloud consumer
+                that decodes with utils.envelope.decode_envelope
+            envelope_max_bytes: Size budget per coalesced MQTT message
+            lease_seconds: Seconds a claimed batch stays leased to this worker;
+                must exceed the time to publish a batch
+            worker_id: Worker name stored with claims (default host:pid)
+            shadow_debounce: Seconds shadow updates are coalesced before a flush
+            shadow_max_dirty: Devices with pending shadow updates that force a flush
+            shadow_aggregator: Aggregator shared with other workers (default: own)
+            breaker_threshold: Consecutive publish failures that pause publishing
+            breaker_probe_interval: Seconds between single-message probes while paused
+            circuit_breaker: Breaker shared with other workers (default: own)
+            lane: Name of the priority lane this worker drains (statistics and logs)
+            min_priority: Only claim messages with priority >= this (None: no bound)
+            max_priority: Only claim messages with priority <= this (None: no bound)
+            latency_histogram: Histogram shared with the lane's other workers (default: own)
         """
         self.site_id = site_id
         self.poll_interval = poll_interval
-        self.max_retries = 5
-        self.batch_size = 10
+        self.min_poll_interval = min(min_poll_interval, poll_interval)
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lane = lane
+        self.min_priority = min_priority
+        self.max_priority = max_priority
+        self.latency = latency_histogram or LatencyHistogram()
+        self.last_batch_failed = False
+
+        if envelope not in ENVELOPE_MODES:
+            raise ValueError(f"envelope must be one of {ENVELOPE_MODES}, got {envelope!r}")
+        if envelope == 'zstd' and not ZSTD_AVAILABLE:
+            logger.warning("zstandard package not installed - using gzip envelopes")
+            envelope = 'gzip'
+        self.envelope = envelope
+        self.envelope_max_bytes = envelope_max_bytes
 
         # Initialize database
         self.db_manager = DatabaseManager()
-        self.incident_dao = IncidentDAO(self.db_manager)
         self.message_queue_dao = MessageQueueDAO(self.db_manager)
         self.config_dao = ConfigurationDAO(self.db_manager)
-        self.camera_dao = CameraDAO(self.db_manager)
-        self.device_dao = DeviceDAO(self.db_manager)
+        # Wakes the idle loop when a producer commits (e.g. enqueues a message)
+        self.change_watcher = DataVersionWatcher(self.db_manager.db_path)
 
         # Get site_id from config if available
         configured_site_id = self.config_dao.get('site_id')
@@ -87,156 +449,287 @@ class IncidentMessageForwarder:
                 logger.error(f"Failed to connect to Greengrass IPC: {e}")
                 self.ipc_client = None
 
+        # Device Shadow updates, coalesced per device
+        self.shadow_aggregator = shadow_aggregator or ShadowUpdateAggregator(
+            lambda updates: self._pipeline(self._start_shadow_update, updates),
+            debounce=shadow_debounce, max_dirty=shadow_max_dirty
+        )
+
+        # Pauses publishing while IoT Core is unreachable
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=breaker_threshold, probe_interval=breaker_probe_interval
+        )
+
         logger.info(f"Initialized IncidentMessageForwarder for site: {self.site_id}")
         logger.info(f"MQTT Topic: {self.incident_topic}")
         logger.info(f"Poll interval: {self.poll_interval}s")
 
-    def publish_to_iot_core(self, topic: str, payload: Dict) -> bool:
+    def _start_publish(self, message: tuple):
+        """Activate a PublishToIoTCore operation for (topic, encoded payload); returns its response future"""
+        topic, payload = message
+        request = PublishToIoTCoreRequest()
+        request.topic_name = topic
+        request.payload = payload
+        request.qos = QOS.AT_LEAST_ONCE
+
+        operation = self.ipc_client.new_publish_to_iot_core()
+        operation.activate(request)
+        return operation.get_response()
+
+    def _start_shadow_update(self, update: tuple):
+        """Activate an UpdateThingShadow operation for (device_id, state); returns its response future"""
+        device_id, state = update
+        request = UpdateThingShadowRequest()
+        request.thing_name = f"GreengrassCore-{self.site_id}-hanoi"
+        request.shadow_name = device_id
+        request.payload = json.dumps({"state": {"reported": state}}).encode('utf-8')
+
+        operation = self.ipc_client.new_update_thing_shadow()
+        operation.activate(request)
+        return operation.get_response()
+
+    def _pipeline(self, start: Callable, items: List,
+                  breaker: Optional[CircuitBreaker] = None) -> List[Optional[bool]]:
         """
-        Publish message to AWS IoT Core via MQTT
+        Run IPC operations with up to max_in_flight awaiting a response
+
+        A new operation is activated as soon as one in flight completes, so
+        throughput is bound by the window and the round trip rather than by
+        one round trip per item. If no operation completes within IPC_TIMEOUT
+        the window is stalled (nucleus or connection down) and the remaining
+        items are not started; the same happens once the breaker opens.
 
         Args:
-            topic: MQTT topic
-            payload: Message payload (will be JSON encoded)
+            start: Activates the operation for one item, returns its response future
+            items: Items to pass to start
+            breaker: Circuit breaker that records every outcome
 
         Returns:
-            True if successful, False otherwise
+            Per item: True on success, False on error/timeout, None if not started
         """
-        if not self.ipc_client:
-            logger.warning("IPC client not available - cannot publish")
-            return False
-
-        try:
-            request = PublishToIoTCoreRequest()
-            request.topic_name = topic
-            request.payload = json.dumps(payload).encode('utf-8')
-            request.qos = QOS.AT_LEAST_ONCE
-
-            operation = self.ipc_client.new_publish_to_iot_core()
-            operation.activate(request)
-            future = operation.get_response()
-            future.result(timeout=5.0)
-
-            logger.info(f"✅ Published to IoT Core: {topic}")
-            return True
-
-        except Exception as e:
-            logger.error(f"Failed to publish to IoT Core: {e}")
-            return False
-
-    def update_shadow(self, device_id: str, state: Dict) -> bool:
+        results: List[Optional[bool]] = [None] * len(items)
+        in_flight = {}
+
+        def finish(index, success):
+            results[index] = success
+            if breaker is not None:
+                breaker.record(success)
+
+        def collect(done):
+            for future in done:
+                index = in_flight.pop(future)
+                error = future.exception()
+                finish(index, error is None)
+                if error is not None:
+                    logger.error(f"IPC operation failed: {error}")
+
+        for index, item in enumerate(items):
+            if len(in_flight) >= self.max_in_flight:
+                done, _ = wait(in_flight, timeout=IPC_TIMEOUT, return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.warning(f"No IPC response in {IPC_TIMEOUT}s - deferring {len(items) - index} item(s)")
+                    break
+                collect(done)
+            if breaker is not None and breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"Circuit breaker open - deferring {len(items) - index} item(s)")
+                break
+            try:
+                in_flight[start(item)] = index
+            except Exception as e:
+                logger.error(f"Failed to start IPC operation: {e}")
+                finish(index, False)
+
+        done, not_done = wait(in_flight, timeout=IPC_TIMEOUT)
+        collect(done)
+        for future in not_done:
+            finish(in_flight.pop(future), False)
+            future.cancel()
+        if not_done:
+            logger.error(f"{len(not_done)} IPC operation(s) timed out after {IPC_TIMEOUT}s")
+        return results
+
+    def publish_many(self, messages: List[tuple]) -> List[Optional[bool]]:
         """
-        Update Device Shadow with reported state
+        Publish messages to AWS IoT Core, pipelined (see _pipeline),
+        through the circuit breaker
 
         Args:
-            device_id: Device identifier
-            state: State to report
+            messages: List of (topic, encoded payload bytes) tuples
 
         Returns:
-            True if successful, False otherwise
+            Per message: True if published, False if failed, None if not attempted
         """
         if not self.ipc_client:
-            logger.warning("IPC client not available - cannot update shadow")
-            return False
-
-        try:
-            shadow_payload = {
-                "state": {
-                    "reported": state
-                }
-            }
+            logger.warning("IPC client not available - cannot publish")
+            return [None] * len(messages)
+        return self._pipeline(self._start_publish, messages, self.circuit_breaker)
 
-            request = UpdateThingShadowRequest()
-            request.thing_name = f"GreengrassCore-{self.site_id}-hanoi"
-            request.shadow_name = device_id
-            request.payload = json.dumps(shadow_payload).encode('utf-8')
+    def encode_messages(self, messages: List[tuple]) -> tuple:
+        """
+        Encode queued (topic, payload) messages for publishing
 
-            operation = self.ipc_client.new_update_thing_shadow()
-            operation.activate(request)
-            future = operation.get_response()
-            future.result(timeout=5.0)
+        With envelopes enabled, messages for the same topic are coalesced
+        (in queue order) into envelopes of at most envelope_max_bytes.
 
-            logger.info(f"✅ Updated shadow for device: {device_id}")
-            return True
+        Args:
+            messages: List of (topic, payload dict) tuples
 
-        except Exception as e:
-            logger.error(f"Failed to update shadow: {e}")
-            return False
+        Returns:
+            ([(topic, encoded bytes)], [indexes of the messages in each])
+        """
+        if self.envelope == 'off':
+            return ([(topic, encode_payload(payload)) for topic, payload in messages],
+                    [[index] for index in range(len(messages))])
+
+        by_topic = {}
+        for index, (topic, _) in enumerate(messages):
+            by_topic.setdefault(topic, []).append(index)
+
+        compression = None if self.envelope == 'json' else self.envelope
+        encoded, members = [], []
+        for topic, indexes in by_topic.items():
+            for group, data in pack_envelopes([messages[i][1] for i in indexes],
+                                              self.envelope_max_bytes, compression):
+                encoded.append((topic, data))
+                members.append([indexes[i] for i in group])
+        return encoded, members
 
     def process_pending_messages(self) -> int:
         """
         Process pending messages from queue
 
+        The batch is claimed atomically (leased to this worker, so parallel
+        workers never publish the same message), published pipelined,
+        acknowledged messages are marked sent in one UPDATE, then the device
+        states are handed to the shadow aggregator. Failed messages are rescheduled
+        with backoff in one UPDATE (dead-lettered at max attempts), messages that were
+        not attempted are released; a worker that dies leaves its claims to lease recovery.
+        Sets last_batch_failed if any message of the batch was not published.
+
+        While the circuit breaker is open nothing is claimed, except a single
+        probe message per probe interval, and failures that opened it are
+        released without counting an attempt, so an outage does not use up
+        retry budgets. A failed probe does count an attempt: the probe is the
+        oldest top-priority message, so a message that can never be published
+        would otherwise be probed forever instead of backing off and being
+        dead-lettered.
+
         Returns:
             Number of messages successfully processed
         """
+        self.last_batch_failed = False
+        breaker = self.circuit_breaker.allow()
+        if breaker == CircuitBreaker.OPEN:
+            return 0
         try:
-            # Get pending messages
-            pending = self.message_queue_dao.get_pending(limit=self.batch_size)
+            # Claim pending messages (skips messages at max_attempts); one probe while half open
+            pending = self.message_queue_dao.claim_pending(
+                limit=1 if breaker == CircuitBreaker.HALF_OPEN else self.batch_size,
+                lease_seconds=self.lease_seconds, worker_id=self.worker_id,
+                min_priority=self.min_priority, max_priority=self.max_priority
+            )
 
             if not pending:
+                if breaker == CircuitBreaker.HALF_OPEN:
+                    self.circuit_breaker.cancel_probe()
                 return 0
 
             logger.info(f"Processing {len(pending)} pending messages...")
 
-            processed = 0
+            batch = []
             for msg in pending:
-                # Check retry limit
-                if msg['retry_count'] >= self.max_retries:
-                    logger.warning(f"Message {msg['message_id']} exceeded max retries - skipping")
-                    continue
-
                 try:
-                    # Parse payload
-                    payload = json.loads(msg['payload'])
-
-                    # Publish to MQTT
-                    success = self.publish_to_iot_core(msg['topic'], payload)
-
-                    if success:
-                        # Mark as sent
-                        self.message_queue_dao.mark_sent(msg['message_id'])
-
-                        # Update shadow if device_id present
-                        if 'device_id' in payload:
-                            device_state = {
-                                "last_incident": payload.get('incident_id'),
-                                "last_update": datetime.utcnow().isoformat() + 'Z',
-                                "status": payload.get('status', 'unknown')
-                            }
-                            self.update_shadow(payload['device_id'], device_state)
-
-                        processed += 1
-                        logger.info(f"✅ Processed message {msg['message_id']}")
+                    batch.append((msg['message_id'], msg['topic'], json.loads(msg['payload'])))
+                except ValueError as e:
+                    logger.error(f"Invalid payload in message {msg['message_id']}: {e}")
+                    # Retrying cannot fix a malformed payload
+                    self.message_queue_dao.dead_letter([msg['message_id']], f"Invalid payload: {e}")
+
+            encoded, members = self.encode_messages([(topic, payload) for _, topic, payload in batch])
+            published = self.publish_many(encoded)
+            if breaker == CircuitBreaker.HALF_OPEN and all(result is None for result in published):
+                self.circuit_breaker.cancel_probe()
+            self.last_batch_failed = not all(published)
+
+            # An envelope's result applies to every message in it
+            results = [None] * len(batch)
+            for indexes, result in zip(members, published):
+                for index in indexes:
+                    results[index] = result
+            if len(encoded) < len(batch):
+                logger.info(f"Coalesced {len(batch)} messages into {len(encoded)} {self.envelope} envelope(s)")
+
+            created = {msg['message_id']: msg['created_at'] for msg in pending}
+            now = datetime.utcnow()
+            sent, failed, unattempted = [], [], []
+            for (message_id, _, payload), result in zip(batch, results):
+                if result:
+                    sent.append((message_id, payload))
+                    try:
+                        self.latency.observe((now - datetime.fromisoformat(created[message_id])).total_seconds())
+                    except (TypeError, ValueError):
+                        pass
+                elif result is False:
+                    failed.append(message_id)
+                else:
+                    unattempted.append(message_id)
+            if failed and self.circuit_breaker.is_open and breaker != CircuitBreaker.HALF_OPEN:
+                # Uplink down: not the messages' fault, keep their retry budget
+                unattempted.extend(failed)
+                logger.warning(f"IoT Core unreachable - returning {len(failed)} failed message(s) without an attempt")
+            elif failed:
+                # One UPDATE; each message retries after its own backoff
+                self.message_queue_dao.increment_attempts(failed, "Publish failed")
+                logger.warning(f"Failed to publish {len(failed)} message(s) - will retry after backoff")
+            if unattempted:
+                self.message_queue_dao.release(unattempted)
+
+            if not sent:
+                return 0
 
-                    else:
-                        # Increment retry count
-                        self.message_queue_dao.increment_attempt(msg['message_id'])
-                        logger.warning(f"Failed to publish message {msg['message_id']} - will retry")
+            # Mark as sent
+            self.message_queue_dao.mark_sent_many([message_id for message_id, _ in sent])
+            logger.info(f"✅ Published {len(sent)}/{len(pending)} messages")
 
-                except Exception as e:
-                    logger.error(f"Error processing message {msg['message_id']}: {e}")
-                    self.message_queue_dao.increment_attempt(msg['message_id'])
+            # Update shadow if the payload names a device (latest state per device wins)
+            last_update = datetime.utcnow().isoformat() + 'Z'
+            for _, payload in sent:
+                state = incident_state(payload)
+                if state:
+                    device_id, incident_id, status = state
+                    self.shadow_aggregator.report(device_id, {
+                        "last_incident": incident_id,
+                        "last_update": last_update,
+                        "status": status
+                    })
 
-            return processed
+            return len(sent)
 
         except Exception as e:
             logger.error(f"Error in process_pending_messages: {e}")
+            if breaker == CircuitBreaker.HALF_OPEN:
+                self.circuit_breaker.cancel_probe()
+            self.last_batch_failed = True
             return 0
 
     def get_statistics(self) -> Dict:
         """Get forwarder statistics"""
         try:
             pending = self.message_queue_dao.get_pending_count()
-            failed = self.message_queue_dao.get_failed_count(self.max_retries)
+            failed = self.message_queue_dao.get_failed_count()
+            inflight = self.message_queue_dao.get_inflight_count()
 
             return {
                 "pending_messages": pending,
+                "inflight_messages": inflight,
                 "failed_messages": failed,
-                "max_retries": self.max_retries,
                 "poll_interval": self.poll_interval,
                 "site_id": self.site_id,
-                "ipc_connected": self.ipc_client is not None
+                "ipc_connected": self.ipc_client is not None,
+                "shadow_updates": self.shadow_aggregator.stats(),
+                "circuit_breaker": self.circuit_breaker.stats(),
+                "lane": self.lane,
+                "latency": self.latency.stats()
             }
         except Exception as e:
             logger.error(f"Error getting statistics: {e}")
@@ -245,33 +738,70 @@ class IncidentMessageForwarder:
     def run(self):
         """
         Main service loop - poll and process messages
+
+        Full batches are drained back to back. Otherwise the loop waits
+        min_poll_interval, doubling per empty poll up to poll_interval, and
+        wakes as soon as another connection commits to the database (a
+        producer enqueueing a message), so new messages go out within
+        ~100 ms instead of the next fixed poll. After a failed batch it
+        sleeps the full delay without waking, so new messages do not burn
+        retries while IoT Core is unreachable.
         """
         logger.info("="*70)
         logger.info("  Incident Message Forwarder Service")
         logger.info("="*70)
         logger.info(f"  Site ID: {self.site_id}")
+        logger.info(f"  Worker: {self.worker_id} (lease {self.lease_seconds}s)")
+        logger.info(f"  Lane: {self.lane} (priority {self.min_priority if self.min_priority is not None else '-'}"
+                    f"..{self.max_priority if self.max_priority is not None else '-'})")
         logger.info(f"  MQTT Topic: {self.incident_topic}")
-        logger.info(f"  Poll Interval: {self.poll_interval}s")
+        logger.info(f"  Poll Interval: {self.min_poll_interval}-{self.poll_interval}s (adaptive)")
         logger.info(f"  Batch Size: {self.batch_size}")
-        logger.info(f"  Max Retries: {self.max_retries}")
+        logger.info(f"  Max In Flight: {self.max_in_flight}")
+        logger.info(f"  Envelope: {self.envelope} (max {self.envelope_max_bytes} bytes)")
+        logger.info(f"  Circuit Breaker: open after {self.circuit_breaker.failure_threshold} failures, "
+                    f"probe every {self.circuit_breaker.probe_interval:.0f}s")
         logger.info(f"  IPC Connected: {self.ipc_client is not None}")
         logger.info("="*70)
 
-        iteration = 0
+        # Incident inserts/resolves queue their messages from now on
+        try:
+            self.config_dao.set(OUTBOX_ENABLED_KEY, 'true')
+            logger.info("Incident outbox enabled")
+        except Exception as e:
+            logger.error(f"Failed to enable incident outbox: {e}")
+
+        idle_delay = self.min_poll_interval
+        next_stats = time.monotonic() + STATS_INTERVAL
         while True:
             try:
-                iteration += 1
+                # Baseline before reading the queue, so a commit made while
+                # processing wakes the next wait
+                self.change_watcher.changed()
 
                 # Process pending messages
                 processed = self.process_pending_messages()
 
-                # Log statistics every 10 iterations
-                if iteration % 10 == 0:
+                if time.monotonic() >= next_stats:
                     stats = self.get_statistics()
                     logger.info(f"Statistics: {json.dumps(stats, indent=2)}")
+                    next_stats = time.monotonic() + STATS_INTERVAL
+
+                if processed:
+                    idle_delay = self.min_poll_interval
+                    # A full batch means a backlog (e.g. after an outage): drain it without waiting
+                    if processed >= self.batch_size:
+                        continue
 
                 # Wait before next poll
-                time.sleep(self.poll_interval)
+                if self.circuit_breaker.is_open:
+                    # IoT Core unreachable: nothing to do until the next probe is due
+                    time.sleep(max(self.circuit_breaker.retry_in(), self.min_poll_interval))
+                elif self.last_batch_failed:
+                    time.sleep(idle_delay)
+                else:
+                    self.change_watcher.wait(idle_delay)
+                idle_delay = min(idle_delay * 2, self.poll_interval)
 
             except KeyboardInterrupt:
                 logger.info("Shutting down gracefully...")
@@ -280,6 +810,9 @@ class IncidentMessageForwarder:
                 logger.error(f"Error in main loop: {e}")
                 time.sleep(self.poll_interval)
 
+        self.change_watcher.close()
+        self.shadow_aggregator.close()
+
 
 def main():
     """Main entry point"""
@@ -287,19 +820,89 @@ def main():
 
     parser = argparse.ArgumentParser(description='Incident Message Forwarder Service')
     parser.add_argument('--site-id', default='site-001', help='Site identifier')
-    parser.add_argument('--poll-interval', type=int, default=10, help='Poll interval in seconds')
-    parser.add_argument('--batch-size', type=int, default=10, help='Batch size for processing')
+    parser.add_argument('--poll-interval', type=int, default=10,
+                        help='Max poll interval in seconds when idle')
+    parser.add_argument('--min-poll-interval', type=float, default=1.0,
+                        help='Idle poll interval right after activity (doubles up to --poll-interval)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Batch size for processing')
+    parser.add_argument('--max-in-flight', type=int, default=20,
+                        help='Max concurrent IoT Core publish operations')
+    parser.add_argument('--envelope', choices=ENVELOPE_MODES, default='off',
+                        help='Coalesce messages per topic into (compressed) envelopes')
+    parser.add_argument('--envelope-max-bytes', type=int, default=5120,
+                        help='Size budget per coalesced MQTT message')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Forwarder loops draining the queue in parallel (claims never overlap)')
+    parser.add_argument('--lease-seconds', type=int, default=60,
+                        help='Seconds a claimed batch stays leased to its worker')
+    parser.add_argument('--shadow-debounce', type=float, default=2.0,
+                        help='Seconds shadow updates are coalesced per device before sending')
+    parser.add_argument('--shadow-max-dirty', type=int, default=100,
+                        help='Devices with pending shadow updates that force an immediate flush')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='Consecutive publish failures that pause publishing (circuit breaker)')
+    parser.add_argument('--breaker-probe-interval', type=float, default=30.0,
+                        help='Seconds between single-message probes while publishing is paused')
+    parser.add_argument('--critical-max-priority', type=int, default=1,
+                        help='Messages with priority <= this (1 = critical incidents) use the critical lane')
+    parser.add_argument('--critical-batch-size', type=int, default=20,
+                        help='Batch size of the critical lane')
+    parser.add_argument('--critical-max-in-flight', type=int, default=5,
+                        help='Max concurrent publishes of the critical lane (0 disables the lane)')
+    parser.add_argument('--critical-poll-interval', type=float, default=1.0,
+                        help='Max poll interval of the critical lane in seconds')
 
     args = parser.parse_args()
 
-    # Create and run forwarder
-    forwarder = IncidentMessageForwarder(
-        site_id=args.site_id,
-        poll_interval=args.poll_interval
-    )
-    forwarder.batch_size = args.batch_size
-
-    forwarder.run()
+    # Create and run forwarders; each worker claims its own batches and all
+    # share the first worker's shadow aggregator and circuit breaker.
+    # With the critical lane enabled, one more worker claims only critical
+    # messages with its own batch size, in-flight budget and short poll
+    # interval, so they never wait behind a routine backlog
+    critical_lane = args.critical_max_in_flight > 0
+    routine = {
+        'lane': 'normal' if critical_lane else 'all',
+        'min_priority': args.critical_max_priority + 1 if critical_lane else None,
+        'batch_size': args.batch_size,
+        'max_in_flight': args.max_in_flight,
+        'poll_interval': args.poll_interval,
+        'min_poll_interval': args.min_poll_interval
+    }
+    lanes = [routine] * max(args.workers, 1)
+    if critical_lane:
+        lanes.append({
+            'lane': 'critical',
+            'max_priority': args.critical_max_priority,
+            'batch_size': args.critical_batch_size,
+            'max_in_flight': args.critical_max_in_flight,
+            'poll_interval': args.critical_poll_interval,
+            'min_poll_interval': min(args.min_poll_interval, args.critical_poll_interval)
+        })
+
+    workers = []
+    for index, lane in enumerate(lanes):
+        # Workers of one lane share its latency histogram
+        peer = next((worker for worker in workers if worker.lane == lane['lane']), None)
+        suffix = ':critical' if lane['lane'] == 'critical' else ''
+        workers.append(IncidentMessageForwarder(
+            site_id=args.site_id,
+            envelope=args.envelope,
+            envelope_max_bytes=args.envelope_max_bytes,
+            lease_seconds=args.lease_seconds,
+            worker_id=f"{socket.gethostname()}:{os.getpid()}:{index}{suffix}",
+            shadow_debounce=args.shadow_debounce,
+            shadow_max_dirty=args.shadow_max_dirty,
+            shadow_aggregator=workers[0].shadow_aggregator if workers else None,
+            breaker_threshold=args.breaker_threshold,
+            breaker_probe_interval=args.breaker_probe_interval,
+            circuit_breaker=workers[0].circuit_breaker if workers else None,
+            latency_histogram=peer.latency if peer else None,
+            **lane
+        ))
+    for worker in workers[1:]:
+        threading.Thread(target=worker.run, name=worker.worker_id, daemon=True).start()
+
+    workers[0].run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Test suite for IncidentMessageForwarder
+Tests the circuit breaker (fake clock), shadow update coalescing, the
+latency histogram and circuit breaker probes against a fake Greengrass
+IPC client
+
+Runs on a copy of the database, so queued messages written by the tests
+never touch the deployed data:
+
+    python3 test_forwarder_service.py [/var/greengrass/database/greengrass.db]
+"""
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import Future
+from uuid import uuid4
+
+# DAO layer from the repository, then the component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'edge-database', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from database import DatabaseManager
+import forwarder_service
+from forwarder_service import (
+    CircuitBreaker,
+    IncidentMessageForwarder,
+    LatencyHistogram
+)
+
+DEFAULT_DB_PATH = "/var/greengrass/database/greengrass.db"
+
+
+def log_test(message: str, status: str = "INFO"):
+    """Log test output with color"""
+    colors = {
+        "INFO": "\033[0;36m",     # Cyan
+        "SUCCESS": "\033[0;32m",   # Green
+        "ERROR": "\033[0;31m",     # Red
+        "RESET": "\033[0m"
+    }
+    color = colors.get(status, colors["INFO"])
+    print(f"{color}[{status}]{colors['RESET']} {message}")
+
+
+class FakeClock:
+    """Stands in for the time module in forwarder_service: monotonic() only moves on advance()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class FakeRequest:
+    """Stands in for the awsiot request models when the SDK is not installed"""
+
+
+class FakeOperation:
+    """IPC operation whose response future completes on activate()"""
+
+    def __init__(self, client):
+        self.client = client
+        self.future = Future()
+
+    def activate(self, request):
+        with self.client.lock:
+            self.client.requests.append(request)
+        if self.client.reject(request):
+            self.future.set_exception(RuntimeError("Publish rejected"))
+        else:
+            self.future.set_result(None)
+
+    def get_response(self):
+        return self.future
+
+
+class FakeIPCClient:
+    """
+    Stands in for the Greengrass IPC client: records every publish and
+    shadow update request; reject(request) decides which ones fail
+    """
+
+    def __init__(self, reject=lambda request: False):
+        self.reject = reject
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def new_publish_to_iot_core(self):
+        return FakeOperation(self)
+
+    def new_update_thing_shadow(self):
+        return FakeOperation(self)
+
+    def shadow_updates(self) -> list:
+        """(device_id, reported state) of every shadow update request"""
+        with self.lock:
+            return [(request.shadow_name, json.loads(request.payload)['state']['reported'])
+                    for request in self.requests if hasattr(request, 'shadow_name')]
+
+
+def copy_database(source_path: str) -> str:
+    """Copy the database (consistent online backup) to a temporary file"""
+    target_path = os.path.join(tempfile.mkdtemp(prefix='forwarder-test-'), 'greengrass.db')
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    return target_path
+
+
+def make_forwarder(client: FakeIPCClient, **kwargs) -> IncidentMessageForwarder:
+    """Forwarder wired to the fake IPC client"""
+    forwarder = IncidentMessageForwarder(**kwargs)
+    forwarder.ipc_client = client
+    return forwarder
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    """Poll condition() until it holds or timeout seconds have passed"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_circuit_breaker():
+    """closed -> open -> half_open -> closed on a fake clock, and cancel_probe"""
+    log_test("Testing CircuitBreaker...")
+
+    clock = FakeClock()
+    real_time, forwarder_service.time = forwarder_service.time, clock
+    try:
+        breaker = CircuitBreaker(failure_threshold=3, probe_interval=30)
+        assert breaker.allow() == CircuitBreaker.CLOSED, "New breaker not closed"
+
+        # Failures below the threshold, or interrupted by a success, keep it closed
+        breaker.record(False)
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+        breaker.record(False)
+        assert breaker.allow() == CircuitBreaker.CLOSED, "Breaker opened below the threshold"
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN, "Breaker not opened at the threshold"
+        assert breaker.allow() == CircuitBreaker.OPEN, "Open breaker allowed a publish"
+        assert breaker.retry_in() == 30, f"Unexpected probe delay: {breaker.retry_in()}"
+        log_test(f"✅ Opened after 3 consecutive failures", "SUCCESS")
+
+        # One probe per probe interval, for a single caller
+        clock.advance(29)
+        assert breaker.allow() == CircuitBreaker.OPEN, "Probe allowed before the probe interval"
+        clock.advance(1)
+        assert breaker.allow() == CircuitBreaker.HALF_OPEN, "No probe after the probe interval"
+        assert breaker.allow() == CircuitBreaker.OPEN, "Second caller got the probe"
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN and breaker.retry_in() == 30, \
+            "Failed probe did not reopen the breaker for a probe interval"
+        log_test(f"✅ Failed probe reopened the breaker", "SUCCESS")
+
+        # An unused probe is given back: the next caller may probe at once
+        clock.advance(30)
+        assert breaker.allow() == CircuitBreaker.HALF_OPEN, "No probe after the probe interval"
+        breaker.cancel_probe()
+        assert breaker.state == CircuitBreaker.OPEN, "Cancelled probe left the breaker half open"
+        assert breaker.allow() == CircuitBreaker.HALF_OPEN, "Cancelled probe not available again"
+        log_test(f"✅ Cancelled probe available to the next caller", "SUCCESS")
+
+        # A successful probe closes the breaker
+        clock.advance(5)
+        breaker.record(True)
+        assert breaker.state == CircuitBreaker.CLOSED, "Successful probe did not close the breaker"
+        assert breaker.allow() == CircuitBreaker.CLOSED, "Closed breaker refused a publish"
+        stats = breaker.stats()
+        assert stats['opened'] == 1 and stats['probes'] == 3 and stats['open_seconds'] == 65, \
+            f"Unexpected breaker stats: {stats}"
+        log_test(f"✅ Successful probe closed the breaker after {stats['open_seconds']:.0f}s", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ CircuitBreaker test failed: {e}", "ERROR")
+        raise
+    finally:
+        forwarder_service.time = real_time
+
+
+def test_shadow_aggregator():
+    """Shadow updates are coalesced per device: debounce and max_dirty flushes"""
+    log_test("Testing ShadowUpdateAggregator...")
+
+    try:
+        # Debounce: one update per device with its latest state
+        client = FakeIPCClient()
+        forwarder = make_forwarder(client, shadow_debounce=0.3, shadow_max_dirty=100)
+        aggregator = forwarder.shadow_aggregator
+        try:
+            reported_at = time.monotonic()
+            aggregator.report('CAM-1', {'status': 'open'})
+            aggregator.report('CAM-2', {'status': 'open'})
+            aggregator.report('CAM-1', {'status': 'resolved'})
+            assert not client.shadow_updates(), "Shadow updated before the debounce"
+            assert wait_for(lambda: aggregator.stats()['flushes'] == 1), "Debounced updates not flushed"
+            elapsed = time.monotonic() - reported_at
+            assert elapsed >= 0.25, f"Flushed after {elapsed:.3f}s, before the debounce"
+            assert sorted(client.shadow_updates()) == [('CAM-1', {'status': 'resolved'}),
+                                                       ('CAM-2', {'status': 'open'})], \
+                f"Unexpected shadow updates: {client.shadow_updates()}"
+            stats = aggregator.stats()
+            assert stats['reported'] == 3 and stats['superseded'] == 1 and stats['updated'] == 2, \
+                f"Unexpected aggregator stats: {stats}"
+            log_test(f"✅ 3 reports for 2 devices flushed as 2 updates after {elapsed * 1000:.0f}ms",
+                     "SUCCESS")
+
+            # A failed update is retried on the next flush
+            client.reject = lambda request: getattr(request, 'shadow_name', None) == 'CAM-3'
+            aggregator.report('CAM-3', {'status': 'open'})
+            assert wait_for(lambda: aggregator.stats()['failed'] == 1), "Failed update not counted"
+            client.reject = lambda request: False
+            assert wait_for(lambda: aggregator.stats()['updated'] == 3), "Failed update not retried"
+            assert aggregator.stats()['dirty'] == 0, "Retried update still dirty"
+            log_test(f"✅ Failed update retried", "SUCCESS")
+        finally:
+            aggregator.close()
+
+        # max_dirty: enough dirty devices flush without waiting for the debounce
+        client = FakeIPCClient()
+        forwarder = make_forwarder(client, shadow_debounce=60, shadow_max_dirty=3)
+        aggregator = forwarder.shadow_aggregator
+        try:
+            aggregator.report('CAM-1', {'status': 'open'})
+            aggregator.report('CAM-2', {'status': 'open'})
+            assert not wait_for(lambda: client.shadow_updates(), timeout=0.2), \
+                "Flushed below max_dirty before the debounce"
+            aggregator.report('CAM-3', {'status': 'open'})
+            assert wait_for(lambda: len(client.shadow_updates()) == 3, timeout=1.0), \
+                "max_dirty devices not flushed at once"
+            log_test(f"✅ Flushed at max_dirty without waiting for the debounce", "SUCCESS")
+        finally:
+            aggregator.close()
+
+    except Exception as e:
+        log_test(f"❌ ShadowUpdateAggregator test failed: {e}", "ERROR")
+        raise
+
+
+def test_latency_histogram():
+    """Latencies land in the bucket of their upper bound; quantiles are bucket bounds"""
+    log_test("Testing LatencyHistogram...")
+
+    try:
+        histogram = LatencyHistogram(buckets=(1, 2, 5))
+        empty = histogram.stats()
+        assert empty['count'] == 0 and empty['p50'] is None, f"Unexpected empty stats: {empty}"
+
+        for seconds in (-0.5, 0.5, 1, 1.5, 5, 7):
+            histogram.observe(seconds)
+        stats = histogram.stats()
+        assert stats['buckets'] == {'le_1': 3, 'le_2': 1, 'le_5': 1, 'inf': 1}, \
+            f"Unexpected buckets: {stats['buckets']}"
+        assert stats['count'] == 6 and stats['max'] == 7.0 and stats['avg'] == 2.5, \
+            f"Unexpected count/max/avg: {stats}"
+        assert stats['p50'] == 1 and stats['p95'] == 7.0 and stats['p99'] == 7.0, \
+            f"Unexpected quantiles: {stats}"
+        log_test(f"✅ Bucketed {stats['count']} latencies (upper bounds inclusive, negatives clamped)",
+                 "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ LatencyHistogram test failed: {e}", "ERROR")
+        raise
+
+
+def test_rejected_probe():
+    """A message whose probe is always rejected backs off and is dead-lettered"""
+    log_test("Testing circuit breaker probes with a rejected message...")
+
+    clock = FakeClock()
+    real_time, forwarder_service.time = forwarder_service.time, clock
+    client = FakeIPCClient(reject=lambda request: getattr(request, 'topic_name', None) == 'test/poison')
+    forwarder = make_forwarder(client, batch_size=10, breaker_threshold=2, breaker_probe_interval=30)
+    try:
+        db = forwarder.db_manager
+        queue_dao = forwarder.message_queue_dao
+        db.execute_update("DELETE FROM message_queue")
+
+        # The poison message has the highest priority, so it is the first probe
+        poison_id = f"poison-{uuid4().hex[:8]}"
+        queue_dao.enqueue({'message_id': poison_id, 'topic': 'test/poison', 'payload': json.dumps({}),
+                           'priority': 0, 'max_attempts': 3})
+        message_ids = [f"routine-{uuid4().hex[:8]}" for _ in range(5)]
+        for message_id in message_ids:
+            queue_dao.enqueue({'message_id': message_id, 'topic': 'test/routine', 'payload': json.dumps({})})
+
+        def poison():
+            rows = db.execute_query("""
+                SELECT status, attempts, scheduled_at > CURRENT_TIMESTAMP as deferred
+                FROM message_queue WHERE message_id = ?
+            """, (poison_id,))
+            return rows[0] if rows else None
+
+        def open_breaker():
+            for _ in range(forwarder.circuit_breaker.failure_threshold):
+                forwarder.circuit_breaker.record(False)
+            clock.advance(forwarder.circuit_breaker.probe_interval)
+
+        # Failed probe: one attempt counted, the message backs off
+        open_breaker()
+        assert forwarder.process_pending_messages() == 0, "Rejected probe reported as sent"
+        assert forwarder.circuit_breaker.state == CircuitBreaker.OPEN, "Rejected probe closed the breaker"
+        assert poison()['attempts'] == 1 and poison()['deferred'], \
+            f"Rejected probe not counted as an attempt: {poison()}"
+        log_test(f"✅ Rejected probe counted an attempt and backed off", "SUCCESS")
+
+        # The next probe picks another message, which closes the breaker
+        clock.advance(forwarder.circuit_breaker.probe_interval)
+        assert forwarder.process_pending_messages() == 1, "Next probe not sent"
+        assert forwarder.circuit_breaker.state == CircuitBreaker.CLOSED, "Successful probe did not close"
+        assert forwarder.process_pending_messages() == 4, "Queue not drained after the breaker closed"
+        log_test(f"✅ Next probe used another message and closed the breaker", "SUCCESS")
+
+        # Probed again whenever its backoff has passed: dead-lettered at max_attempts
+        for _ in range(2):
+            db.execute_update("UPDATE message_queue SET scheduled_at = CURRENT_TIMESTAMP WHERE message_id = ?",
+                              (poison_id,))
+            open_breaker()
+            forwarder.process_pending_messages()
+        assert poison() is None, f"Rejected message left in the queue: {poison()}"
+        dead = {msg['message_id']: msg for msg in queue_dao.get_dead_letters(limit=100)}
+        assert dead.get(poison_id, {}).get('attempts') == 3, "Rejected message not dead-lettered"
+        log_test(f"✅ Rejected message dead-lettered after 3 probes", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Rejected probe test failed: {e}", "ERROR")
+        raise
+    finally:
+        forwarder.shadow_aggregator.close()
+        forwarder_service.time = real_time
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 70)
+    print("  INCIDENT MESSAGE FORWARDER TEST SUITE")
+    print("=" * 70 + "\n")
+
+    try:
+        db_path = copy_database(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
+        DatabaseManager(db_path)
+        log_test(f"Using database copy: {db_path}")
+        print()
+
+        if not forwarder_service.GREENGRASS_AVAILABLE:
+            # Request models normally come from the awsiot SDK
+            forwarder_service.PublishToIoTCoreRequest = FakeRequest
+            forwarder_service.UpdateThingShadowRequest = FakeRequest
+            forwarder_service.QOS = types.SimpleNamespace(AT_LEAST_ONCE='AT_LEAST_ONCE')
+
+        # Test 1: Circuit breaker states
+        test_circuit_breaker()
+        print()
+
+        # Test 2: Shadow update coalescing
+        test_shadow_aggregator()
+        print()
+
+        # Test 3: Latency histogram
+        test_latency_histogram()
+        print()
+
+        # Test 4: Rejected probe message
+        test_rejected_probe()
+        print()
+
+        print("=" * 70)
+        log_test("✅ ALL TESTS PASSED", "SUCCESS")
+        print("=" * 70 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print("\n" + "=" * 70)
+        log_test(f"❌ TEST SUITE FAILED: {e}", "ERROR")
+        print("=" * 70 + "\n")
+        return 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
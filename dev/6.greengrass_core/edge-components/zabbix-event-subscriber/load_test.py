@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Zabbix Event Subscriber - Load Test Harness
+Replays recorded Zabbix webhook payloads against the webhook server and
+reports throughput and latency
+
+Usage:
+    python3 load_test.py --payloads recorded_events.jsonl --concurrency 16 --requests 5000
+    python3 load_test.py --duration 30 --batch-size 50     # synthetic events, batch endpoint
+"""
+import sys
+import json
+import time
+import argparse
+import http.client
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_payloads(path: str) -> list:
+    """
+    Load recorded webhook payloads
+
+    Accepts a JSON array, a {"events": [...]} object or JSON Lines
+    (one payload per line, e.g. captured from the webhook DEBUG log).
+    """
+    with open(path) as f:
+        content = f.read().strip()
+
+    if content.startswith('['):
+        return json.loads(content)
+    if content.startswith('{') and '\n' not in content:
+        data = json.loads(content)
+        return data.get('events', [data])
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def synthetic_payloads(count: int = 100) -> list:
+    """Generate problem/recovery payload pairs for count cameras"""
+    payloads = []
+    for i in range(count):
+        camera = {
+            'host_id': str(20000 + i),
+            'host_name': f'Load Test Camera {i:03d}',
+            'host_ip': f'10.99.{i // 250}.{i % 250 + 1}'
+        }
+        payloads.append({
+            **camera,
+            'event_id': str(i * 2),
+            'event_status': '1',
+            'event_severity': '4',
+            'trigger_description': 'Camera is offline - no response to ping'
+        })
+        payloads.append({
+            **camera,
+            'event_id': str(i * 2 + 1),
+            'event_status': '0',
+            'event_severity': '0',
+            'trigger_description': 'Camera is online'
+        })
+    return payloads
+
+
+class LoadTest:
+    """Replays payloads from a pool of keep-alive HTTP clients"""
+
+    def __init__(self, url: str, payloads: list, concurrency: int, batch_size: int,
+                 unique_ids: bool, timeout: float):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.payloads = payloads
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.unique_ids = unique_ids
+        self.timeout = timeout
+        self.path = '/zabbix/events/batch' if batch_size > 1 else '/zabbix/events'
+
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._run_id = int(time.time())
+        self.latencies = []
+        self.status_codes = Counter()
+        self.errors = Counter()
+        self.events_sent = 0
+
+    def _next_body(self) -> bytes:
+        """Build the next request body, cycling through the payloads"""
+        with self._lock:
+            start = self._sequence
+            self._sequence += self.batch_size
+
+        events = []
+        for seq in range(start, start + self.batch_size):
+            payload = dict(self.payloads[seq % len(self.payloads)])
+            if self.unique_ids:
+                # Keep replayed events from collapsing into 'duplicate'
+                payload['event_id'] = f"{self._run_id}{seq:09d}"
+            payload.setdefault('timestamp', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+            events.append(payload)
+
+        return json.dumps(events if self.batch_size > 1 else events[0]).encode()
+
+    def _worker(self, deadline: float, quota: int):
+        """Send requests over one persistent connection until quota or deadline"""
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        sent = 0
+        while sent < quota and time.monotonic() < deadline:
+            body = self._next_body()
+            start = time.perf_counter()
+            try:
+                conn.request('POST', self.path, body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except Exception as e:
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                with self._lock:
+                    self.errors[type(e).__name__] += 1
+                sent += 1
+                continue
+
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.latencies.append(elapsed)
+                self.status_codes[status] += 1
+                if status < 300:
+                    self.events_sent += self.batch_size
+            sent += 1
+        conn.close()
+
+    def run(self, total_requests: int, duration: float) -> dict:
+        """Run the test and return a summary"""
+        deadline = time.monotonic() + duration if duration else float('inf')
+        if total_requests:
+            quotas = [total_requests // self.concurrency] * self.concurrency
+            for i in range(total_requests % self.concurrency):
+                quotas[i] += 1
+        else:
+            quotas = [sys.maxsize] * self.concurrency
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for quota in quotas:
+                pool.submit(self._worker, deadline, quota)
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        completed = len(latencies)
+        return {
+            'endpoint': self.path,
+            'concurrency': self.concurrency,
+            'batch_size': self.batch_size,
+            'duration_s': round(elapsed, 2),
+            'requests': completed + sum(self.errors.values()),
+            'requests_per_sec': round(completed / elapsed, 1) if elapsed else 0,
+            'events_per_sec': round(self.events_sent / elapsed, 1) if elapsed else 0,
+            'latency_ms': {
+                'p50': percentile(0.50),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(latencies[-1] * 1000, 2) if latencies else 0.0
+            },
+            'status_codes': dict(self.status_codes),
+            'errors': dict(self.errors)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zabbix Event Subscriber load test')
+    parser.add_argument('--url', default='http://localhost:8081', help='Webhook server base URL')
+    parser.add_argument('--payloads', help='Recorded payloads (JSON array or JSON Lines); synthetic if omitted')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent keep-alive clients')
+    parser.add_argument('--requests', type=int, default=1000, help='Total requests (0 = until --duration)')
+    parser.add_argument('--duration', type=float, default=0, help='Max test duration in seconds')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Events per request; >1 posts to /zabbix/events/batch')
+    parser.add_argument('--keep-event-ids', action='store_true',
+                        help='Replay original event_id values (measures the duplicate path)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error('--requests 0 requires --duration')
+
+    payloads = load_payloads(args.payloads) if args.payloads else synthetic_payloads()
+    if not payloads:
+        parser.error('No payloads to replay')
+
+    test = LoadTest(
+        url=args.url,
+        payloads=payloads,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        unique_ids=not args.keep_event_ids,
+        timeout=args.timeout
+    )
+
+    print(f"Replaying {len(payloads)} payloads against {args.url}{test.path} "
+          f"with {args.concurrency} clients...")
+    print(json.dumps(test.run(args.requests, args.duration), indent=2))
+
+
+if __name__ == '__main__':
+    main()
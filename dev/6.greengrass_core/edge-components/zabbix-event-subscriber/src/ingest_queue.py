@@ -0,0 +1,200 @@
+"""
+Asynchronous Ingest Queue for ZabbixEventSubscriber
+Decouples webhook HTTP latency from SQLite write latency: handlers enqueue
+prepared events into a bounded in-memory buffer and a dedicated writer
+thread drains it in micro-batches through IncidentIngestService
+"""
+import time
+import logging
+from collections import deque
+from threading import Condition, Lock, Thread
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncIngestQueue:
+    """
+    Bounded event buffer with a single background writer thread
+
+    A flush is triggered when batch_size events are buffered or when the
+    oldest buffered event has waited flush_interval seconds, whichever
+    comes first. offer() never blocks - a full buffer is reported to the
+    caller so the HTTP layer can apply backpressure (429).
+    """
+
+    def __init__(self, ingest_service, max_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.05):
+        """
+        Initialize ingest queue
+
+        Args:
+            ingest_service: IncidentIngestService used for writes
+            max_size: Maximum number of buffered events
+            batch_size: Maximum events per write transaction
+            flush_interval: Max seconds an event waits before a partial batch is flushed
+        """
+        self.ingest_service = ingest_service
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._buffer = deque()
+        self._cond = Condition(Lock())
+        self._running = False
+        self._thread = None
+        self._metrics = {
+            'enqueued': 0,
+            'rejected': 0,
+            'written': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_batch_size': 0,
+            'max_queue_depth': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+        # Batch size histogram: upper bound -> count
+        self._batch_histogram = {1: 0, 10: 0, 50: 0, 100: 0, 500: 0, float('inf'): 0}
+
+    def start(self):
+        """Start the writer thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Async ingest started (max_size={self.max_size}, batch_size={self.batch_size}, "
+            f"flush_interval={self.flush_interval * 1000:.0f}ms)"
+        )
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the writer thread after draining buffered events"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        logger.info(f"Async ingest stopped ({len(self._buffer)} events left unwritten)")
+
+    def offer(self, events: List[Tuple]) -> bool:
+        """
+        Enqueue prepared events atomically
+
+        Args:
+            events: List of (incident_data, incident_id, ngsi_ld, is_recovery) tuples
+
+        Returns:
+            True if all events were accepted, False if the buffer is full
+        """
+        with self._cond:
+            if not self._running or len(self._buffer) + len(events) > self.max_size:
+                self._metrics['rejected'] += len(events)
+                return False
+            was_empty = not self._buffer
+            self._buffer.extend((time.monotonic(), event) for event in events)
+            self._metrics['enqueued'] += len(events)
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], len(self._buffer))
+            # The writer waits without a timeout on an empty buffer: wake it to
+            # start the flush_interval timer of the first event, or for a full batch
+            if was_empty or len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def depth(self) -> int:
+        """Current number of buffered events"""
+        with self._cond:
+            return len(self._buffer)
+
+    def _take_batch(self) -> List[Tuple]:
+        """Wait for a size- or time-triggered batch (empty list once stopped and drained)"""
+        with self._cond:
+            while True:
+                if self._buffer:
+                    if not self._running or len(self._buffer) >= self.batch_size:
+                        break
+                    remaining = self._buffer[0][0] + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                elif not self._running:
+                    return []
+                else:
+                    self._cond.wait()
+
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft()[1] for _ in range(count)]
+
+    def _run(self):
+        """Writer loop"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple]):
+        """Write a batch in one transaction, isolating bad events on failure"""
+        start = time.monotonic()
+        written = 0
+        try:
+            self.ingest_service.ingest_batch(batch)
+            written = len(batch)
+        except Exception as e:
+            logger.error(f"Batch write of {len(batch)} events failed, retrying individually: {e}")
+            for event in batch:
+                try:
+                    self.ingest_service.ingest_batch([event])
+                    written += 1
+                except Exception as event_error:
+                    logger.error(
+                        f"Dropping event {event[0].get('zabbix_event_id')}: {event_error}"
+                    )
+
+        elapsed_ms = (time.monotonic() - start) * 1000
+        with self._cond:
+            m = self._metrics
+            m['written'] += written
+            m['failed'] += len(batch) - written
+            m['batches'] += 1
+            m['last_batch_size'] = len(batch)
+            m['max_batch_size'] = max(m['max_batch_size'], len(batch))
+            m['last_flush_ms'] = elapsed_ms
+            m['total_flush_ms'] += elapsed_ms
+            for bound in self._batch_histogram:
+                if len(batch) <= bound:
+                    self._batch_histogram[bound] += 1
+                    break
+
+    def get_metrics(self) -> Dict:
+        """
+        Get queue metrics
+
+        Returns:
+            Dictionary with queue depth, throughput counters and batch size distribution
+        """
+        with self._cond:
+            m = dict(self._metrics)
+            batches = m['batches']
+            return {
+                'queue_depth': len(self._buffer),
+                'max_size': self.max_size,
+                'enqueued': m['enqueued'],
+                'rejected': m['rejected'],
+                'written': m['written'],
+                'failed': m['failed'],
+                'batches': batches,
+                'avg_batch_size': round((m['written'] + m['failed']) / batches, 2) if batches else 0,
+                'max_batch_size': m['max_batch_size'],
+                'last_batch_size': m['last_batch_size'],
+                'max_queue_depth': m['max_queue_depth'],
+                'last_flush_ms': round(m['last_flush_ms'], 3),
+                'avg_flush_ms': round(m['total_flush_ms'] / batches, 3) if batches else 0,
+                'batch_size_histogram': {
+                    ('le_inf' if bound == float('inf') else f'le_{bound}'): count
+                    for bound, count in self._batch_histogram.items()
+                }
+            }
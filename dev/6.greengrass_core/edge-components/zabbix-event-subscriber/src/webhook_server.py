@@ -8,6 +8,8 @@ Component: com.aismc.ZabbixEventSubscriber v1.0.0
 """
 import sys
 import json
+import atexit
+import signal
 import logging
 from datetime import datetime
 from uuid import uuid4
@@ -18,7 +20,10 @@ sys.path.insert(0, '/greengrass/v2/components/common')
 
 from database.connection import DatabaseManager
 from database.dao import IncidentDAO, CameraDAO, ConfigurationDAO
+from database.ingest_service import IncidentIngestService
+from database.camera_cache import CameraIdentityCache
 from utils.ngsi_ld import transform_zabbix_webhook_to_incident, transform_incident_to_ngsi_ld
+from ingest_queue import AsyncIngestQueue
 
 # Setup logging
 logging.basicConfig(
@@ -30,28 +35,96 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 
+# Upper bound on events accepted in one batch request
+MAX_BATCH_SIZE = 1000
+
 # Initialize Database
 db_manager = DatabaseManager()
 incident_dao = IncidentDAO(db_manager)
-camera_dao = CameraDAO(db_manager)
+camera_cache = CameraIdentityCache()
+camera_dao = CameraDAO(db_manager, cache=camera_cache)
 config_dao = ConfigurationDAO(db_manager)
 
 # Get site_id from configuration
 SITE_ID = config_dao.get('site_id') or 'site-001'
+camera_dao.warm_cache()
+ingest_service = IncidentIngestService(db_manager, SITE_ID, camera_cache=camera_cache)
+
+# Set by main() when running with --ingest-mode async
+ingest_queue = None
 logger.info(f"Initialized ZabbixEventSubscriber for site: {SITE_ID}")
 
 
+def enqueue_events(events: list, **extra):
+    """
+    Hand prepared events to the async writer
+
+    Args:
+        events: Prepared events from prepare_incident()
+        **extra: Additional fields for the 202 response body
+
+    Returns:
+        Flask response tuple: 202 when accepted, 429 when the queue is full
+    """
+    if not ingest_queue.offer(events):
+        logger.warning(f"Ingest queue full, rejecting {len(events)} event(s)")
+        response = jsonify({
+            'status': 'rejected',
+            'error': 'Ingest queue full, retry later',
+            'queue_depth': ingest_queue.depth()
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 429
+
+    return jsonify({
+        'status': 'accepted',
+        'accepted': len(events),
+        'queue_depth': ingest_queue.depth(),
+        **extra
+    }), 202
+
+
+def prepare_incident(webhook_payload: dict) -> tuple:
+    """
+    Transform a Zabbix webhook payload into ingest inputs
+
+    Returns:
+        (incident_data, incident_id, ngsi_ld, is_recovery)
+    """
+    # Transform webhook to incident structure
+    incident_data = transform_zabbix_webhook_to_incident(webhook_payload)
+
+    # Normalize timestamp format: Zabbix sends "2026.01.02T22:15:31Z" but SQLite needs "2026-01-02T22:15:31Z"
+    if 'timestamp' in incident_data and incident_data['timestamp']:
+        incident_data['timestamp'] = incident_data['timestamp'].replace('.', '-', 2)
+
+    # Generate incident ID
+    incident_id = f"INC-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4().hex[:8]}"
+
+    # Transform to NGSI-LD format
+    ngsi_ld = transform_incident_to_ngsi_ld(incident_data, incident_id, SITE_ID)
+
+    # Check if this is a recovery event (event_status = RESOLVED or OK)
+    event_status = webhook_payload.get('event_status', 'PROBLEM')
+    is_recovery = event_status in ['RESOLVED', 'OK', '0']
+
+    return incident_data, incident_id, ngsi_ld, is_recovery
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     try:
-        health = db_manager.health_check()
-        return jsonify({
+        health = {
             'status': 'healthy',
             'component': 'ZabbixEventSubscriber',
             'version': '1.0.0',
-            'database': health
-        }), 200
+            'database': db_manager.health_check(),
+            'camera_cache': camera_cache.stats()
+        }
+        if ingest_queue is not None:
+            health['ingest_queue'] = ingest_queue.get_metrics()
+        return jsonify(health), 200
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({
@@ -76,6 +149,9 @@ def receive_zabbix_event():
         "trigger_description": "Camera is offline",
         "timestamp": "2026-01-01T10:00:00Z"
     }
+
+    A JSON array of such objects is handled like POST /zabbix/events/batch.
+    In async ingest mode the event is queued and 202 is returned instead.
     """
     try:
         # Get webhook payload
@@ -85,128 +161,24 @@ def receive_zabbix_event():
             logger.warning("Received empty webhook payload")
             return jsonify({'error': 'Empty payload'}), 400
 
-        logger.info(f"Received Zabbix webhook: {json.dumps(webhook_payload, indent=2)}")
-
-        # Transform webhook to incident structure
-        incident_data = transform_zabbix_webhook_to_incident(webhook_payload)
-
-        # Normalize timestamp format: Zabbix sends "2026.01.02T22:15:31Z" but SQLite needs "2026-01-02T22:15:31Z"
-        if 'timestamp' in incident_data and incident_data['timestamp']:
-            incident_data['timestamp'] = incident_data['timestamp'].replace('.', '-', 2)
-            logger.debug(f"Normalized timestamp: {incident_data['timestamp']}")
-
-        # Generate incident ID
-        incident_id = f"INC-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid4().hex[:8]}"
-
-        # Transform to NGSI-LD format
-        ngsi_ld = transform_incident_to_ngsi_ld(incident_data, incident_id, SITE_ID)
-
-        # Check if camera exists in database
-        camera_id = incident_data['camera_id']
-        camera = camera_dao.get_by_id(camera_id)
-
-        if not camera:
-            # Camera not in registry yet, check by Zabbix host_id
-            zabbix_host_id = webhook_payload.get('host_id')
-            if zabbix_host_id:
-                camera = camera_dao.get_by_zabbix_host_id(zabbix_host_id)
-                if camera:
-                    camera_id = camera['camera_id']
-                    incident_data['camera_id'] = camera_id
-
-        # If camera still doesn't exist, try to find by IP address
-        if not camera:
-            host_ip = webhook_payload.get('host_ip')
-            if host_ip and host_ip != 'unknown':
-                # Try to find camera by IP address
-                camera = camera_dao.get_by_ip(host_ip)
-                if camera:
-                    # Found existing camera with same IP, use it
-                    camera_id = camera['camera_id']
-                    incident_data['camera_id'] = camera_id
-                    logger.info(f"Found existing camera by IP {host_ip}: {camera_id}")
-
-                    # Update zabbix_host_id if changed
-                    if camera['zabbix_host_id'] != webhook_payload.get('host_id'):
-                        logger.warning(f"Zabbix host_id changed for {camera_id}: {camera['zabbix_host_id']} -> {webhook_payload.get('host_id')}")
-                        # Update camera with new zabbix_host_id using batch_upsert
-                        updated_camera = camera.copy()
-                        updated_camera['zabbix_host_id'] = webhook_payload.get('host_id')
-                        camera_dao.batch_upsert([updated_camera])
-                        logger.info(f"✅ Updated zabbix_host_id for {camera_id}")
-
-        # If camera truly doesn't exist, create it
-        if not camera:
-            logger.info(f"Camera {camera_id} not found, creating new camera record...")
-            new_camera = {
-                'camera_id': camera_id,
-                'zabbix_host_id': webhook_payload.get('host_id'),
-                'hostname': webhook_payload.get('host_name', f'Camera-{camera_id}'),
-                'ip_address': webhook_payload.get('host_ip', 'unknown'),
-                'status': 'offline',
-                'site_id': SITE_ID
-            }
-            camera_dao.insert(new_camera)
-            logger.info(f"✅ Created new camera record: {camera_id}")
-            camera = new_camera
-
-        # Check if this is a recovery event (event_status = RESOLVED or OK)
-        event_status = webhook_payload.get('event_status', 'PROBLEM')
-        is_recovery = event_status in ['RESOLVED', 'OK', '0']
-
-        if is_recovery:
-            # For recovery events, try to update existing incident
-            zabbix_event_id = incident_data.get('zabbix_event_id')
-            existing_incident = incident_dao.get_by_zabbix_event_id(zabbix_event_id)
-
-            if existing_incident:
-                # Update existing incident with resolution
-                incident_dao.update_resolved(existing_incident['incident_id'], incident_data['timestamp'])
-                logger.info(f"✅ Updated incident resolution: {existing_incident['incident_id']} | Camera: {camera_id}")
-                incident_id = existing_incident['incident_id']
-            else:
-                # Edge case: recovery without prior problem event, insert it
-                logger.warning(f"Recovery event for unknown incident (event_id={zabbix_event_id}), inserting new record")
-                incident_record = {
-                    'incident_id': incident_id,
-                    'camera_id': camera_id,
-                    'zabbix_event_id': zabbix_event_id,
-                    'incident_type': incident_data['incident_type'],
-                    'severity': incident_data['severity'],
-                    'detected_at': incident_data['timestamp'],
-                    'resolved_at': incident_data['timestamp'],  # Same time for edge case
-                    'duration_seconds': 0,
-                    'ngsi_ld': ngsi_ld
-                }
-                incident_dao.insert(incident_record)
-                logger.info(f"✅ Stored recovery incident (no prior problem): {incident_id} | Camera: {camera_id}")
-        else:
-            # Problem event - insert new incident
-            incident_record = {
-                'incident_id': incident_id,
-                'camera_id': camera_id,
-                'zabbix_event_id': incident_data.get('zabbix_event_id'),
-                'incident_type': incident_data['incident_type'],
-                'severity': incident_data['severity'],
-                'detected_at': incident_data['timestamp'],
-                'ngsi_ld': ngsi_ld
-            }
-            incident_dao.insert(incident_record)
-            logger.info(f"✅ Stored incident: {incident_id} | Type: {incident_data['incident_type']} | Camera: {camera_id}")
-
-        # Update camera status if exists
-        if camera:
-            new_status = 'offline' if incident_data['incident_type'] == 'camera_offline' else 'online'
-            camera_dao.update_status(camera_id, new_status)
-            logger.info(f"✅ Updated camera {camera_id} status to {new_status}")
+        if isinstance(webhook_payload, list):
+            return ingest_batch_payload(webhook_payload)
+
+        logger.debug(f"Received Zabbix webhook: {json.dumps(webhook_payload)}")
+
+        incident_data, incident_id, ngsi_ld, is_recovery = prepare_incident(webhook_payload)
+
+        if ingest_queue is not None:
+            return enqueue_events([(incident_data, incident_id, ngsi_ld, is_recovery)])
+
+        # Resolve camera, write incident and update status in one transaction
+        result = ingest_service.ingest_event(incident_data, incident_id, ngsi_ld, is_recovery)
+        logger.info(f"✅ {result.action}: {result.incident_id} | Type: {result.incident_type} | Camera: {result.camera_id}")
 
         # Return success response
         return jsonify({
             'status': 'success',
-            'incident_id': incident_id,
-            'camera_id': camera_id,
-            'incident_type': incident_data['incident_type'],
-            'severity': incident_data['severity'],
+            **result.to_dict(),
             'message': 'Incident stored successfully'
         }), 200
 
@@ -218,6 +190,84 @@ def receive_zabbix_event():
         }), 500
 
 
+@app.route('/zabbix/events/batch', methods=['POST'])
+def receive_zabbix_event_batch():
+    """
+    Receive an array of Zabbix webhook events
+
+    Valid events are written in a single transaction; invalid entries are
+    reported per index without affecting the rest of the batch.
+    Body: either a JSON array of event objects or {"events": [...]}
+    """
+    try:
+        body = request.get_json()
+        payloads = body.get('events') if isinstance(body, dict) else body
+
+        if not isinstance(payloads, list) or not payloads:
+            logger.warning("Received empty or malformed batch payload")
+            return jsonify({'error': 'Expected a non-empty array of events'}), 400
+
+        return ingest_batch_payload(payloads)
+
+    except Exception as e:
+        logger.error(f"Error processing Zabbix webhook batch: {e}", exc_info=True)
+        return jsonify({
+            'status': 'error',
+            'error': str(e)
+        }), 500
+
+
+def ingest_batch_payload(payloads: list):
+    """
+    Validate, transform and store a list of webhook payloads
+
+    Returns:
+        Flask response tuple with per-event results in input order
+        (in async ingest mode valid events are queued as one unit)
+    """
+    if len(payloads) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} events)'}), 413
+
+    results = [None] * len(payloads)
+    events = []
+    positions = []
+
+    for index, webhook_payload in enumerate(payloads):
+        if not isinstance(webhook_payload, dict) or not webhook_payload:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Empty or invalid event'}
+            continue
+        try:
+            events.append(prepare_incident(webhook_payload))
+            positions.append(index)
+        except Exception as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    if ingest_queue is not None:
+        if not events:
+            return jsonify({'status': 'error', 'total': len(payloads), 'results': results}), 400
+        return enqueue_events(
+            events,
+            total=len(payloads),
+            failed=len(payloads) - len(positions),
+            errors=[r for r in results if r is not None]
+        )
+
+    # All valid events share one transaction (all-or-nothing on database errors)
+    for index, result in zip(positions, ingest_service.ingest_batch(events)):
+        results[index] = {'index': index, 'status': 'success', **result.to_dict()}
+
+    failed = len(payloads) - len(positions)
+    logger.info(f"✅ Batch ingested: {len(positions)} stored, {failed} rejected")
+
+    return jsonify({
+        'status': 'success' if failed == 0 else 'partial',
+        'total': len(payloads),
+        'stored': len(positions),
+        'failed': failed,
+        'results': results
+    }), 200
+
+
 @app.route('/zabbix/events', methods=['GET'])
 def list_recent_events():
     """List recent incidents (for debugging)"""
@@ -242,17 +292,106 @@ def list_recent_events():
         return jsonify({'error': str(e)}), 500
 
 
-def main(host='0.0.0.0', port=8081):
+def start_async_ingest(queue_size: int, batch_size: int, flush_interval_ms: int):
+    """Start the background writer and drain it on shutdown"""
+    global ingest_queue
+    ingest_queue = AsyncIngestQueue(
+        ingest_service,
+        max_size=queue_size,
+        batch_size=batch_size,
+        flush_interval=flush_interval_ms / 1000.0
+    )
+    ingest_queue.start()
+    atexit.register(ingest_queue.stop)
+
+
+def stop_async_ingest():
+    """Drain and stop the background writer if it is running"""
+    if ingest_queue is not None:
+        ingest_queue.stop()
+
+
+def run_gunicorn(host: str, port: int, workers: int, threads: int, keep_alive: int,
+                 timeout: int, async_ingest: tuple = None):
+    """
+    Serve the Flask app with an embedded gunicorn arbiter
+
+    Each worker is a separate process with its own connection pool (and
+    its own async ingest queue when enabled); SQLite WAL mode serializes
+    their writes.
+
+    Args:
+        host: Bind address
+        port: Bind port
+        workers: Number of worker processes
+        threads: Request threads per worker
+        keep_alive: Seconds to keep idle HTTP connections open
+        timeout: Seconds before a silent worker is killed and restarted
+        async_ingest: (queue_size, batch_size, flush_interval_ms) to enable async ingest
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class SubscriberApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'keepalive': keep_alive,
+        'timeout': timeout,
+        'graceful_timeout': timeout,
+        'errorlog': '-'
+    }
+    if async_ingest:
+        options['post_worker_init'] = lambda worker: start_async_ingest(*async_ingest)
+        options['worker_exit'] = lambda server, worker: stop_async_ingest()
+
+    # SQLite connections must not cross fork(); workers reopen their own lazily
+    db_manager.close()
+    SubscriberApplication(options).run()
+
+
+def main(host='0.0.0.0', port=8081, ingest_mode='sync', queue_size=10000,
+         batch_size=200, flush_interval_ms=50, server='dev', workers=2, threads=4,
+         keep_alive=5, timeout=30):
     """Run Flask webhook server"""
+    async_ingest = (queue_size, batch_size, flush_interval_ms) if ingest_mode == 'async' else None
+
     logger.info("=" * 70)
     logger.info("  Zabbix Event Subscriber - Webhook Server")
     logger.info("=" * 70)
     logger.info(f"  Site ID: {SITE_ID}")
     logger.info(f"  Listening on: http://{host}:{port}")
     logger.info(f"  Webhook endpoint: http://{host}:{port}/zabbix/events")
+    logger.info(f"  Batch endpoint: http://{host}:{port}/zabbix/events/batch")
     logger.info(f"  Health check: http://{host}:{port}/health")
+    logger.info(f"  Ingest mode: {ingest_mode}")
+    if server == 'gunicorn':
+        logger.info(f"  Server: gunicorn ({workers} workers x {threads} threads, "
+                    f"keep-alive {keep_alive}s, timeout {timeout}s)")
+    else:
+        logger.info("  Server: Flask development server")
     logger.info("=" * 70)
 
+    if server == 'gunicorn':
+        run_gunicorn(host, port, workers, threads, keep_alive, timeout, async_ingest)
+        return
+
+    if async_ingest:
+        start_async_ingest(*async_ingest)
+        # Greengrass stops the component with SIGTERM; exit normally so atexit drains the queue
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
     # Run Flask server
     app.run(host=host, port=port, debug=False)
 
@@ -263,7 +402,35 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Zabbix Event Subscriber Webhook Server')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind to')
     parser.add_argument('--port', type=int, default=8081, help='Port to listen on')
+    parser.add_argument('--ingest-mode', choices=['sync', 'async'], default='sync',
+                        help='sync: write in the request; async: queue and write in micro-batches')
+    parser.add_argument('--queue-size', type=int, default=10000,
+                        help='Max buffered events in async mode (429 when full)')
+    parser.add_argument('--batch-size', type=int, default=200,
+                        help='Max events per write transaction in async mode')
+    parser.add_argument('--flush-interval-ms', type=int, default=50,
+                        help='Max time an event waits before a partial batch is written')
+    parser.add_argument('--server', choices=['dev', 'gunicorn'], default='dev',
+                        help='dev: Flask development server; gunicorn: multi-worker production server')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes (gunicorn)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per worker (gunicorn)')
+    parser.add_argument('--keep-alive', type=int, default=5,
+                        help='Seconds to keep idle HTTP connections open (gunicorn)')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='Request timeout in seconds before a worker is restarted (gunicorn)')
 
     args = parser.parse_args()
 
-    main(host=args.host, port=args.port)
+    main(
+        host=args.host,
+        port=args.port,
+        ingest_mode=args.ingest_mode,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        flush_interval_ms=args.flush_interval_ms,
+        server=args.server,
+        workers=args.workers,
+        threads=args.threads,
+        keep_alive=args.keep_alive,
+        timeout=args.timeout
+    )
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test suite for AsyncIngestQueue
+Tests size- and time-triggered flushes of the webhook ingest buffer
+(no database needed: writes go to a recording ingest service)
+
+Usage: python3 test_ingest_queue.py
+"""
+import sys
+import os
+import time
+import threading
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from ingest_queue import AsyncIngestQueue
+
+
+def log_test(message: str, status: str = "INFO"):
+    """Log test output with color"""
+    colors = {
+        "INFO": "\033[0;36m",     # Cyan
+        "SUCCESS": "\033[0;32m",   # Green
+        "ERROR": "\033[0;31m",     # Red
+        "RESET": "\033[0m"
+    }
+    color = colors.get(status, colors["INFO"])
+    print(f"{color}[{status}]{colors['RESET']} {message}")
+
+
+class RecordingIngestService:
+    """Stands in for IncidentIngestService: records each written batch"""
+
+    def __init__(self):
+        self.batches = []
+        self.written = threading.Event()
+
+    def ingest_batch(self, events):
+        self.batches.append(list(events))
+        self.written.set()
+
+
+def make_events(count: int, start: int = 0) -> list:
+    """Prepared event tuples as queued by the webhook handlers"""
+    return [({'zabbix_event_id': str(start + i)}, f"INC-{start + i}", {}, False) for i in range(count)]
+
+
+def test_time_triggered_flush():
+    """Fewer than batch_size events are written within about flush_interval"""
+    log_test("Testing time-triggered flush of a partial batch...")
+
+    service = RecordingIngestService()
+    queue = AsyncIngestQueue(service, batch_size=200, flush_interval=0.05)
+    queue.start()
+    try:
+        # Writer idle on an empty buffer: a lone event must still be flushed
+        time.sleep(0.1)
+        offered_at = time.monotonic()
+        assert queue.offer(make_events(1)), "Event rejected"
+        assert service.written.wait(1.0), "Partial batch not written on the time trigger"
+        elapsed = time.monotonic() - offered_at
+        assert elapsed < 0.5, f"Partial batch written after {elapsed:.3f}s"
+        assert queue.depth() == 0, "Event still buffered after flush"
+        log_test(f"✅ Single event written after {elapsed * 1000:.0f}ms", "SUCCESS")
+
+        # Again after the writer went back to waiting on an empty buffer
+        service.written.clear()
+        time.sleep(0.1)
+        assert queue.offer(make_events(3, start=1)), "Events rejected"
+        assert service.written.wait(1.0), "Second partial batch not written"
+        assert [event[1] for event in service.batches[-1]] == ['INC-1', 'INC-2', 'INC-3'], \
+            "Partial batch written out of order"
+        log_test(f"✅ Second partial batch of 3 events written", "SUCCESS")
+
+    finally:
+        queue.stop()
+
+
+def test_size_triggered_flush():
+    """A full batch is written without waiting for flush_interval"""
+    log_test("Testing size-triggered flush...")
+
+    service = RecordingIngestService()
+    queue = AsyncIngestQueue(service, batch_size=10, flush_interval=5.0)
+    queue.start()
+    try:
+        assert queue.offer(make_events(10)), "Events rejected"
+        assert service.written.wait(1.0), "Full batch not written before flush_interval"
+        assert len(service.batches[0]) == 10, "Full batch split"
+        log_test(f"✅ Full batch of 10 events written immediately", "SUCCESS")
+    finally:
+        queue.stop()
+
+
+def test_backpressure_and_drain():
+    """A full buffer rejects offers; stop() writes what is buffered"""
+    log_test("Testing backpressure and drain on stop...")
+
+    service = RecordingIngestService()
+    queue = AsyncIngestQueue(service, max_size=5, batch_size=100, flush_interval=5.0)
+    queue.start()
+    assert queue.offer(make_events(5)), "Events rejected below max_size"
+    assert not queue.offer(make_events(1, start=5)), "Offer accepted beyond max_size"
+    queue.stop()
+
+    metrics = queue.get_metrics()
+    assert metrics['written'] == 5 and metrics['rejected'] == 1, f"Unexpected metrics: {metrics}"
+    assert queue.depth() == 0, "Events left unwritten after stop"
+    log_test(f"✅ Overflow rejected, buffered events drained on stop", "SUCCESS")
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 70)
+    print("  ASYNC INGEST QUEUE TEST SUITE")
+    print("=" * 70 + "\n")
+
+    try:
+        # Test 1: Time-triggered flush
+        test_time_triggered_flush()
+        print()
+
+        # Test 2: Size-triggered flush
+        test_size_triggered_flush()
+        print()
+
+        # Test 3: Backpressure and drain
+        test_backpressure_and_drain()
+        print()
+
+        print("=" * 70)
+        log_test("✅ ALL TESTS PASSED", "SUCCESS")
+        print("=" * 70 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print("\n" + "=" * 70)
+        log_test(f"❌ TEST SUITE FAILED: {e}", "ERROR")
+        print("=" * 70 + "\n")
+        return 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
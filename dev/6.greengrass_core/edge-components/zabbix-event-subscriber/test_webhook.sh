@@ -52,8 +52,21 @@ curl -s -X POST "$WEBHOOK_URL/zabbix/events" \
   }' | jq '.'
 echo
 
-# Test 4: List Recent Events
-echo "[TEST 4] Listing recent incidents..."
+# Test 4: Send Batch of Events (site-wide outage)
+echo "[TEST 4] Sending batch of camera offline events..."
+TS="$(date -u +%Y-%m-%dT%H:%M:%SZ)"
+curl -s -X POST "$WEBHOOK_URL/zabbix/events/batch" \
+  -H "Content-Type: application/json" \
+  -d '[
+    {"event_id": "10003", "event_status": "1", "event_severity": "5", "host_id": "10771",
+     "host_name": "IP Camera 02", "host_ip": "192.168.1.12", "timestamp": "'"$TS"'"},
+    {"event_id": "10004", "event_status": "1", "event_severity": "5", "host_id": "10772",
+     "host_name": "IP Camera 03", "host_ip": "192.168.1.13", "timestamp": "'"$TS"'"}
+  ]' | jq '.'
+echo
+
+# Test 5: List Recent Events
+echo "[TEST 5] Listing recent incidents..."
 curl -s -X GET "$WEBHOOK_URL/zabbix/events" | jq '.'
 echo
 
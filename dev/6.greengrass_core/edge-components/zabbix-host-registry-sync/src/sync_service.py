@@ -2,7 +2,10 @@
 """
 Zabbix Host Registry Sync Service
 Syncs ALL hosts and host groups from Zabbix to local SQLite database
-Supports incremental sync using lastchange timestamp
+Supports incremental sync driven by the Zabbix audit log (watermark on the
+last host change seen) with periodic id-only reconciliation for deletions
+Fetches hosts in pages (hostids chunks) so memory stays flat for large installations
+Overlaps Zabbix API calls on a thread pool and records per-call timings in sync_log
 Publishes daily inventory summary to AWS IoT Core (v2.0 architecture)
 
 Component: com.aismc.ZabbixHostRegistrySync v1.0.0
@@ -11,9 +14,12 @@ import sys
 import json
 import time
 import logging
+import threading
 import requests
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # Add Greengrass IPC SDK
 try:
@@ -36,14 +42,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Hosts requested per host.get call (each with groups, interfaces and tags)
+DEFAULT_PAGE_SIZE = 500
+
+# Concurrent Zabbix API calls (also the number of host pages fetched ahead)
+DEFAULT_API_WORKERS = 4
+
+# Zabbix audit log: resource type and actions for hosts
+AUDIT_RESOURCE_HOST = 4
+AUDIT_ACTION_ADD = 0
+AUDIT_ACTION_UPDATE = 1
+AUDIT_ACTION_DELETE = 2
+
+# Host audit records read per incremental sync (more falls back to a full sync)
+AUDIT_LIMIT = 10000
+
+# Configuration keys of the incremental sync state
+WATERMARK_KEY = 'host_sync_watermark'          # clock of the newest host audit record applied
+LAST_FULL_SYNC_KEY = 'host_sync_last_full'      # unix time of the last full sync
+LAST_RECONCILE_KEY = 'host_sync_last_reconcile'  # unix time of the last id-only reconciliation
+
 
 class ZabbixAPIClient:
     """
     Zabbix API Client with Bearer token authentication
     Supports Zabbix 7.4+ API
+
+    Calls can be issued concurrently (submit/call_many) on a thread pool;
+    each thread keeps its own HTTP session. The Zabbix API does not accept
+    JSON-RPC batch requests, so overlapping calls is done client-side.
     """
 
-    def __init__(self, api_url: str, username: str, password: str):
+    def __init__(self, api_url: str, username: str, password: str,
+                 max_workers: int = DEFAULT_API_WORKERS):
         """
         Initialize Zabbix API client
 
@@ -51,13 +82,27 @@ class ZabbixAPIClient:
             api_url: Zabbix API endpoint URL
             username: Zabbix username
             password: Zabbix password
+            max_workers: Maximum concurrent API calls
         """
         self.api_url = api_url
         self.username = username
         self.password = password
         self.auth_token = None
-        self.session = requests.Session()
-        self.session.headers.update({'Content-Type': 'application/json'})
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='zabbix-api')
+        self._local = threading.local()
+        self._timings = []
+        self._timings_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session of the calling thread (requests.Session is not thread-safe)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({'Content-Type': 'application/json'})
+            self._local.session = session
+        return session
 
     def authenticate(self) -> bool:
         """
@@ -83,7 +128,6 @@ class ZabbixAPIClient:
 
             if 'result' in result:
                 self.auth_token = result['result']
-                self.session.headers.update({'Authorization': f'Bearer {self.auth_token}'})
                 logger.info("✅ Authenticated with Zabbix API")
                 return True
             else:
@@ -109,6 +153,8 @@ class ZabbixAPIClient:
             logger.error("Not authenticated - call authenticate() first")
             return None
 
+        start = time.perf_counter()
+        ok = False
         try:
             payload = {
                 "jsonrpc": "2.0",
@@ -117,11 +163,15 @@ class ZabbixAPIClient:
                 "id": 1
             }
 
-            response = self.session.post(self.api_url, json=payload, timeout=60)
+            response = self.session.post(
+                self.api_url, json=payload, timeout=60,
+                headers={'Authorization': f'Bearer {self.auth_token}'}
+            )
             response.raise_for_status()
             result = response.json()
 
             if 'result' in result:
+                ok = True
                 return result['result']
             else:
                 logger.error(f"API call failed: {result.get('error', 'Unknown error')}")
@@ -131,40 +181,184 @@ class ZabbixAPIClient:
             logger.error(f"API call error ({method}): {e}")
             return None
 
+        finally:
+            self._record_timing(method, start, ok)
+
+    def _record_timing(self, method: str, start: float, ok: bool):
+        """Record the duration of one API call"""
+        with self._timings_lock:
+            self._timings.append({
+                'method': method,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+                'ok': ok
+            })
+
+    def pop_timings(self) -> List[Dict]:
+        """Return and reset the per-call timings recorded since the last call"""
+        with self._timings_lock:
+            timings, self._timings = self._timings, []
+        return timings
+
+    def submit(self, method: str, params: Dict = None) -> Future:
+        """Issue an API call on the thread pool; the future resolves to call_api()'s result"""
+        return self.executor.submit(self.call_api, method, params)
+
+    def call_many(self, calls: List[Tuple[str, Dict]]) -> List[Optional[Dict]]:
+        """
+        Issue several API calls concurrently
+
+        Args:
+            calls: (method, params) pairs
+
+        Returns:
+            Results in the order of `calls` (None for failed calls)
+        """
+        futures = [self.submit(method, params) for method, params in calls]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Shut down the worker pool"""
+        self.executor.shutdown(wait=True)
+
     def get_host_groups(self) -> List[Dict]:
         """Get all host groups"""
         return self.call_api('hostgroup.get', {
             'output': ['groupid', 'name', 'flags', 'uuid']
         }) or []
 
-    def get_hosts(self, lastchange_since: int = None) -> List[Dict]:
+    def get_host_ids(self) -> List[str]:
+        """
+        Get the IDs of all hosts (sorted)
+
+        Only hostid is selected, so the response stays small even for
+        installations with tens of thousands of hosts.
+
+        Raises:
+            RuntimeError: If the API call fails
         """
-        Get all hosts, optionally filtered by lastchange timestamp
+        result = self.call_api('host.get', {'output': ['hostid'], 'sortfield': 'hostid'})
+        if result is None:
+            raise RuntimeError("host.get (hostid listing) failed")
+        return [host['hostid'] for host in result]
+
+    def get_host_changes(self, since_clock: int, limit: int = AUDIT_LIMIT) -> List[Dict]:
+        """
+        Get host add/update/delete records from the audit log
 
         Args:
-            lastchange_since: Unix timestamp - only get hosts changed since this time
+            since_clock: Audit clock to read from (inclusive)
+            limit: Maximum records returned
 
         Returns:
-            List of host dictionaries
+            Audit records (auditid, clock, resourceid, action), oldest first
+
+        Raises:
+            RuntimeError: If the API call fails
         """
-        params = {
-            'output': ['hostid', 'host', 'name', 'status', 'available',
-                      'maintenance_status', 'lastaccess', 'ipmi_available'],
-            'selectGroups': ['groupid', 'name'],
-            'selectInterfaces': ['interfaceid', 'ip', 'port', 'type'],
-            'selectTags': ['tag', 'value']
-        }
+        result = self.call_api('auditlog.get', {
+            'output': ['auditid', 'clock', 'resourceid', 'action'],
+            'filter': {
+                'resourcetype': AUDIT_RESOURCE_HOST,
+                'action': [AUDIT_ACTION_ADD, AUDIT_ACTION_UPDATE, AUDIT_ACTION_DELETE]
+            },
+            'time_from': since_clock,
+            'sortfield': 'clock',
+            'sortorder': 'ASC',
+            'limit': limit
+        })
+        if result is None:
+            raise RuntimeError("auditlog.get failed")
+        return result
+
+    def get_audit_watermark(self) -> int:
+        """
+        Get the clock of the newest host audit record (0 when there is none)
 
-        # Incremental sync - only changed hosts
-        if lastchange_since:
-            params['filter'] = {
-                'lastchange': f'{lastchange_since}:'
-            }
-            logger.info(f"Fetching hosts changed since {lastchange_since} ({datetime.fromtimestamp(lastchange_since)})")
-        else:
+        Raises:
+            RuntimeError: If the API call fails
+        """
+        result = self.call_api('auditlog.get', {
+            'output': ['clock'],
+            'filter': {'resourcetype': AUDIT_RESOURCE_HOST},
+            'sortfield': 'clock',
+            'sortorder': 'DESC',
+            'limit': 1
+        })
+        if result is None:
+            raise RuntimeError("auditlog.get (watermark) failed")
+        return int(result[0]['clock']) if result else 0
+
+    def iter_hosts(self, host_ids: List[str] = None,
+                   page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict]]:
+        """
+        Fetch hosts page by page
+
+        Requests groups, interfaces and tags for `page_size` hosts at a time
+        (hostids ranges of the sorted ID listing), so only a few pages of
+        host details are held in memory.
+
+        Args:
+            host_ids: Hosts to fetch; all hosts when omitted
+            page_size: Hosts per host.get call
+
+        Yields:
+            Lists of host dictionaries (at most page_size each)
+
+        Raises:
+            RuntimeError: If a page cannot be fetched (callers must not treat a
+                partial listing as complete)
+        """
+        if host_ids is None:
             logger.info("Fetching all hosts (full sync)")
+            host_ids = self.get_host_ids()
+        else:
+            host_ids = sorted(host_ids, key=int)
+        pages = (len(host_ids) + page_size - 1) // page_size
+        logger.info(f"Fetching {len(host_ids)} hosts ({pages} pages of {page_size})")
+
+        # Keep up to max_workers pages in flight so the next pages download
+        # while the caller writes the current one
+        starts = iter(range(0, len(host_ids), page_size))
+        in_flight = deque()
+        try:
+            for page in range(1, pages + 1):
+                while len(in_flight) < self.max_workers:
+                    start = next(starts, None)
+                    if start is None:
+                        break
+                    in_flight.append(self.submit('host.get', {
+                        'output': ['hostid', 'host', 'name', 'status', 'available',
+                                  'maintenance_status', 'lastaccess', 'ipmi_available'],
+                        'hostids': host_ids[start:start + page_size],
+                        'sortfield': 'hostid',
+                        'selectGroups': ['groupid', 'name'],
+                        'selectInterfaces': ['interfaceid', 'ip', 'port', 'type'],
+                        'selectTags': ['tag', 'value']
+                    }))
+
+                hosts = in_flight.popleft().result()
+                if hosts is None:
+                    raise RuntimeError(f"host.get page {page}/{pages} failed")
+                yield hosts
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def get_hosts(self, host_ids: List[str] = None) -> List[Dict]:
+        """
+        Get hosts as one list
+
+        Args:
+            host_ids: Hosts to fetch; all hosts when omitted
 
-        return self.call_api('host.get', params) or []
+        Returns:
+            List of host dictionaries
+        """
+        try:
+            return [host for page in self.iter_hosts(host_ids) for host in page]
+        except RuntimeError as e:
+            logger.error(f"Error fetching hosts: {e}")
+            return []
 
 
 class ZabbixHostRegistrySync:
@@ -176,7 +370,9 @@ class ZabbixHostRegistrySync:
 
     def __init__(self, api_url: str, username: str, password: str,
                  incremental: bool = True, site_id: str = "site-001",
-                 topic_prefix: str = "aismc", publish_to_cloud: bool = True):
+                 topic_prefix: str = "aismc", publish_to_cloud: bool = True,
+                 page_size: int = DEFAULT_PAGE_SIZE, api_workers: int = DEFAULT_API_WORKERS,
+                 reconcile_interval: int = 3600, full_sync_interval: int = 86400):
         """
         Initialize sync service
 
@@ -184,10 +380,14 @@ class ZabbixHostRegistrySync:
             api_url: Zabbix API endpoint
             username: Zabbix username
             password: Zabbix password
-            incremental: Enable incremental sync (only changed hosts)
+            incremental: Enable incremental sync (audit log watermark)
             site_id: Site identifier for cloud publishing
             topic_prefix: MQTT topic prefix
             publish_to_cloud: Enable cloud publishing (v2.0 feature)
+            page_size: Hosts fetched and written per host.get call
+            api_workers: Concurrent Zabbix API calls (host pages fetched ahead)
+            reconcile_interval: Seconds between id-only reconciliations (deletion detection)
+            full_sync_interval: Seconds between full syncs
         """
         self.api_url = api_url
         self.username = username
@@ -196,6 +396,9 @@ class ZabbixHostRegistrySync:
         self.site_id = site_id
         self.topic_prefix = topic_prefix
         self.publish_to_cloud = publish_to_cloud
+        self.page_size = page_size
+        self.reconcile_interval = reconcile_interval
+        self.full_sync_interval = full_sync_interval
 
         # Initialize database
         self.db_manager = DatabaseManager()
@@ -205,7 +408,7 @@ class ZabbixHostRegistrySync:
         self.sync_log_dao = SyncLogDAO(self.db_manager)
 
         # Initialize Zabbix API client
-        self.zabbix = ZabbixAPIClient(api_url, username, password)
+        self.zabbix = ZabbixAPIClient(api_url, username, password, max_workers=api_workers)
 
         # Initialize Greengrass IPC client (v2.0 feature)
         self.ipc_client = None
@@ -222,16 +425,21 @@ class ZabbixHostRegistrySync:
         logger.info(f"Incremental Sync: {incremental}")
         logger.info(f"Cloud Publishing: {self.publish_to_cloud}")
 
-    def sync_host_groups(self) -> int:
+    def sync_host_groups(self, groups: List[Dict] = None) -> int:
         """
         Sync host groups from Zabbix to SQLite
 
+        Args:
+            groups: Host groups already fetched (e.g. concurrently with the
+                hosts); fetched here when omitted
+
         Returns:
             Number of host groups synced
         """
         try:
             logger.info("Syncing host groups...")
-            groups = self.zabbix.get_host_groups()
+            if groups is None:
+                groups = self.zabbix.get_host_groups()
 
             if not groups:
                 logger.warning("No host groups found")
@@ -261,101 +469,183 @@ class ZabbixHostRegistrySync:
             logger.error(f"Error syncing host groups: {e}")
             return 0
 
+    def _get_int_config(self, key: str) -> Optional[int]:
+        """Read an integer configuration value (None when unset)"""
+        value = self.config_dao.get(key)
+        return int(value) if value not in (None, '') else None
+
+    def _sync_host_pages(self, host_ids: Optional[List[str]], stored_hashes: Dict[str, str],
+                         stats: Dict) -> set:
+        """
+        Fetch hosts page by page and write new/changed devices
+
+        Returns:
+            device_ids of every fetched host
+        """
+        seen_ids = set()
+        for hosts in self.zabbix.iter_hosts(host_ids, page_size=self.page_size):
+            devices_data = [self._transform_host(host) for host in hosts]
+            page_stats = self.device_dao.sync_upsert(devices_data, stored_hashes=stored_hashes)
+            for key in ('total', 'new', 'updated', 'unchanged'):
+                stats[key] += page_stats[key]
+            seen_ids.update(device['device_id'] for device in devices_data)
+        return seen_ids
+
     def sync_hosts(self) -> Dict[str, int]:
         """
         Sync hosts from Zabbix to SQLite
 
+        Full sync (first run, --full, or every full_sync_interval): every
+        host is fetched page by page and hashed devices missing from Zabbix
+        are soft-deleted.
+
+        Incremental sync: only hosts named by host audit records newer than
+        the stored watermark are fetched; deleted hosts are soft-deleted.
+        Every reconcile_interval an id-only host.get is diffed against the
+        local devices to catch deletions and additions the audit log missed
+        (e.g. audit logging disabled).
+
+        The watermark (audit clock of the newest applied record) and the
+        full sync / reconcile times are stored together, in one transaction,
+        only after the deletions succeed; records at the watermark clock are
+        re-read next time, which the content hash makes cheap.
+
         Returns:
-            Statistics dict with counts
+            Statistics dict with counts and the sync mode
         """
+        stats = {'mode': 'incremental', 'total': 0, 'new': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
         try:
-            # Get last sync timestamp for incremental sync
-            last_sync_unix = 0
-            if self.incremental:
-                last_sync_str = self.config_dao.get('last_sync_unix')
-                if last_sync_str and last_sync_str != '0':
-                    last_sync_unix = int(last_sync_str)
-
-            logger.info("Syncing hosts...")
-            hosts = self.zabbix.get_hosts(last_sync_unix if last_sync_unix > 0 else None)
-
-            if not hosts:
-                logger.info("No hosts to sync")
-                return {'total': 0, 'new': 0, 'updated': 0}
-
-            # Transform to device format
-            devices_data = []
-            for host in hosts:
-                # Get primary IP from interfaces
-                ip_address = None
-                port = '10050'
-                if host.get('interfaces'):
-                    primary_interface = host['interfaces'][0]
-                    ip_address = primary_interface.get('ip')
-                    port = primary_interface.get('port', '10050')
-
-                # Determine device type from host groups
-                device_type = 'unknown'
-                host_groups_str = ''
-                if host.get('groups'):
-                    group_names = [g['name'].lower() for g in host['groups']]
-                    host_groups_str = ','.join([g['groupid'] for g in host['groups']])
-
-                    # Classify device type
-                    if any('camera' in name for name in group_names):
-                        device_type = 'camera'
-                    elif any('server' in name for name in group_names):
-                        device_type = 'server'
-                    elif any('network' in name or 'switch' in name or 'router' in name for name in group_names):
-                        device_type = 'network'
-
-                # Map Zabbix status to our status
-                status_map = {
-                    '0': 'online',   # Monitored
-                    '1': 'offline'   # Not monitored
-                }
-                status = status_map.get(host.get('status', '1'), 'unknown')
-
-                # Create device record
-                device_id = f"DEV-{host['hostid']}"
-                device = {
-                    'device_id': device_id,
-                    'zabbix_host_id': host['hostid'],
-                    'host_name': host['host'],
-                    'visible_name': host.get('name', host['host']),
-                    'device_type': device_type,
-                    'ip_address': ip_address,
-                    'port': port,
-                    'status': status,
-                    'available': int(host.get('available', 0)),
-                    'maintenance_status': int(host.get('maintenance_status', 0)),
-                    'lastchange': int(time.time()),  # Current time as lastchange
-                    'host_groups': host_groups_str,
-                    'tags': host.get('tags', []),
-                    'ngsi_ld': self._create_ngsi_ld(device_id, host, device_type)
-                }
-
-                devices_data.append(device)
+            now = int(time.time())
+            watermark = self._get_int_config(WATERMARK_KEY)
+            last_full = self._get_int_config(LAST_FULL_SYNC_KEY) or 0
+            last_reconcile = self._get_int_config(LAST_RECONCILE_KEY) or 0
+
+            changes = []
+            if self.incremental and watermark is not None and now - last_full < self.full_sync_interval:
+                changes = self.zabbix.get_host_changes(watermark)
+                if len(changes) >= AUDIT_LIMIT:
+                    logger.warning(f"{len(changes)}+ host audit records since {watermark} - running a full sync")
+                    stats['mode'] = 'full'
+            else:
+                stats['mode'] = 'full'
+
+            logger.info(f"Syncing hosts ({stats['mode']})...")
+            stored_hashes = self.device_dao.get_content_hashes()
+
+            if stats['mode'] == 'full':
+                # Read the marker before listing so changes made during the
+                # fetch are picked up by the next incremental sync
+                new_watermark = self.zabbix.get_audit_watermark()
+                seen_ids = self._sync_host_pages(None, stored_hashes, stats)
+                if not seen_ids and stored_hashes:
+                    raise RuntimeError("Zabbix returned no hosts - refusing to delete all devices")
+                deleted = [device_id for device_id in stored_hashes if device_id not in seen_ids]
+                state = {LAST_FULL_SYNC_KEY: str(now), LAST_RECONCILE_KEY: str(now)}
+            else:
+                new_watermark = max([int(c['clock']) for c in changes], default=watermark)
+                deleted_hosts = {c['resourceid'] for c in changes if int(c['action']) == AUDIT_ACTION_DELETE}
+                changed_hosts = {c['resourceid'] for c in changes} - deleted_hosts
+                state = {}
+
+                if now - last_reconcile >= self.reconcile_interval:
+                    stats['mode'] = 'reconcile'
+                    zabbix_hosts = set(self.zabbix.get_host_ids())
+                    local_hosts = {self._host_id(device_id) for device_id in stored_hashes}
+                    deleted_hosts |= local_hosts - zabbix_hosts
+                    changed_hosts |= zabbix_hosts - local_hosts
+                    state[LAST_RECONCILE_KEY] = str(now)
+
+                if changed_hosts:
+                    self._sync_host_pages(list(changed_hosts), stored_hashes, stats)
+                deleted = [device_id for device_id in map(self._device_id, deleted_hosts)
+                           if device_id in stored_hashes]
+
+            # Soft-delete in bulk
+            self.device_dao.mark_as_deleted(deleted)
+            stats['deleted'] = len(deleted)
+
+            logger.info(
+                f"✅ Synced {stats['total']} devices ({stats['mode']}: {stats['new']} new, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged, {stats['deleted']} deleted)"
+            )
 
-            # Batch upsert devices
-            count = self.device_dao.batch_upsert(devices_data)
-            logger.info(f"✅ Synced {count} devices")
+            # Sync state last: a failure above leaves the previous state, so the
+            # next run repeats this sync instead of trusting a partial one
+            self.config_dao.set_many({**state, WATERMARK_KEY: str(new_watermark)})
 
             # Update config
-            total_devices = self.device_dao.get_count()
-            self.config_dao.set('total_devices', str(total_devices))
+            if stats['new'] or stats['deleted']:
+                total_devices = self.device_dao.get_count()
+                self.config_dao.set('total_devices', str(total_devices))
             self.config_dao.set('last_sync_timestamp', datetime.utcnow().isoformat() + 'Z')
-            self.config_dao.set('last_sync_unix', str(int(time.time())))
+            self.config_dao.set('last_sync_unix', str(now))
 
-            return {
-                'total': count,
-                'new': count,  # Simplified - would need to track this separately
-                'updated': 0
-            }
+            return stats
 
         except Exception as e:
             logger.error(f"Error syncing hosts: {e}")
-            return {'total': 0, 'new': 0, 'updated': 0, 'error': str(e)}
+            return {**stats, 'error': str(e)}
+
+    @staticmethod
+    def _device_id(host_id: str) -> str:
+        """device_id of a Zabbix host"""
+        return f"DEV-{host_id}"
+
+    @staticmethod
+    def _host_id(device_id: str) -> str:
+        """Zabbix hostid of a device_id created by _device_id()"""
+        return device_id[len('DEV-'):]
+
+    def _transform_host(self, host: Dict) -> Dict:
+        """Transform a Zabbix host into the DeviceDAO format"""
+        # Get primary IP from interfaces
+        ip_address = None
+        port = '10050'
+        if host.get('interfaces'):
+            primary_interface = host['interfaces'][0]
+            ip_address = primary_interface.get('ip')
+            port = primary_interface.get('port', '10050')
+
+        # Determine device type from host groups
+        device_type = 'unknown'
+        host_groups_str = ''
+        if host.get('groups'):
+            group_names = [g['name'].lower() for g in host['groups']]
+            host_groups_str = ','.join([g['groupid'] for g in host['groups']])
+
+            # Classify device type
+            if any('camera' in name for name in group_names):
+                device_type = 'camera'
+            elif any('server' in name for name in group_names):
+                device_type = 'server'
+            elif any('network' in name or 'switch' in name or 'router' in name for name in group_names):
+                device_type = 'network'
+
+        # Map Zabbix status to our status
+        status_map = {
+            '0': 'online',   # Monitored
+            '1': 'offline'   # Not monitored
+        }
+        status = status_map.get(host.get('status', '1'), 'unknown')
+
+        # Create device record
+        device_id = self._device_id(host['hostid'])
+        return {
+            'device_id': device_id,
+            'zabbix_host_id': host['hostid'],
+            'host_name': host['host'],
+            'visible_name': host.get('name', host['host']),
+            'device_type': device_type,
+            'ip_address': ip_address,
+            'port': port,
+            'status': status,
+            'available': int(host.get('available', 0)),
+            'maintenance_status': int(host.get('maintenance_status', 0)),
+            'lastchange': int(time.time()),  # Only written when the content hash changes
+            'host_groups': host_groups_str,
+            'tags': host.get('tags', []),
+            'ngsi_ld': self._create_ngsi_ld(device_id, host, device_type)
+        }
 
     def _create_ngsi_ld(self, device_id: str, host: Dict, device_type: str) -> Dict:
         """Create NGSI-LD representation of device"""
@@ -396,21 +686,8 @@ class ZabbixHostRegistrySync:
             # Get count by status
             by_status = self.device_dao.get_count_by_status()
 
-            # Get count by host group
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-
-            # Query device counts by host group
-            query = """
-                SELECT hg.name, COUNT(d.device_id) as count
-                FROM host_groups hg
-                LEFT JOIN devices d ON (',' || d.host_groups || ',') LIKE ('%,' || hg.groupid || ',%')
-                GROUP BY hg.groupid, hg.name
-                HAVING count > 0
-                ORDER BY count DESC
-            """
-            cursor.execute(query)
-            by_host_group = {row[0]: row[1] for row in cursor.fetchall()}
+            # Get count by host group (device_host_groups join table)
+            by_host_group = self.device_dao.get_count_by_host_group()
 
             # Create inventory summary
             summary = {
@@ -442,6 +719,27 @@ class ZabbixHostRegistrySync:
         except Exception as e:
             logger.error(f"Error publishing inventory summary: {e}")
 
+    @staticmethod
+    def _summarize_timings(timings: List[Dict]) -> Dict[str, Dict]:
+        """Aggregate per-call timings by API method"""
+        summary = {}
+        for timing in timings:
+            entry = summary.setdefault(timing['method'], {'calls': 0, 'failed': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['calls'] += 1
+            entry['failed'] += 0 if timing['ok'] else 1
+            entry['total_ms'] = round(entry['total_ms'] + timing['duration_ms'], 1)
+            entry['max_ms'] = max(entry['max_ms'], timing['duration_ms'])
+        return summary
+
+    def _sync_details(self, groups_count: int, hosts_stats: Dict, api_timings: List[Dict]) -> Dict:
+        """Structured sync_log details: stage counts and Zabbix API timings"""
+        return {
+            'host_groups': groups_count,
+            'hosts': hosts_stats,
+            'api': self._summarize_timings(api_timings),
+            'api_calls': api_timings
+        }
+
     def run_sync(self) -> bool:
         """
         Execute full sync cycle
@@ -454,36 +752,52 @@ class ZabbixHostRegistrySync:
         logger.info("  Zabbix Host Registry Sync - Starting")
         logger.info("="*70)
 
+        self.zabbix.pop_timings()
+
         try:
             # Authenticate
             if not self.zabbix.authenticate():
                 logger.error("❌ Authentication failed - aborting sync")
                 return False
 
-            # Sync host groups
-            groups_count = self.sync_host_groups()
+            # Fetch host groups in the background while hosts are fetched
+            # and written; all database writes stay on this thread
+            groups_future = self.zabbix.executor.submit(self.zabbix.get_host_groups)
 
             # Sync hosts
             hosts_stats = self.sync_hosts()
 
+            # Sync host groups
+            groups_count = self.sync_host_groups(groups_future.result())
+
             # Calculate duration
             duration_ms = int((time.time() - start_time) * 1000)
+            api_timings = self.zabbix.pop_timings()
 
             # Log sync
             self.sync_log_dao.log(
                 sync_type='host_registry',
                 records_synced=hosts_stats.get('total', 0),
-                status='success',
-                duration_ms=duration_ms
+                status='partial' if 'error' in hosts_stats else 'success',
+                error_message=hosts_stats.get('error'),
+                duration_ms=duration_ms,
+                details=self._sync_details(groups_count, hosts_stats, api_timings)
             )
 
-            # Publish inventory summary to cloud (v2.0 feature)
-            self.publish_inventory_summary()
+            # Publish inventory summary to cloud (v2.0 feature) - once per
+            # full sync, not on every incremental run
+            if hosts_stats.get('mode') == 'full':
+                self.publish_inventory_summary()
 
             logger.info("="*70)
             logger.info("  Sync Complete")
             logger.info(f"  Host Groups: {groups_count}")
-            logger.info(f"  Devices: {hosts_stats.get('total', 0)}")
+            logger.info(f"  Devices: {hosts_stats.get('total', 0)} "
+                        f"(new {hosts_stats.get('new', 0)}, updated {hosts_stats.get('updated', 0)}, "
+                        f"unchanged {hosts_stats.get('unchanged', 0)}, deleted {hosts_stats.get('deleted', 0)})")
+            for method, summary in self._summarize_timings(api_timings).items():
+                logger.info(f"  API {method}: {summary['calls']} calls, "
+                            f"{summary['total_ms']}ms total, {summary['max_ms']}ms max")
             logger.info(f"  Duration: {duration_ms}ms")
             logger.info("="*70)
 
@@ -498,7 +812,8 @@ class ZabbixHostRegistrySync:
                 records_synced=0,
                 status='error',
                 error_message=str(e),
-                duration_ms=duration_ms
+                duration_ms=duration_ms,
+                details={'api_calls': self.zabbix.pop_timings()}
             )
 
             return False
@@ -515,7 +830,7 @@ def main():
     parser.add_argument('--incremental', action='store_true', default=True,
                        help='Enable incremental sync')
     parser.add_argument('--full', action='store_true',
-                       help='Force full sync (ignore lastchange)')
+                       help='Always run full syncs (ignore the audit log watermark)')
     parser.add_argument('--schedule', type=int, default=0,
                        help='Run continuously with interval in seconds (0=run once)')
     parser.add_argument('--site-id', default='site-001',
@@ -524,6 +839,14 @@ def main():
                        help='MQTT topic prefix')
     parser.add_argument('--no-cloud-publish', action='store_true',
                        help='Disable cloud publishing (v2.0 feature)')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                       help='Hosts fetched per host.get call')
+    parser.add_argument('--api-workers', type=int, default=DEFAULT_API_WORKERS,
+                       help='Concurrent Zabbix API calls')
+    parser.add_argument('--reconcile-interval', type=int, default=3600,
+                       help='Seconds between id-only reconciliations (deletion detection)')
+    parser.add_argument('--full-sync-interval', type=int, default=86400,
+                       help='Seconds between full syncs')
 
     args = parser.parse_args()
 
@@ -535,7 +858,11 @@ def main():
         incremental=not args.full,
         site_id=args.site_id,
         topic_prefix=args.topic_prefix,
-        publish_to_cloud=not args.no_cloud_publish
+        publish_to_cloud=not args.no_cloud_publish,
+        page_size=args.page_size,
+        api_workers=args.api_workers,
+        reconcile_interval=args.reconcile_interval,
+        full_sync_interval=args.full_sync_interval
     )
 
     # Run once or continuously based on schedule
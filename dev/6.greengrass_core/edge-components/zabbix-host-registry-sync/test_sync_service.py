@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Test suite for ZabbixHostRegistrySync
+Tests paged host fetching, concurrent API calls and the incremental /
+reconcile / full host sync against a stubbed Zabbix API (call_api)
+
+Runs on a copy of the database, so soft deletes and sync state written by
+the tests never touch the deployed data:
+
+    python3 test_sync_service.py [/var/greengrass/database/greengrass.db]
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# DAO layer from the repository, then the component
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'edge-database', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from database import DatabaseManager
+from sync_service import (
+    ZabbixAPIClient,
+    ZabbixHostRegistrySync,
+    AUDIT_ACTION_ADD,
+    AUDIT_ACTION_UPDATE,
+    AUDIT_ACTION_DELETE,
+    WATERMARK_KEY,
+    LAST_FULL_SYNC_KEY,
+    LAST_RECONCILE_KEY
+)
+
+DEFAULT_DB_PATH = "/var/greengrass/database/greengrass.db"
+
+# Host ids well above any real installation's
+FIRST_HOST_ID = 990001
+
+
+def log_test(message: str, status: str = "INFO"):
+    """Log test output with color"""
+    colors = {
+        "INFO": "\033[0;36m",     # Cyan
+        "SUCCESS": "\033[0;32m",   # Green
+        "ERROR": "\033[0;31m",     # Red
+        "RESET": "\033[0m"
+    }
+    color = colors.get(status, colors["INFO"])
+    print(f"{color}[{status}]{colors['RESET']} {message}")
+
+
+class FakeZabbixAPIClient(ZabbixAPIClient):
+    """
+    ZabbixAPIClient whose call_api() answers from in-memory hosts and
+    host audit records instead of a Zabbix server
+    """
+
+    def __init__(self, max_workers: int = 2):
+        super().__init__('http://zabbix.invalid/api_jsonrpc.php', 'test', 'test', max_workers=max_workers)
+        self.auth_token = 'test-token'
+        self.hosts = {}
+        self.audit = []
+        self.clock = 1000
+        self.calls = []
+        self.failing_host_ids = set()
+        self.lock = threading.Lock()
+
+    def add_host(self, host_id: int, name: str, audit: bool = True):
+        """Create or rename a host, recording an add/update audit record"""
+        host_id = str(host_id)
+        action = AUDIT_ACTION_UPDATE if host_id in self.hosts else AUDIT_ACTION_ADD
+        self.hosts[host_id] = {
+            'hostid': host_id, 'host': name, 'name': name, 'status': '0', 'available': '1',
+            'maintenance_status': '0', 'groups': [{'groupid': '1', 'name': 'Cameras'}],
+            'interfaces': [{'interfaceid': host_id, 'ip': '10.0.0.1', 'port': '10050', 'type': '1'}],
+            'tags': []
+        }
+        if audit:
+            self._record(host_id, action)
+
+    def delete_host(self, host_id: int, audit: bool = True):
+        """Delete a host, recording a delete audit record unless audit is False"""
+        del self.hosts[str(host_id)]
+        if audit:
+            self._record(str(host_id), AUDIT_ACTION_DELETE)
+
+    def _record(self, host_id: str, action: int):
+        self.clock += 1
+        self.audit.append({'auditid': str(len(self.audit) + 1), 'clock': str(self.clock),
+                           'resourceid': host_id, 'action': str(action)})
+
+    def call_api(self, method, params=None):
+        params = params or {}
+        with self.lock:
+            self.calls.append((method, params))
+        result = None
+        if method == 'host.get' and 'hostids' in params:
+            if not self.failing_host_ids & set(params['hostids']):
+                result = [self.hosts[host_id] for host_id in params['hostids'] if host_id in self.hosts]
+        elif method == 'host.get':
+            result = [{'hostid': host_id} for host_id in sorted(self.hosts, key=int)]
+        elif method == 'hostgroup.get':
+            result = [{'groupid': '1', 'name': 'Cameras', 'flags': '0'}]
+        elif method == 'auditlog.get' and params.get('sortorder') == 'DESC':
+            result = [{'clock': record['clock']} for record in self.audit[-1:]]
+        elif method == 'auditlog.get':
+            records = [record for record in self.audit if int(record['clock']) >= params['time_from']]
+            result = records[:params['limit']]
+        self._record_timing(method, time.perf_counter(), result is not None)
+        return result
+
+
+def host_get_pages(client: FakeZabbixAPIClient) -> list:
+    """hostids of each paged host.get call made so far"""
+    return [params['hostids'] for method, params in client.calls if method == 'host.get' and 'hostids' in params]
+
+
+def copy_database(source_path: str) -> str:
+    """Copy the database (consistent online backup) to a temporary file"""
+    target_path = os.path.join(tempfile.mkdtemp(prefix='host-sync-test-'), 'greengrass.db')
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+    return target_path
+
+
+def make_sync(client: FakeZabbixAPIClient, **kwargs) -> ZabbixHostRegistrySync:
+    """Sync service wired to the fake client"""
+    sync = ZabbixHostRegistrySync('http://zabbix.invalid/api_jsonrpc.php', 'test', 'test',
+                                  publish_to_cloud=False, page_size=3, **kwargs)
+    sync.zabbix.close()
+    sync.zabbix = client
+    return sync
+
+
+def device_status(sync: ZabbixHostRegistrySync, host_id: int) -> str:
+    device = sync.device_dao.get_by_id(f"DEV-{host_id}")
+    return device['status'] if device else None
+
+
+def test_api_client():
+    """Test paged host fetching with prefetch, call_many ordering and timings"""
+    log_test("Testing ZabbixAPIClient paging and concurrent calls...")
+
+    try:
+        client = FakeZabbixAPIClient(max_workers=2)
+        for offset in range(7):
+            client.add_host(FIRST_HOST_ID + offset, f"cam-{offset}")
+
+        # Sorted id listing split into page_size chunks, yielded in order
+        pages = list(client.iter_hosts(page_size=3))
+        assert [len(page) for page in pages] == [3, 3, 1], f"Unexpected page sizes: {[len(p) for p in pages]}"
+        fetched = [host['hostid'] for page in pages for host in page]
+        assert fetched == sorted(client.hosts, key=int), "Hosts not yielded in hostid order"
+        assert len(host_get_pages(client)) == 3, "Each page not fetched exactly once"
+        log_test(f"✅ 7 hosts fetched in pages of {[len(page) for page in pages]}", "SUCCESS")
+
+        # A failed page raises instead of ending the listing early
+        client.failing_host_ids = {str(FIRST_HOST_ID + 4)}
+        try:
+            list(client.iter_hosts(page_size=3))
+            raise AssertionError("Failed page did not raise")
+        except RuntimeError:
+            pass
+        assert client.get_hosts() == [], "get_hosts returned a partial listing"
+        client.failing_host_ids = set()
+        log_test("✅ Failed page raises RuntimeError", "SUCCESS")
+
+        # call_many keeps the order of the calls; every call is timed
+        client.pop_timings()
+        results = client.call_many([('hostgroup.get', {}), ('host.get', {'output': ['hostid']}),
+                                    ('unknown.get', {})])
+        assert results[0][0]['name'] == 'Cameras' and len(results[1]) == 7 and results[2] is None, \
+            "call_many results out of order"
+        timings = client.pop_timings()
+        assert sorted(t['method'] for t in timings) == ['host.get', 'hostgroup.get', 'unknown.get'], \
+            f"Unexpected timings: {timings}"
+        assert [t['ok'] for t in timings if t['method'] == 'unknown.get'] == [False], "Failed call not timed"
+        assert client.pop_timings() == [], "Timings not reset"
+        log_test(f"✅ call_many ordered, {len(timings)} calls timed", "SUCCESS")
+
+        client.close()
+
+    except Exception as e:
+        log_test(f"❌ ZabbixAPIClient test failed: {e}", "ERROR")
+        raise
+
+
+def test_incremental_sync():
+    """Test full sync, then incremental add/update/delete from the audit log"""
+    log_test("Testing full and incremental host sync...")
+
+    try:
+        client = FakeZabbixAPIClient()
+        for offset in range(5):
+            client.add_host(FIRST_HOST_ID + offset, f"cam-{offset}")
+        sync = make_sync(client, reconcile_interval=10 ** 9, full_sync_interval=10 ** 9)
+
+        # First run: full sync (devices of the copied database missing from
+        # the fake Zabbix are soft-deleted)
+        stats = sync.sync_hosts()
+        assert 'error' not in stats and stats['mode'] == 'full', f"Unexpected stats: {stats}"
+        assert stats['new'] == 5 or stats['total'] == 5, f"Hosts not synced: {stats}"
+        assert sync.config_dao.get(WATERMARK_KEY) == str(client.clock), "Watermark not stored"
+        assert sync.config_dao.get(LAST_FULL_SYNC_KEY), "Full sync time not stored"
+        log_test(f"✅ Full sync: {stats}", "SUCCESS")
+
+        # Nothing changed: only the record at the watermark clock is re-read,
+        # and the content hash leaves that host unwritten
+        client.calls.clear()
+        stats = sync.sync_hosts()
+        assert stats['mode'] == 'incremental' and stats['total'] == stats['unchanged'] <= 1, \
+            f"Unexpected stats: {stats}"
+        assert [method for method, _ in client.calls].count('auditlog.get') == 1, f"Unexpected calls: {client.calls}"
+        log_test(f"✅ Idle incremental sync wrote nothing: {stats}", "SUCCESS")
+
+        # Add, update and delete: only the changed hosts (and the one at the
+        # previous watermark clock) are fetched
+        watermark_host = client.audit[-1]['resourceid']
+        client.add_host(FIRST_HOST_ID + 5, 'cam-new')
+        client.add_host(FIRST_HOST_ID + 1, 'cam-renamed')
+        client.delete_host(FIRST_HOST_ID + 2)
+        client.calls.clear()
+        stats = sync.sync_hosts()
+        assert stats['mode'] == 'incremental', f"Unexpected mode: {stats}"
+        assert (stats['new'], stats['updated'], stats['deleted']) == (1, 1, 1), f"Unexpected stats: {stats}"
+        fetched = {host_id for page in host_get_pages(client) for host_id in page} - {watermark_host}
+        assert fetched == {str(FIRST_HOST_ID + 1), str(FIRST_HOST_ID + 5)}, f"Unexpected fetch: {fetched}"
+        assert sync.device_dao.get_by_id(f"DEV-{FIRST_HOST_ID + 1}")['host_name'] == 'cam-renamed', \
+            "Updated host not written"
+        assert device_status(sync, FIRST_HOST_ID + 2) == 'deleted', "Deleted host not soft-deleted"
+        assert sync.config_dao.get(WATERMARK_KEY) == str(client.clock), "Watermark not advanced"
+        log_test(f"✅ Incremental add/update/delete: {stats}", "SUCCESS")
+
+        return sync, client
+
+    except Exception as e:
+        log_test(f"❌ Incremental sync test failed: {e}", "ERROR")
+        raise
+
+
+def test_reconcile(sync: ZabbixHostRegistrySync, client: FakeZabbixAPIClient):
+    """Test that reconciliation finds a deletion the audit log missed"""
+    log_test("Testing reconciliation...")
+
+    try:
+        client.delete_host(FIRST_HOST_ID + 3, audit=False)
+        stats = sync.sync_hosts()
+        assert stats['deleted'] == 0, "Unaudited delete seen without reconciliation"
+
+        sync.reconcile_interval = 0
+        stats = sync.sync_hosts()
+        sync.reconcile_interval = 10 ** 9
+        assert stats['mode'] == 'reconcile' and stats['deleted'] == 1, f"Unexpected stats: {stats}"
+        assert device_status(sync, FIRST_HOST_ID + 3) == 'deleted', "Missed delete not soft-deleted"
+        assert sync.config_dao.get(LAST_RECONCILE_KEY), "Reconcile time not stored"
+        log_test(f"✅ Reconcile found the missed delete: {stats}", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Reconcile test failed: {e}", "ERROR")
+        raise
+
+
+def test_failed_syncs(sync: ZabbixHostRegistrySync, client: FakeZabbixAPIClient):
+    """Test that failed or empty listings delete nothing and keep the sync state"""
+    log_test("Testing failed full syncs...")
+
+    try:
+        sync.incremental = False
+        # Older state than any run below could write (they finish within a second)
+        sync.config_dao.set_many({LAST_FULL_SYNC_KEY: '1', LAST_RECONCILE_KEY: '1'})
+        state = {key: sync.config_dao.get(key) for key in (WATERMARK_KEY, LAST_FULL_SYNC_KEY, LAST_RECONCILE_KEY)}
+
+        # A host page fails: the sync stops before deleting the removed host
+        client.delete_host(FIRST_HOST_ID + 4)
+        client.failing_host_ids = {str(FIRST_HOST_ID)}
+        stats = sync.sync_hosts()
+        client.failing_host_ids = set()
+        assert 'error' in stats and stats['deleted'] == 0, f"Failed page not reported: {stats}"
+        assert device_status(sync, FIRST_HOST_ID + 4) != 'deleted', "Device deleted after a failed page"
+        assert {key: sync.config_dao.get(key) for key in state} == state, "Sync state written by a failed sync"
+        log_test(f"✅ Failed page: nothing deleted, sync state kept", "SUCCESS")
+
+        # Zabbix lists no hosts at all: refuse to delete every device
+        hosts, client.hosts = client.hosts, {}
+        stats = sync.sync_hosts()
+        client.hosts = hosts
+        assert 'error' in stats and stats['deleted'] == 0, f"Empty listing not refused: {stats}"
+        assert device_status(sync, FIRST_HOST_ID) != 'deleted', "Devices deleted on an empty listing"
+        assert {key: sync.config_dao.get(key) for key in state} == state, "Sync state written by a failed sync"
+        log_test(f"✅ Empty listing refused", "SUCCESS")
+
+        # The deletion itself fails: no sync state claims a finished full sync
+        mark_as_deleted = sync.device_dao.mark_as_deleted
+
+        def failing_mark_as_deleted(device_ids):
+            raise RuntimeError("database is locked")
+
+        sync.device_dao.mark_as_deleted = failing_mark_as_deleted
+        stats = sync.sync_hosts()
+        sync.device_dao.mark_as_deleted = mark_as_deleted
+        assert 'error' in stats, f"Failed deletion not reported: {stats}"
+        assert {key: sync.config_dao.get(key) for key in state} == state, "Sync state written before the deletion"
+        log_test(f"✅ Failed deletion: sync state kept", "SUCCESS")
+
+        # The next full sync completes the deletion
+        stats = sync.sync_hosts()
+        assert 'error' not in stats and device_status(sync, FIRST_HOST_ID + 4) == 'deleted', \
+            f"Deletion not applied by the next sync: {stats}"
+        log_test(f"✅ Next full sync applied the deletion", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Failed sync test failed: {e}", "ERROR")
+        raise
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 70)
+    print("  ZABBIX HOST REGISTRY SYNC TEST SUITE")
+    print("=" * 70 + "\n")
+
+    try:
+        db_path = copy_database(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
+        DatabaseManager(db_path)
+        log_test(f"Using database copy: {db_path}")
+        print()
+
+        # Test 1: API client paging and concurrent calls
+        test_api_client()
+        print()
+
+        # Test 2: Full and incremental sync
+        sync, client = test_incremental_sync()
+        print()
+
+        # Test 3: Reconciliation
+        test_reconcile(sync, client)
+        print()
+
+        # Test 4: Failed and empty listings
+        test_failed_syncs(sync, client)
+        print()
+
+        print("=" * 70)
+        log_test("✅ ALL TESTS PASSED", "SUCCESS")
+        print("=" * 70 + "\n")
+
+        return 0
+
+    except Exception as e:
+        print("\n" + "=" * 70)
+        log_test(f"❌ TEST SUITE FAILED: {e}", "ERROR")
+        print("=" * 70 + "\n")
+        return 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
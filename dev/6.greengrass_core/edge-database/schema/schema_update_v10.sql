@@ -0,0 +1,87 @@
+-- ============================================================================
+-- Database Schema Migration v10.0: Epoch-Millisecond Incident Detection Time
+-- Purpose: Windowed incident queries (recent incidents, analytics, cleanup)
+--          compare an indexed INTEGER instead of ISO-8601 text, which was
+--          compared against Unix timestamps / datetime() output of a
+--          different format
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable column). Existing rows are backfilled
+--                     in chunks after this migration by
+--                     IncidentDAO.backfill_detected_at_ms() (Terraform
+--                     backfill_incidents_detected_at_ms), so the write lock
+--                     is never held for a whole-table UPDATE
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: incidents.detected_at_ms
+-- ============================================================================
+-- Unix epoch milliseconds of detected_at, written together with it on
+-- insert: CAST(ROUND((julianday(detected_at) - 2440587.5) * 86400000) AS INTEGER)
+-- NULL only for rows not backfilled yet or with an unparseable detected_at.
+ALTER TABLE incidents ADD COLUMN detected_at_ms INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_incidents_detected_ms ON incidents(detected_at_ms);
+
+-- Replaced by idx_incidents_detected_ms (no query ranges over the text column)
+DROP INDEX IF EXISTS idx_incidents_detected;
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '10.0.0',
+    'incidents.detected_at_ms (indexed epoch milliseconds) for windowed queries',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '10.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'incidents.detected_at_ms:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('incidents')
+WHERE name = 'detected_at_ms';
+-- Expected: 1
+
+SELECT
+    'Incidents awaiting backfill:' as check_name,
+    COUNT(*) as result
+FROM incidents
+WHERE detected_at_ms IS NULL;
+-- Expected: 0 once backfill_detected_at_ms() has run
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 10.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Older DAO code ignores the column. To restore the previous index layout:
+--
+--    CREATE INDEX IF NOT EXISTS idx_incidents_detected ON incidents(detected_at);
+--    DROP INDEX IF EXISTS idx_incidents_detected_ms;
+--    ALTER TABLE incidents DROP COLUMN detected_at_ms;   -- SQLite 3.35+
+--    DELETE FROM _metadata WHERE schema_version = '10.0.0';
+--
+-- ============================================================================
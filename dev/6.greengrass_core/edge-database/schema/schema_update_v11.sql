@@ -0,0 +1,82 @@
+-- ============================================================================
+-- Database Schema Migration v11.0: Message Queue Leases
+-- Purpose: Forwarder workers claim messages atomically (status 'inflight'
+--          with a lease) instead of reading pending rows, so several
+--          workers/processes can drain the queue without publishing the
+--          same message twice; expired leases are recovered
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable columns). Expired leases are found
+--                     through idx_queue_status_created (status = 'inflight'
+--                     matches at most workers x batch size rows)
+-- Requires: SQLite 3.35+ (UPDATE ... RETURNING in MessageQueueDAO.claim_pending)
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Lease columns
+-- ============================================================================
+-- Set by MessageQueueDAO.claim_pending together with status = 'inflight'.
+-- lease_until: UTC 'YYYY-MM-DD HH:MM:SS' (same format as CURRENT_TIMESTAMP);
+-- an inflight row past it belongs to a worker that died or hung and is put
+-- back to 'pending' (counting an attempt) by the next claim.
+-- claimed_by: worker that holds the lease (diagnostics only)
+ALTER TABLE message_queue ADD COLUMN lease_until DATETIME;
+ALTER TABLE message_queue ADD COLUMN claimed_by TEXT;
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '11.0.0',
+    'message_queue lease_until / claimed_by for atomic claims',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '11.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'message_queue lease columns:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('message_queue')
+WHERE name IN ('lease_until', 'claimed_by');
+-- Expected: 2
+
+SELECT
+    'Messages by status:' as check_name,
+    group_concat(status || '=' || count, ', ') as result
+FROM (SELECT status, COUNT(*) as count FROM message_queue GROUP BY status);
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 11.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Stop the forwarder first, then return claimed messages to the queue:
+--
+--    UPDATE message_queue SET status = 'pending' WHERE status = 'inflight';
+--    ALTER TABLE message_queue DROP COLUMN claimed_by;    -- SQLite 3.35+
+--    ALTER TABLE message_queue DROP COLUMN lease_until;   -- SQLite 3.35+
+--    DELETE FROM _metadata WHERE schema_version = '11.0.0';
+--
+-- ============================================================================
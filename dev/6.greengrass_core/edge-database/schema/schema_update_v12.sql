@@ -0,0 +1,90 @@
+-- ============================================================================
+-- Database Schema Migration v12.0: Incident Outbox
+-- Purpose: Inserting or resolving an incident queues its cloud message in
+--          message_queue in the same transaction (IncidentDAO.enqueue_outbox),
+--          so the forwarder drains one source instead of a second sync path
+--          re-scanning incidents for unsynced rows
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable column, configuration key).
+--                     The outbox starts disabled; the forwarder enables it
+--                     when it starts. Incidents stored before that are not
+--                     replayed (they are covered by the analytics summaries)
+-- Requires: SQLite JSON functions (json_set / json_valid for the resolution
+--           payload; built in since 3.38, enabled in Ubuntu 22.04's 3.37)
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Link outbox messages to their incident
+-- ============================================================================
+-- Set by IncidentDAO.enqueue_outbox; MessageQueueDAO.mark_sent_many marks
+-- the incident synced_to_cloud when its message is sent (which also makes
+-- it eligible for cleanup_old_incidents). NULL for other messages.
+ALTER TABLE message_queue ADD COLUMN incident_id TEXT;
+
+-- ============================================================================
+-- STEP 2: Outbox switch
+-- ============================================================================
+-- 'true' queues a message per incident insert/resolve. Off by default so
+-- message_queue does not grow on sites where the forwarder is disabled
+INSERT OR IGNORE INTO configuration (key, value, description) VALUES
+    ('outbox_enabled', 'false', 'Queue a cloud message in message_queue for every incident insert/resolve (set by the message forwarder)');
+
+-- ============================================================================
+-- STEP 3: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '12.0.0',
+    'Incident outbox: message_queue.incident_id and outbox_enabled switch',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '12.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'message_queue incident_id column:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('message_queue')
+WHERE name = 'incident_id';
+-- Expected: 1
+
+SELECT
+    'Outbox enabled:' as check_name,
+    value as result
+FROM configuration
+WHERE key = 'outbox_enabled';
+-- Expected: false (true once the forwarder has started)
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 12.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Deploy the previous DAO layer first (it does not write the column), then:
+--
+--    ALTER TABLE message_queue DROP COLUMN incident_id;   -- SQLite 3.35+
+--    DELETE FROM configuration WHERE key = 'outbox_enabled';
+--    DELETE FROM _metadata WHERE schema_version = '12.0.0';
+--
+-- ============================================================================
@@ -0,0 +1,108 @@
+-- ============================================================================
+-- Database Schema Migration v13.0: Message Dead-Letter Table
+-- Purpose: Messages that used up their attempts move out of message_queue
+--          into message_dead_letter (MessageQueueDAO.increment_attempts),
+--          so the queue holds only messages that can still be sent.
+--          Failed attempts now also reschedule the message (scheduled_at)
+--          with exponential backoff; no schema change is needed for that
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (new table); existing failed messages are moved
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Dead-letter table
+-- ============================================================================
+-- Same message columns as message_queue; failed_at drives
+-- MessageQueueDAO.cleanup_old_messages(dead_letter_days) and
+-- get_dead_letters() ordering. requeue_dead_letters() moves rows back.
+CREATE TABLE IF NOT EXISTS message_dead_letter (
+    message_id TEXT PRIMARY KEY,
+    incident_id TEXT,
+    topic TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER,
+    attempts INTEGER,
+    last_error TEXT,
+    created_at DATETIME,
+    failed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_dead_letter_failed ON message_dead_letter(failed_at);
+
+-- ============================================================================
+-- STEP 2: Move messages that already used up their attempts
+-- ============================================================================
+-- Includes pending rows at max_attempts, which no query would ever pick up
+INSERT OR REPLACE INTO message_dead_letter (
+    message_id, incident_id, topic, payload, priority, attempts, last_error, created_at
+)
+SELECT message_id, incident_id, topic, payload, priority, attempts, last_error, created_at
+FROM message_queue
+WHERE status = 'failed'
+OR (status = 'pending' AND attempts >= max_attempts);
+
+DELETE FROM message_queue
+WHERE status = 'failed'
+OR (status = 'pending' AND attempts >= max_attempts);
+
+-- ============================================================================
+-- STEP 3: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '13.0.0',
+    'message_dead_letter table for messages that used up their attempts',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '13.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'Dead-lettered messages:' as check_name,
+    COUNT(*) as result
+FROM message_dead_letter;
+
+SELECT
+    'Failed messages left in message_queue:' as check_name,
+    COUNT(*) as result
+FROM message_queue
+WHERE status = 'failed';
+-- Expected: 0
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 13.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Deploy the previous DAO layer first, then move dead letters back as failed:
+--
+--    INSERT OR IGNORE INTO message_queue (
+--        message_id, incident_id, topic, payload, priority, status, attempts, last_error, created_at
+--    )
+--    SELECT message_id, incident_id, topic, payload, priority, 'failed', attempts, last_error, created_at
+--    FROM message_dead_letter;
+--    DROP TABLE IF EXISTS message_dead_letter;
+--    DELETE FROM _metadata WHERE schema_version = '13.0.0';
+--
+-- ============================================================================
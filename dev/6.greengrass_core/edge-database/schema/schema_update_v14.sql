@@ -0,0 +1,68 @@
+-- ============================================================================
+-- Database Schema Migration v14.0: Dead-Letter max_attempts
+-- Purpose: Keep each message's max_attempts in message_dead_letter, so
+--          MessageQueueDAO.requeue_dead_letters() restores it instead of
+--          resetting the message to the column default (3)
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable column). Rows dead-lettered before
+--                     this migration keep NULL and are requeued with the
+--                     default
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Dead-letter max_attempts
+-- ============================================================================
+-- Copied from message_queue when a message is dead-lettered
+ALTER TABLE message_dead_letter ADD COLUMN max_attempts INTEGER;
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '14.0.0',
+    'message_dead_letter.max_attempts, restored by requeue_dead_letters',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '14.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'message_dead_letter max_attempts column:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('message_dead_letter')
+WHERE name = 'max_attempts';
+-- Expected: 1
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 14.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Deploy the previous DAO layer first (it does not read the column), then:
+--
+--    ALTER TABLE message_dead_letter DROP COLUMN max_attempts;   -- SQLite 3.35+
+--    DELETE FROM _metadata WHERE schema_version = '14.0.0';
+--
+-- ============================================================================
@@ -0,0 +1,137 @@
+-- ============================================================================
+-- Database Schema Migration v4.0: Secondary Indexes for Hot DAO Queries
+-- Purpose: Index every lookup/sort used by the webhook, sync and forwarder paths
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (IF NOT EXISTS); single-column indexes that are
+--                     a prefix of a new composite index are dropped
+-- Verification: tests/test_query_plans.py (EXPLAIN QUERY PLAN on every DAO query)
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: devices
+-- ============================================================================
+-- device_id (PRIMARY KEY) and zabbix_host_id (UNIQUE) already have implicit indexes
+
+-- Webhook camera resolution by IP (IncidentIngestService, CameraIdentityCache misses)
+CREATE INDEX IF NOT EXISTS idx_devices_ip ON devices(ip_address);
+
+-- cameras VIEW / DeviceDAO.get_all(device_type): filter by type, newest first
+CREATE INDEX IF NOT EXISTS idx_devices_type_updated ON devices(device_type, updated_at);
+DROP INDEX IF EXISTS idx_devices_type;
+
+-- DeviceDAO.get_modified_since(): incremental host sync
+CREATE INDEX IF NOT EXISTS idx_devices_lastchange ON devices(lastchange);
+
+-- ============================================================================
+-- STEP 2: incidents
+-- ============================================================================
+-- zabbix_event_id (UNIQUE) already has an implicit index
+
+-- IncidentDAO.get_pending_sync(): partial index over unsynced rows only, keyed on
+-- the exact severity ranking expression so the ORDER BY ... LIMIT needs no sort
+CREATE INDEX IF NOT EXISTS idx_incidents_pending_sync ON incidents(
+    CASE severity
+        WHEN 'critical' THEN 1
+        WHEN 'high' THEN 2
+        WHEN 'medium' THEN 3
+        ELSE 4
+    END,
+    detected_at
+) WHERE synced_to_cloud = 0;
+DROP INDEX IF EXISTS idx_incidents_synced;
+
+-- IncidentDAO.get_recent(): time window, newest first
+CREATE INDEX IF NOT EXISTS idx_incidents_detected ON incidents(detected_at);
+
+-- Per-camera incident history / analytics joins
+CREATE INDEX IF NOT EXISTS idx_incidents_camera_time ON incidents(camera_id, detected_at);
+DROP INDEX IF EXISTS idx_incidents_camera;
+
+-- ============================================================================
+-- STEP 3: message_queue
+-- ============================================================================
+
+-- MessageQueueDAO.get_pending() / get_pending_count(): partial index over
+-- pending rows only, so sent messages awaiting cleanup never bloat it
+CREATE INDEX IF NOT EXISTS idx_queue_pending ON message_queue(status, priority, scheduled_at)
+    WHERE status = 'pending';
+
+-- MessageQueueDAO.cleanup_old_messages() and status counts
+CREATE INDEX IF NOT EXISTS idx_queue_status_created ON message_queue(status, created_at);
+DROP INDEX IF EXISTS idx_queue_status;
+DROP INDEX IF EXISTS idx_queue_priority;
+
+-- MessageQueueDAO.get_failed_count(): attempts >= ? branch of the OR
+CREATE INDEX IF NOT EXISTS idx_queue_attempts ON message_queue(attempts);
+
+-- ============================================================================
+-- STEP 4: sync_log
+-- ============================================================================
+
+-- SyncLogDAO.get_recent(sync_type) / get_last_successful_sync()
+CREATE INDEX IF NOT EXISTS idx_sync_log_type_time ON sync_log(sync_type, sync_timestamp);
+DROP INDEX IF EXISTS idx_sync_log_type;
+
+-- SyncLogDAO.get_recent() without a type filter
+CREATE INDEX IF NOT EXISTS idx_sync_log_timestamp ON sync_log(sync_timestamp);
+
+-- ============================================================================
+-- STEP 5: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '4.0.0',
+    'Secondary indexes for hot DAO queries (partial indexes for pending sync/queue)',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '4.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- STEP 6: Optimize database
+-- ============================================================================
+
+ANALYZE;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'Index:' as check_name,
+    tbl_name || '.' || name as result
+FROM sqlite_master
+WHERE type = 'index' AND name LIKE 'idx_%'
+ORDER BY tbl_name, name;
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 4.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Indexes carry no data; to roll back drop the idx_* indexes created above and
+-- delete the '4.0.0' row from _metadata, or restore from backup:
+--
+--    sudo systemctl stop greengrass
+--    sudo cp /var/greengrass/database/greengrass.db.backup-YYYYMMDD-HHMMSS \
+--            /var/greengrass/database/greengrass.db
+--    sudo systemctl start greengrass
+--
+-- ============================================================================
@@ -0,0 +1,69 @@
+-- ============================================================================
+-- Database Schema Migration v5.0: Device Content Hash for Change Detection
+-- Purpose: Let the host registry sync skip hosts whose normalized fields have
+--          not changed since the last sync (no rewrite, no WAL growth)
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable column); existing rows have a NULL
+--                     hash and are rewritten once by the next sync
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: devices.content_hash
+-- ============================================================================
+-- SHA-256 over the fields written by DeviceDAO.bulk_upsert (excluding
+-- lastchange). NULL for rows the sync does not manage (webhook-created
+-- cameras, rows migrated from the cameras table) and for soft-deleted rows.
+ALTER TABLE devices ADD COLUMN content_hash TEXT;
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '5.0.0',
+    'devices.content_hash for host registry change detection',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '5.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'devices.content_hash:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('devices')
+WHERE name = 'content_hash';
+-- Expected: 1
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 5.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- The column is ignored by older DAO code and can be left in place. To drop it
+-- (SQLite 3.35+):
+--
+--    ALTER TABLE devices DROP COLUMN content_hash;
+--    DELETE FROM _metadata WHERE schema_version = '5.0.0';
+--
+-- ============================================================================
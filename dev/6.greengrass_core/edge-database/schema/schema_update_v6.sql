@@ -0,0 +1,67 @@
+-- ============================================================================
+-- Database Schema Migration v6.0: Sync Log Details
+-- Purpose: Store structured per-run details (per-call Zabbix API timings,
+--          per-stage counts) alongside each sync_log row
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (nullable column)
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: sync_log.details
+-- ============================================================================
+-- JSON object written by SyncLogDAO.log(details=...), e.g.
+-- {"api": {"host.get": {"calls": 41, "total_ms": 5230, "max_ms": 410}}, ...}
+ALTER TABLE sync_log ADD COLUMN details TEXT;
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '6.0.0',
+    'sync_log.details for per-call API timings',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '6.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'sync_log.details:' as check_name,
+    COUNT(*) as result
+FROM pragma_table_info('sync_log')
+WHERE name = 'details';
+-- Expected: 1
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 6.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- The column is ignored by older DAO code and can be left in place. To drop it
+-- (SQLite 3.35+):
+--
+--    ALTER TABLE sync_log DROP COLUMN details;
+--    DELETE FROM _metadata WHERE schema_version = '6.0.0';
+--
+-- ============================================================================
@@ -0,0 +1,68 @@
+-- ============================================================================
+-- Database Schema Migration v7.0: Host Registry Incremental Sync State
+-- Purpose: Configuration keys for the audit-log watermark incremental sync
+-- Date: 2026-10-18
+-- Migration Strategy: Additive (INSERT OR IGNORE); an empty value means unset,
+--                     so the first sync after this migration is a full sync
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Sync state keys (ConfigurationDAO.set only updates existing keys)
+-- ============================================================================
+
+INSERT OR IGNORE INTO configuration (key, value, description) VALUES
+    ('host_sync_watermark', '', 'Clock of the newest Zabbix host audit record applied by the host registry sync'),
+    ('host_sync_last_full', '', 'Unix time of the last full host registry sync'),
+    ('host_sync_last_reconcile', '', 'Unix time of the last id-only host reconciliation (deletion detection)');
+
+-- ============================================================================
+-- STEP 2: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '7.0.0',
+    'Host registry incremental sync state (audit log watermark)',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '7.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'Sync state keys:' as check_name,
+    COUNT(*) as result
+FROM configuration
+WHERE key IN ('host_sync_watermark', 'host_sync_last_full', 'host_sync_last_reconcile');
+-- Expected: 3
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 7.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+--
+--    DELETE FROM configuration
+--    WHERE key IN ('host_sync_watermark', 'host_sync_last_full', 'host_sync_last_reconcile');
+--    DELETE FROM _metadata WHERE schema_version = '7.0.0';
+--
+-- ============================================================================
@@ -0,0 +1,93 @@
+-- ============================================================================
+-- Database Schema Migration v8.0: Normalized Device / Host Group Membership
+-- Purpose: Replace comma-string LIKE joins on devices.host_groups with an
+--          indexed join table (inventory and analytics group counts)
+-- Date: 2026-10-18
+-- Migration Strategy: Additive; devices.host_groups is kept (NGSI-LD/legacy
+--                     readers) and device_host_groups is backfilled from it
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: device_host_groups
+-- ============================================================================
+-- Maintained by DeviceDAO (insert/bulk_upsert replace a device's rows,
+-- mark_as_deleted removes them). No foreign key to host_groups: hosts may be
+-- synced before their groups.
+CREATE TABLE IF NOT EXISTS device_host_groups (
+    device_id TEXT NOT NULL REFERENCES devices(device_id) ON DELETE CASCADE,
+    groupid TEXT NOT NULL,
+    PRIMARY KEY (device_id, groupid)
+) WITHOUT ROWID;
+
+-- Per-group counts and group -> devices lookups
+CREATE INDEX IF NOT EXISTS idx_device_host_groups_group ON device_host_groups(groupid, device_id);
+
+-- ============================================================================
+-- STEP 2: Backfill from devices.host_groups ('1,2,15')
+-- ============================================================================
+
+WITH RECURSIVE split(device_id, groupid, rest) AS (
+    SELECT device_id, '', host_groups || ','
+    FROM devices
+    WHERE host_groups IS NOT NULL AND host_groups != '' AND status != 'deleted'
+    UNION ALL
+    SELECT device_id,
+           trim(substr(rest, 1, instr(rest, ',') - 1)),
+           substr(rest, instr(rest, ',') + 1)
+    FROM split
+    WHERE rest != ''
+)
+INSERT OR IGNORE INTO device_host_groups (device_id, groupid)
+SELECT device_id, groupid FROM split WHERE groupid != '';
+
+-- ============================================================================
+-- STEP 3: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '8.0.0',
+    'device_host_groups join table (replaces host_groups LIKE joins)',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '8.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+ANALYZE device_host_groups;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'Memberships:' as check_name,
+    COUNT(*) as result
+FROM device_host_groups;
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 8.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- devices.host_groups still holds the memberships, so the table can be dropped:
+--
+--    DROP TABLE IF EXISTS device_host_groups;
+--    DELETE FROM _metadata WHERE schema_version = '8.0.0';
+--
+-- ============================================================================
@@ -0,0 +1,135 @@
+-- ============================================================================
+-- Database Schema Migration v9.0: Incident Analytics Rollups
+-- Purpose: Minute/hour incident counts maintained on insert/resolve so the
+--          analytics summary reads pre-aggregated buckets instead of
+--          rescanning raw incidents for every window
+-- Date: 2026-10-18
+-- Migration Strategy: Additive; rollups are backfilled once from incidents
+-- ============================================================================
+
+PRAGMA journal_mode = WAL;
+PRAGMA foreign_keys = ON;
+PRAGMA synchronous = NORMAL;
+
+BEGIN;
+
+-- ============================================================================
+-- STEP 1: Rollup tables
+-- ============================================================================
+-- Maintained by IncidentDAO / IncidentIngestService in the same transaction
+-- as the incident write. bucket_seconds is 60 (minute) or 3600 (hour);
+-- bucket_start is the Unix time the bucket starts. detected counts incidents
+-- by detected_at bucket, resolved counts resolutions by resolved_at bucket.
+-- No foreign keys: rollups outlive raw incidents and deleted devices.
+CREATE TABLE IF NOT EXISTS incident_rollups (
+    bucket_seconds INTEGER NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    severity TEXT NOT NULL,
+    incident_type TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    detected INTEGER NOT NULL DEFAULT 0,
+    resolved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_seconds, bucket_start, severity, incident_type, device_id)
+) WITHOUT ROWID;
+
+-- Host group membership at the time of the write (a device in several
+-- groups counts once per group)
+CREATE TABLE IF NOT EXISTS incident_rollups_host_group (
+    bucket_seconds INTEGER NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    groupid TEXT NOT NULL,
+    detected INTEGER NOT NULL DEFAULT 0,
+    resolved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_seconds, bucket_start, groupid)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- STEP 2: Backfill from existing incidents
+-- ============================================================================
+
+WITH buckets(bucket_seconds) AS (VALUES (60), (3600)),
+events(ts, severity, incident_type, device_id, detected, resolved) AS (
+    SELECT CAST(strftime('%s', detected_at) AS INTEGER), severity, incident_type, camera_id, 1, 0
+    FROM incidents
+    UNION ALL
+    SELECT CAST(strftime('%s', resolved_at) AS INTEGER), severity, incident_type, camera_id, 0, 1
+    FROM incidents
+    WHERE resolved_at IS NOT NULL
+)
+INSERT INTO incident_rollups (
+    bucket_seconds, bucket_start, severity, incident_type, device_id, detected, resolved
+)
+SELECT b.bucket_seconds, e.ts / b.bucket_seconds * b.bucket_seconds,
+       e.severity, e.incident_type, e.device_id, SUM(e.detected), SUM(e.resolved)
+FROM buckets b, events e
+WHERE e.ts IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5;
+
+INSERT INTO incident_rollups_host_group (bucket_seconds, bucket_start, groupid, detected, resolved)
+SELECT r.bucket_seconds, r.bucket_start, m.groupid, SUM(r.detected), SUM(r.resolved)
+FROM incident_rollups r
+JOIN device_host_groups m ON m.device_id = r.device_id
+GROUP BY 1, 2, 3;
+
+-- ============================================================================
+-- STEP 3: Analytics watermark
+-- ============================================================================
+-- End (Unix time) of the last period published by IncidentAnalyticsSync;
+-- missed periods after downtime are published from the rollups on restart
+
+INSERT OR IGNORE INTO configuration (key, value, description) VALUES
+    ('analytics_last_period_end', '', 'Unix time the last published analytics period ended');
+
+-- ============================================================================
+-- STEP 4: Update database metadata
+-- ============================================================================
+
+INSERT OR REPLACE INTO _metadata (schema_version, description, applied_at)
+VALUES (
+    '9.0.0',
+    'incident_rollups / incident_rollups_host_group minute and hour buckets',
+    CURRENT_TIMESTAMP
+);
+
+UPDATE configuration
+SET value = '9.0.0', updated_at = CURRENT_TIMESTAMP
+WHERE key = 'database_version';
+
+COMMIT;
+
+ANALYZE incident_rollups;
+
+-- ============================================================================
+-- Verification Queries
+-- ============================================================================
+
+SELECT
+    'Rollup rows (minute/hour):' as check_name,
+    SUM(bucket_seconds = 60) || ' / ' || SUM(bucket_seconds = 3600) as result
+FROM incident_rollups;
+
+SELECT
+    'Hour buckets match incidents:' as check_name,
+    (SELECT COALESCE(SUM(detected), 0) FROM incident_rollups WHERE bucket_seconds = 3600) =
+    (SELECT COUNT(*) FROM incidents WHERE strftime('%s', detected_at) IS NOT NULL) as result;
+-- Expected: 1
+
+SELECT
+    'Schema version:' as check_name,
+    schema_version as result
+FROM _metadata
+ORDER BY applied_at DESC
+LIMIT 1;
+-- Expected: 9.0.0
+
+-- ============================================================================
+-- Rollback Instructions (if needed)
+-- ============================================================================
+-- Older DAO code does not read or write the rollups; to remove them:
+--
+--    DROP TABLE IF EXISTS incident_rollups_host_group;
+--    DROP TABLE IF EXISTS incident_rollups;
+--    DELETE FROM configuration WHERE key = 'analytics_last_period_end';
+--    DELETE FROM _metadata WHERE schema_version = '9.0.0';
+--
+-- ============================================================================
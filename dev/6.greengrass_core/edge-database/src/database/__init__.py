@@ -4,7 +4,9 @@ Version: 1.0.0
 Purpose: Provide data access layer for local SQLite database
 """
 
-from .connection import DatabaseManager
+from .connection import DatabaseManager, ConnectionPool
+from .camera_cache import CameraIdentityCache
+from .change_watcher import DataVersionWatcher
 from .dao import (
     CameraDAO,
     IncidentDAO,
@@ -13,15 +15,21 @@ from .dao import (
     ConfigurationDAO
 )
 from .device_dao import DeviceDAO, HostGroupDAO
+from .ingest_service import IncidentIngestService, IngestResult
 
 __version__ = "1.0.0"
 __all__ = [
     "DatabaseManager",
+    "ConnectionPool",
+    "CameraIdentityCache",
+    "DataVersionWatcher",
     "CameraDAO",
     "IncidentDAO",
     "MessageQueueDAO",
     "SyncLogDAO",
     "ConfigurationDAO",
     "DeviceDAO",
-    "HostGroupDAO"
+    "HostGroupDAO",
+    "IncidentIngestService",
+    "IngestResult"
 ]
@@ -0,0 +1,162 @@
+"""
+Camera Identity Cache - in-memory lookup of camera identities
+Resolves camera_id / zabbix_host_id / ip_address to a device without
+touching SQLite on the webhook hot path
+"""
+import time
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lookup fields the cache is indexed by
+INDEXED_FIELDS = ('device_id', 'zabbix_host_id', 'ip_address')
+
+
+class CameraIdentityCache:
+    """
+    Write-through cache of camera identities, bounded by size (LRU) and TTL
+
+    Each entry holds device_id, zabbix_host_id, ip_address and status.
+    Writers (CameraDAO, IncidentIngestService) update it after their
+    transaction commits; the TTL bounds staleness from writes made by
+    other processes (host registry sync, other gunicorn workers).
+    Only positive lookups are cached, so a new camera is never hidden.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Maximum number of cameras held (least recently used evicted first)
+            ttl: Seconds an entry stays valid after it was written
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # device_id -> (identity, expires_at)
+        self._index = {'zabbix_host_id': {}, 'ip_address': {}}
+        self._lock = Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    @staticmethod
+    def _identity(camera: Dict) -> Dict:
+        """Normalize a camera/device row into an identity entry"""
+        return {
+            'device_id': camera.get('device_id') or camera.get('camera_id'),
+            'zabbix_host_id': camera.get('zabbix_host_id'),
+            'ip_address': camera.get('ip_address'),
+            'status': camera.get('status')
+        }
+
+    def _unindex(self, identity: Dict):
+        """Drop index keys that still point at this entry (caller holds lock)"""
+        for field, index in self._index.items():
+            key = identity.get(field)
+            if key and index.get(key) == identity['device_id']:
+                del index[key]
+
+    def _remove(self, device_id: str):
+        """Remove an entry and its index keys (caller holds lock)"""
+        identity, _ = self._entries.pop(device_id)
+        self._unindex(identity)
+
+    def _put(self, camera: Dict, now: float):
+        """Insert or replace an entry (caller holds lock)"""
+        identity = self._identity(camera)
+        device_id = identity['device_id']
+        if not device_id:
+            return
+
+        if device_id in self._entries:
+            self._remove(device_id)
+        self._entries[device_id] = (identity, now + self.ttl)
+        for field, index in self._index.items():
+            key = identity.get(field)
+            if key and key != 'unknown':
+                index[key] = device_id
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self._stats['evictions'] += 1
+
+    def get(self, field: str, value: str) -> Optional[Dict]:
+        """
+        Look up a camera by one of its identity fields
+
+        Args:
+            field: One of device_id, zabbix_host_id, ip_address
+            value: Value to look up
+
+        Returns:
+            Copy of the identity entry, or None on a miss or expired entry
+        """
+        with self._lock:
+            device_id = value if field == 'device_id' else self._index[field].get(value)
+            entry = self._entries.get(device_id) if device_id else None
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            identity, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(device_id)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(device_id)
+            self._stats['hits'] += 1
+            return dict(identity)
+
+    def put(self, camera: Dict):
+        """Add or refresh one camera (accepts device rows or cameras view rows)"""
+        with self._lock:
+            self._put(camera, time.monotonic())
+
+    def put_many(self, cameras: List[Dict]):
+        """Add or refresh many cameras"""
+        with self._lock:
+            now = time.monotonic()
+            for camera in cameras:
+                self._put(camera, now)
+
+    def update_status(self, device_id: str, status: str):
+        """Update the cached status of a camera without extending its TTL"""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry:
+                entry[0]['status'] = status
+
+    def invalidate(self, device_id: str):
+        """Drop one camera from the cache"""
+        with self._lock:
+            if device_id in self._entries:
+                self._remove(device_id)
+
+    def clear(self):
+        """Drop all cached cameras"""
+        with self._lock:
+            self._entries.clear()
+            for index in self._index.values():
+                index.clear()
+
+    def stats(self) -> Dict:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with size, bounds, hit/miss counters and hit rate
+        """
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
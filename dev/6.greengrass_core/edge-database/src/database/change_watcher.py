@@ -0,0 +1,96 @@
+"""
+Data Version Watcher - cheap cross-process change detection
+Lets a poller sleep until another connection commits to the database
+instead of re-running its query on a fixed interval
+"""
+import sqlite3
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between PRAGMA data_version checks while waiting
+CHECK_INTERVAL = 0.1
+
+
+class DataVersionWatcher:
+    """
+    Detects commits made by other connections via PRAGMA data_version
+
+    data_version is per connection: it changes when any other connection
+    (any process, including pooled connections of this one) commits, and
+    never for the connection's own writes. The watcher therefore holds its
+    own connection outside the pool and only ever reads the pragma, which
+    is answered from the WAL index in shared memory without touching the
+    database file - cheap enough to check every CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, db_path: str, check_interval: float = CHECK_INTERVAL):
+        """
+        Initialize watcher
+
+        Args:
+            db_path: Path to SQLite database file
+            check_interval: Seconds between checks in wait()
+        """
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version: Optional[int] = None
+
+    def _read_version(self) -> int:
+        """Current data_version, reopening the connection after an error"""
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30.0)
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            self.close()
+            raise
+
+    def changed(self) -> bool:
+        """
+        Check for commits since the previous call and take the current
+        version as the new baseline
+
+        The first call only sets the baseline and returns True.
+        """
+        version = self._read_version()
+        changed = version != self._version
+        self._version = version
+        return changed
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until another connection commits or timeout elapses
+
+        Call changed() before reading the data of interest, then wait()
+        once done with it, so commits made in between are not missed.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if a commit was detected, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.changed():
+                    return True
+            except sqlite3.Error as e:
+                logger.warning(f"data_version check failed: {e}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.check_interval, remaining))
+
+    def close(self):
+        """Close the watcher connection"""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
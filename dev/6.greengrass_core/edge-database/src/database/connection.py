@@ -3,21 +3,225 @@ Database Connection Manager with connection pooling
 Implements singleton pattern for thread-safe SQLite access
 """
 import sqlite3
+import time
 import logging
+from collections import deque
 from contextlib import contextmanager
 from typing import Optional, List, Dict
-from threading import Lock
+from threading import Lock, Condition
 
 logger = logging.getLogger(__name__)
 
 
+class ConnectionPool:
+    """
+    Bounded pool of persistent SQLite connections
+
+    Connections are opened lazily up to max_size, configured with pragmas
+    once at creation and reused across checkouts. Idle connections are
+    evicted after idle_timeout seconds and probed before reuse when they
+    have been idle longer than health_check_interval seconds.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 5, idle_timeout: float = 300.0,
+                 health_check_interval: float = 30.0, checkout_timeout: float = 30.0):
+        """
+        Initialize connection pool
+
+        Args:
+            db_path: Path to SQLite database file
+            max_size: Maximum number of open connections
+            idle_timeout: Seconds before an idle connection is closed
+            health_check_interval: Idle seconds after which a connection is probed on checkout
+            checkout_timeout: Seconds to wait for a free connection before failing
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, last_used) - most recently used on the right
+        self._open = 0
+        self._closed = False  # Set by close_all(): released connections are closed, not pooled
+        self._cond = Condition(Lock())
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'created': 0,
+            'evicted': 0,
+            'health_check_failures': 0
+        }
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new connection and apply per-connection pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=30.0
+        )
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+
+        # Enable WAL mode for better concurrent access
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        # WAL is durable with NORMAL sync; avoids an fsync on every commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        """Probe connection with a trivial query"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _evict_idle(self, now: float) -> List[sqlite3.Connection]:
+        """Remove connections idle longer than idle_timeout (caller holds lock)"""
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            expired.append(conn)
+        self._open -= len(expired)
+        self._stats['evicted'] += len(expired)
+        return expired
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a connection, waiting up to checkout_timeout if the pool is exhausted
+
+        Returns:
+            Open SQLite connection
+
+        Raises:
+            RuntimeError: If no connection becomes available in time
+        """
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        waited = False
+        conn = None
+        idle_since = None
+
+        with self._cond:
+            expired = self._evict_idle(start)
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(
+                        f"Connection pool exhausted ({self.max_size} connections in use)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_ms'] += (time.monotonic() - start) * 1000
+
+        for stale in expired:
+            stale.close()
+
+        if conn is not None and time.monotonic() - idle_since > self.health_check_interval:
+            if not self._is_healthy(conn):
+                logger.warning("Discarding unhealthy pooled connection")
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                conn.close()
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._create_connection()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+
+        return conn
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False):
+        """
+        Return a connection to the pool
+
+        Args:
+            conn: Connection previously returned by acquire()
+            discard: Close the connection instead of reusing it
+                (always the case once close_all() was called)
+        """
+        if self._closed:
+            discard = True
+        if not discard and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        if discard:
+            conn.close()
+            self._release_slot()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _release_slot(self):
+        """Free a slot after a connection was closed"""
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """
+        Close all idle connections
+
+        Checked-out connections are closed when they are released, and so
+        are connections acquired afterwards: the pool stops reusing them.
+        """
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, any]:
+        """
+        Get pool statistics
+
+        Returns:
+            Dictionary with checkout/wait counters and current pool occupancy
+        """
+        with self._cond:
+            return {
+                **self._stats,
+                'wait_time_ms': round(self._stats['wait_time_ms'], 3),
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle)
+            }
+
+
 class DatabaseManager:
     """Singleton database connection manager for SQLite"""
 
     _instance: Optional['DatabaseManager'] = None
     _lock = Lock()
 
-    def __new__(cls, db_path: str = "/var/greengrass/database/greengrass.db"):
+    def __new__(cls, db_path: str = "/var/greengrass/database/greengrass.db",
+                pool_size: int = 5, idle_timeout: float = 300.0):
         """
         Singleton pattern ensures only one instance exists
         Thread-safe implementation using Lock
@@ -26,12 +230,13 @@ class DatabaseManager:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = super().__new__(cls)
-                    cls._instance._initialize(db_path)
+                    cls._instance._initialize(db_path, pool_size, idle_timeout)
         return cls._instance
 
-    def _initialize(self, db_path: str):
+    def _initialize(self, db_path: str, pool_size: int, idle_timeout: float):
         """Initialize database manager"""
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, max_size=pool_size, idle_timeout=idle_timeout)
         self._verify_database()
         logger.info(f"DatabaseManager initialized with {db_path}")
 
@@ -58,33 +263,37 @@ class DatabaseManager:
     def get_connection(self):
         """
         Context manager for database connections
-        Automatically handles commit/rollback and close
+        Checks a connection out of the pool, automatically handles
+        commit/rollback and returns it to the pool
 
         Usage:
             with db.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM cameras")
         """
-        conn = sqlite3.connect(
-            self.db_path,
-            check_same_thread=False,
-            timeout=30.0
-        )
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-
-        # Enable WAL mode for better concurrent access
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA foreign_keys=ON")
+        conn = self.pool.acquire()
+        discard = False
 
         try:
             yield conn
             conn.commit()
         except Exception as e:
-            conn.rollback()
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
             logger.error(f"Database transaction failed: {e}")
             raise
         finally:
-            conn.close()
+            self.pool.release(conn, discard=discard)
+
+    def pool_stats(self) -> Dict[str, any]:
+        """Get connection pool statistics (checkouts, waits, wait time, occupancy)"""
+        return self.pool.stats()
+
+    def close(self):
+        """Close idle pooled connections (e.g. on component shutdown)"""
+        self.pool.close_all()
 
     def execute_query(self, query: str, params: tuple = ()) -> List[Dict]:
         """
@@ -146,7 +355,8 @@ class DatabaseManager:
                     "status": "healthy" if integrity == "ok" else "unhealthy",
                     "integrity": integrity,
                     "database_path": self.db_path,
-                    **counts
+                    **counts,
+                    "pool": self.pool_stats()
                 }
         except Exception as e:
             logger.error(f"Health check failed: {e}")
@@ -3,19 +3,91 @@ Data Access Objects for all database tables
 Implements CRUD operations with proper error handling and logging
 """
 import json
+import time
 import logging
 from datetime import datetime
 from typing import List, Dict, Optional
 from .connection import DatabaseManager
+from .camera_cache import CameraIdentityCache
 
 logger = logging.getLogger(__name__)
 
+# Incident rollup bucket sizes in seconds (minute, hour)
+ROLLUP_MINUTE = 60
+ROLLUP_HOUR = 3600
+# Max incident ids per rollup IN (...) statement
+ROLLUP_CHUNK_SIZE = 500
+# ISO-8601 text -> Unix epoch milliseconds; format() with a column name or ?
+EPOCH_MS_SQL = "CAST(ROUND((julianday({}) - 2440587.5) * 86400000) AS INTEGER)"
+# Rows per transaction when backfilling incidents.detected_at_ms
+BACKFILL_CHUNK_SIZE = 5000
+# Max message ids per message_queue IN (...) statement
+QUEUE_CHUNK_SIZE = 500
+# Seconds a claimed message stays leased to its worker
+QUEUE_LEASE_SECONDS = 60
+# Retry delay after a failed attempt: base * 2^attempts made so far, capped,
+# with equal jitter (50-100% of the delay) so a site's retries spread out
+QUEUE_BACKOFF_BASE_SECONDS = 5
+QUEUE_BACKOFF_MAX_SECONDS = 900
+# The delay in seconds as an SQL expression over message_queue.attempts
+QUEUE_BACKOFF_SQL = (
+    f"MIN({QUEUE_BACKOFF_MAX_SECONDS}, {QUEUE_BACKOFF_BASE_SECONDS} * (1 << MIN(attempts, 16)))"
+    " * (500 + ABS(RANDOM() % 501)) / 1000.0"
+)
+# Configuration key that turns the incident outbox on ('true') or off
+OUTBOX_ENABLED_KEY = 'outbox_enabled'
+# Camera insert into devices (cameras is a read-only VIEW over devices since schema v3)
+CAMERA_INSERT_SQL = """
+    INSERT INTO devices (
+        device_id, zabbix_host_id, host_name, visible_name, device_type, ip_address,
+        location, site_id, model, firmware_version, status, ngsi_ld_json
+    ) VALUES (?, ?, ?, ?, 'camera', ?, ?, ?, ?, ?, ?, ?)
+"""
+
 
 class CameraDAO:
     """Data Access Object for cameras table"""
 
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, cache: Optional[CameraIdentityCache] = None):
+        """
+        Args:
+            db_manager: Database manager
+            cache: Optional identity cache kept up to date by this DAO's writes
+        """
         self.db = db_manager
+        self.cache = cache
+
+    def warm_cache(self, site_id: str = None) -> int:
+        """
+        Load all cameras into the identity cache
+
+        Returns:
+            Number of cameras loaded (0 if no cache is configured)
+        """
+        if self.cache is None:
+            return 0
+        cameras = self.get_all(site_id=site_id)
+        self.cache.put_many(cameras)
+        logger.info(f"Warmed camera cache with {len(cameras)} cameras")
+        return len(cameras)
+
+    @staticmethod
+    def _device_row(camera: Dict) -> tuple:
+        """Parameters of CAMERA_INSERT_SQL for a camera dictionary"""
+        hostname = camera.get('hostname') or camera['camera_id']
+        return (
+            camera['camera_id'],
+            camera['zabbix_host_id'],
+            hostname,
+            hostname,
+            camera['ip_address'],
+            camera.get('location'),
+            camera.get('site_id', 'site-001'),
+            camera.get('model'),
+            camera.get('firmware_version'),
+            camera.get('status', 'unknown'),
+            json.dumps(camera['ngsi_ld'])
+        )
 
     def insert(self, camera: Dict) -> str:
         """
@@ -27,25 +99,12 @@ class CameraDAO:
         Returns:
             camera_id of inserted camera
         """
+        # cameras is a VIEW since schema v3; write to the underlying devices table
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO cameras (
-                    camera_id, zabbix_host_id, ip_address, hostname, location,
-                    site_id, model, firmware_version, status, ngsi_ld_json
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                camera['camera_id'],
-                camera['zabbix_host_id'],
-                camera['ip_address'],
-                camera.get('hostname'),
-                camera.get('location'),
-                camera.get('site_id', 'site-001'),
-                camera.get('model'),
-                camera.get('firmware_version'),
-                camera.get('status', 'unknown'),
-                json.dumps(camera['ngsi_ld'])
-            ))
+            cursor.execute(CAMERA_INSERT_SQL, self._device_row(camera))
+        if self.cache is not None:
+            self.cache.put(camera)
         logger.info(f"Inserted camera: {camera['camera_id']}")
         return camera['camera_id']
 
@@ -59,39 +118,24 @@ class CameraDAO:
         Returns:
             Number of cameras processed
         """
-        count = 0
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            for camera in cameras:
-                cursor.execute("""
-                    INSERT INTO cameras (
-                        camera_id, zabbix_host_id, ip_address, hostname, location,
-                        site_id, model, firmware_version, status, ngsi_ld_json
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(camera_id) DO UPDATE SET
-                        ip_address = excluded.ip_address,
-                        hostname = excluded.hostname,
-                        location = excluded.location,
-                        model = excluded.model,
-                        firmware_version = excluded.firmware_version,
-                        status = excluded.status,
-                        ngsi_ld_json = excluded.ngsi_ld_json,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (
-                    camera['camera_id'],
-                    camera['zabbix_host_id'],
-                    camera['ip_address'],
-                    camera.get('hostname'),
-                    camera.get('location'),
-                    camera.get('site_id', 'site-001'),
-                    camera.get('model'),
-                    camera.get('firmware_version'),
-                    camera.get('status', 'unknown'),
-                    json.dumps(camera['ngsi_ld'])
-                ))
-                count += 1
-        logger.info(f"Batch upserted {count} cameras")
-        return count
+            cursor.executemany(CAMERA_INSERT_SQL + """
+                ON CONFLICT(device_id) DO UPDATE SET
+                    ip_address = excluded.ip_address,
+                    host_name = excluded.host_name,
+                    visible_name = excluded.visible_name,
+                    location = excluded.location,
+                    model = excluded.model,
+                    firmware_version = excluded.firmware_version,
+                    status = excluded.status,
+                    ngsi_ld_json = excluded.ngsi_ld_json,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [self._device_row(camera) for camera in cameras])
+        if self.cache is not None:
+            self.cache.put_many(cameras)
+        logger.info(f"Batch upserted {len(cameras)} cameras")
+        return len(cameras)
 
     def get_by_id(self, camera_id: str) -> Optional[Dict]:
         """Get camera by ID"""
@@ -136,10 +180,13 @@ class CameraDAO:
 
     def update_status(self, camera_id: str, status: str):
         """Update camera status (online/offline)"""
+        # cameras is a VIEW since schema v3; write to the underlying devices table
         self.db.execute_update(
-            "UPDATE cameras SET status = ?, last_seen = CURRENT_TIMESTAMP WHERE camera_id = ?",
+            "UPDATE devices SET status = ?, last_seen = CURRENT_TIMESTAMP WHERE device_id = ? AND device_type = 'camera'",
             (status, camera_id)
         )
+        if self.cache is not None:
+            self.cache.update_status(camera_id, status)
         logger.info(f"Updated camera {camera_id} status to {status}")
 
     def get_count(self, site_id: str = None) -> int:
@@ -172,11 +219,11 @@ class IncidentDAO:
         """
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO incidents (
                     incident_id, camera_id, zabbix_event_id, incident_type,
-                    severity, detected_at, ngsi_ld_json
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                    severity, detected_at, detected_at_ms, ngsi_ld_json
+                ) VALUES (?, ?, ?, ?, ?, ?, {EPOCH_MS_SQL.format('?')}, ?)
             """, (
                 incident['incident_id'],
                 incident['camera_id'],
@@ -184,8 +231,11 @@ class IncidentDAO:
                 incident['incident_type'],
                 incident['severity'],
                 incident['detected_at'],
+                incident['detected_at'],
                 json.dumps(incident['ngsi_ld'])
             ))
+            self.apply_rollups(cursor, [incident['incident_id']])
+            self.enqueue_outbox(cursor, [incident['incident_id']])
         logger.info(f"Inserted incident: {incident['incident_id']}")
         return incident['incident_id']
 
@@ -193,6 +243,8 @@ class IncidentDAO:
         """
         Mark incident as resolved and calculate duration
 
+        An incident is resolved once; later calls leave it unchanged.
+
         Args:
             incident_id: ID of incident to resolve
             resolved_at: ISO timestamp of resolution
@@ -203,14 +255,141 @@ class IncidentDAO:
                 UPDATE incidents
                 SET resolved_at = ?,
                     duration_seconds = CAST((julianday(?) - julianday(detected_at)) * 86400 AS INTEGER)
-                WHERE incident_id = ?
+                WHERE incident_id = ? AND resolved_at IS NULL
             """, (resolved_at, resolved_at, incident_id))
+            if cursor.rowcount:
+                self.apply_rollups(cursor, [incident_id], resolved=True)
+                self.enqueue_outbox(cursor, [incident_id], resolved=True)
         logger.info(f"Resolved incident: {incident_id}")
 
+    @staticmethod
+    def apply_rollups(cursor, incident_ids: List[str], resolved: bool = False):
+        """
+        Add incidents to the minute/hour rollup tables
+
+        Runs on the caller's cursor so the rollups commit (or roll back)
+        with the incident write. Call once per incident insert, and once more
+        with resolved=True when an incident is resolved (including incidents
+        inserted already resolved). Rows whose timestamp cannot be parsed
+        are skipped.
+
+        Args:
+            cursor: Cursor of the transaction that wrote the incidents
+            incident_ids: IDs of the incidents just inserted/resolved
+            resolved: Count resolutions (by resolved_at) instead of detections
+        """
+        if resolved:
+            timestamp, counts = "CAST(strftime('%s', resolved_at) AS INTEGER)", '0, COUNT(*)'
+        else:
+            timestamp, counts = 'detected_at_ms / 1000', 'COUNT(*), 0'
+        incident_ids = list(incident_ids)
+        for i in range(0, len(incident_ids), ROLLUP_CHUNK_SIZE):
+            chunk = incident_ids[i:i + ROLLUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            incidents = f"""(
+                SELECT {timestamp} as ts,
+                       severity, incident_type, camera_id
+                FROM incidents
+                WHERE incident_id IN ({placeholders})
+            ) i, (SELECT {ROLLUP_MINUTE} as size UNION ALL SELECT {ROLLUP_HOUR}) b"""
+            cursor.execute(f"""
+                INSERT INTO incident_rollups (
+                    bucket_seconds, bucket_start, severity, incident_type, device_id, detected, resolved
+                )
+                SELECT b.size, i.ts / b.size * b.size, i.severity, i.incident_type, i.camera_id, {counts}
+                FROM {incidents}
+                WHERE i.ts IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5
+                ON CONFLICT (bucket_seconds, bucket_start, severity, incident_type, device_id) DO UPDATE SET
+                    detected = detected + excluded.detected,
+                    resolved = resolved + excluded.resolved
+            """, chunk)
+            cursor.execute(f"""
+                INSERT INTO incident_rollups_host_group (
+                    bucket_seconds, bucket_start, groupid, detected, resolved
+                )
+                SELECT b.size, i.ts / b.size * b.size, m.groupid, {counts}
+                FROM {incidents}
+                JOIN device_host_groups m ON m.device_id = i.camera_id
+                WHERE i.ts IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (bucket_seconds, bucket_start, groupid) DO UPDATE SET
+                    detected = detected + excluded.detected,
+                    resolved = resolved + excluded.resolved
+            """, chunk)
+
+    @staticmethod
+    def enqueue_outbox(cursor, incident_ids: List[str], resolved: bool = False,
+                       site_id: Optional[str] = None) -> int:
+        """
+        Queue the cloud message for incidents just inserted or resolved
+
+        Transactional outbox: runs on the caller's cursor, so the
+        message_queue row commits (or rolls back) with the incident write
+        and the forwarder drains message_queue as the only sync source.
+        Call once per incident insert (incidents inserted already resolved
+        only need the resolved=True call) and once when it is resolved.
+        The payload is the stored NGSI-LD entity (with the resolution for
+        resolved=True), the priority follows the severity and message ids
+        are '<incident_id>:detected' / '<incident_id>:resolved', so a
+        repeated call queues nothing. Nothing is queued unless the
+        OUTBOX_ENABLED_KEY configuration value is 'true' (set by the
+        forwarder), so the queue does not grow while no forwarder runs.
+
+        Args:
+            cursor: Cursor of the transaction that wrote the incidents
+            incident_ids: IDs of the incidents just inserted/resolved
+            resolved: Queue the resolution instead of the detection
+            site_id: Site for the topic (default: configuration 'site_id')
+
+        Returns:
+            Number of messages queued
+        """
+        if resolved:
+            event = 'resolved'
+            payload = """json_set(
+                CASE WHEN json_valid(ngsi_ld_json) THEN ngsi_ld_json ELSE '{}' END,
+                '$.status', json_object('type', 'Property', 'value', 'resolved', 'observedAt', resolved_at),
+                '$.resolvedAt', json_object('type', 'Property', 'value', resolved_at),
+                '$.durationSeconds', json_object('type', 'Property', 'value', duration_seconds)
+            )"""
+        else:
+            event, payload = 'detected', 'ngsi_ld_json'
+        incident_ids = list(incident_ids)
+        queued = 0
+        for i in range(0, len(incident_ids), QUEUE_CHUNK_SIZE):
+            chunk = incident_ids[i:i + QUEUE_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO message_queue (message_id, incident_id, topic, payload, priority)
+                SELECT incident_id || ':{event}', incident_id,
+                       'aismc/incidents/' || COALESCE(
+                           ?, (SELECT value FROM configuration WHERE key = 'site_id'), 'site-001'
+                       ),
+                       {payload},
+                       CASE severity
+                           WHEN 'critical' THEN 1
+                           WHEN 'high' THEN 2
+                           WHEN 'medium' THEN 3
+                           ELSE 4
+                       END
+                FROM incidents
+                WHERE incident_id IN ({placeholders})
+                AND EXISTS (
+                    SELECT 1 FROM configuration WHERE key = '{OUTBOX_ENABLED_KEY}' AND value = 'true'
+                )
+            """, [site_id] + chunk)
+            queued += cursor.rowcount
+        return queued
+
     def get_pending_sync(self, limit: int = 100) -> List[Dict]:
         """
         Get incidents pending cloud sync, ordered by severity and time
 
+        Legacy sync path: with the outbox enabled (see enqueue_outbox),
+        incidents are synced through message_queue and marked synced by
+        MessageQueueDAO.mark_sent_many.
+
         Args:
             limit: Maximum number of incidents to retrieve
 
@@ -278,12 +457,288 @@ class IncidentDAO:
 
     def get_recent(self, hours: int = 24, limit: int = 100) -> List[Dict]:
         """Get recent incidents within specified hours"""
+        since_ms = int(time.time() * 1000) - hours * 3600000
         return self.db.execute_query("""
             SELECT * FROM incidents
-            WHERE detected_at >= datetime('now', '-' || ? || ' hours')
-            ORDER BY detected_at DESC
+            WHERE detected_at_ms >= ?
+            ORDER BY detected_at_ms DESC
             LIMIT ?
-        """, (hours, limit))
+        """, (since_ms, limit))
+
+    def get_summary(self, since_ms: int, top_count: int = 10) -> Dict:
+        """
+        Aggregate incidents detected since a point in time
+
+        Two GROUP BY queries over the idx_incidents_detected_ms range, run in one
+        read transaction so every breakdown sees the same snapshot: counts by
+        severity/type, and counts per device joined to devices and
+        device_host_groups once per device (not once per incident). Incidents
+        whose device is unknown count towards the totals but not
+        by_device_type/by_host_group.
+
+        Args:
+            since_ms: Window start (Unix epoch milliseconds)
+            top_count: Number of top affected devices to return
+
+        Returns:
+            Dictionary with total, by_severity, by_incident_type,
+            by_device_type, by_host_group ({groupid: count}) and
+            top_affected_devices ([{device_id, incidents}], most first)
+        """
+        summary = {
+            'total': 0,
+            'by_severity': {},
+            'by_incident_type': {},
+            'by_device_type': {},
+            'by_host_group': {},
+            'top_affected_devices': []
+        }
+
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            # Deferred BEGIN pins one WAL snapshot for both queries
+            cursor.execute("BEGIN")
+
+            cursor.execute("""
+                SELECT severity, incident_type, COUNT(*) as count
+                FROM incidents
+                WHERE detected_at_ms >= ?
+                GROUP BY severity, incident_type
+            """, (since_ms,))
+            for severity, incident_type, count in cursor.fetchall():
+                summary['total'] += count
+                by_severity = summary['by_severity']
+                by_severity[severity] = by_severity.get(severity, 0) + count
+                by_type = summary['by_incident_type']
+                by_type[incident_type] = by_type.get(incident_type, 0) + count
+
+            if not summary['total']:
+                return summary
+
+            # One row per (device, host group); unary + keeps the planner on
+            # the detected_at_ms range instead of walking idx_incidents_camera_time
+            cursor.execute("""
+                SELECT w.device_id, w.incidents, w.last_detected, d.device_type, m.groupid
+                FROM (
+                    SELECT camera_id as device_id, COUNT(*) as incidents,
+                           MAX(detected_at_ms) as last_detected
+                    FROM incidents
+                    WHERE detected_at_ms >= ?
+                    GROUP BY +camera_id
+                ) w
+                LEFT JOIN devices d ON d.device_id = w.device_id
+                LEFT JOIN device_host_groups m ON m.device_id = w.device_id
+            """, (since_ms,))
+            rows = cursor.fetchall()
+
+        per_device = {}
+        by_host_group = summary['by_host_group']
+        for device_id, incidents, last_detected, device_type, groupid in rows:
+            if device_id not in per_device:
+                per_device[device_id] = (incidents, last_detected)
+                if device_type is not None:
+                    by_device_type = summary['by_device_type']
+                    by_device_type[device_type] = by_device_type.get(device_type, 0) + incidents
+            if groupid is not None:
+                by_host_group[groupid] = by_host_group.get(groupid, 0) + incidents
+
+        # Most incidents first, most recently affected first among ties
+        top = sorted(per_device.items(), key=lambda item: item[1], reverse=True)[:top_count]
+        summary['top_affected_devices'] = [
+            {'device_id': device_id, 'incidents': incidents}
+            for device_id, (incidents, _) in top
+        ]
+        return summary
+
+    def backfill_detected_at_ms(self, chunk_size: int = BACKFILL_CHUNK_SIZE) -> int:
+        """
+        Fill detected_at_ms for rows written before schema v10
+
+        Each chunk is its own short transaction, so webhook writers are
+        never blocked for a whole-table UPDATE. Safe to re-run; rows with
+        an unparseable detected_at stay NULL.
+
+        Returns:
+            Number of incidents backfilled
+        """
+        total = 0
+        while True:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    UPDATE incidents
+                    SET detected_at_ms = {EPOCH_MS_SQL.format('detected_at')}
+                    WHERE rowid IN (
+                        SELECT rowid FROM incidents
+                        WHERE detected_at_ms IS NULL AND julianday(detected_at) IS NOT NULL
+                        LIMIT ?
+                    )
+                """, (chunk_size,))
+                updated = cursor.rowcount
+            total += updated
+            if updated < chunk_size:
+                break
+        if total:
+            logger.info(f"Backfilled detected_at_ms for {total} incidents")
+        return total
+
+    def cleanup_old_incidents(self, days: int = 30) -> int:
+        """
+        Delete resolved, cloud-synced incidents detected more than N days ago
+
+        Unsynced and unresolved incidents are kept; analytics history
+        remains in the rollup tables.
+
+        Args:
+            days: Delete incidents older than this many days
+
+        Returns:
+            Number of incidents deleted
+        """
+        before_ms = int(time.time() * 1000) - days * 86400000
+        return self.db.execute_update("""
+            DELETE FROM incidents
+            WHERE detected_at_ms < ?
+            AND resolved_at IS NOT NULL
+            AND synced_to_cloud = 1
+        """, (before_ms,))
+
+    @staticmethod
+    def _rollup_ranges(start: int, end: int) -> List[tuple]:
+        """
+        Cover [start, end) with whole hour buckets plus minute buckets at the edges
+
+        Returns:
+            List of (bucket_seconds, first_bucket_start, end) ranges
+        """
+        start -= start % ROLLUP_MINUTE
+        end -= end % ROLLUP_MINUTE
+        first_hour = -(-start // ROLLUP_HOUR) * ROLLUP_HOUR
+        last_hour = end - end % ROLLUP_HOUR
+        if first_hour >= last_hour:
+            return [(ROLLUP_MINUTE, start, end)] if start < end else []
+
+        ranges = [(ROLLUP_HOUR, first_hour, last_hour)]
+        if start < first_hour:
+            ranges.append((ROLLUP_MINUTE, start, first_hour))
+        if last_hour < end:
+            ranges.append((ROLLUP_MINUTE, last_hour, end))
+        return ranges
+
+    def get_rollup_summary(self, start: int, end: int, top_count: int = 10) -> Dict:
+        """
+        Aggregate incidents in a time window from the rollup tables
+
+        Reads whole hour buckets and minute buckets for the partial hours at
+        either edge, so the cost depends on the number of buckets, not on the
+        number of incidents. Window edges are truncated to whole minutes. All
+        queries run in one read transaction.
+
+        Args:
+            start: Window start (Unix time, inclusive)
+            end: Window end (Unix time, exclusive)
+            top_count: Number of top affected devices to return
+
+        Returns:
+            Same shape as get_summary(), plus 'resolved' (incidents resolved
+            in the window, whenever they were detected)
+        """
+        summary = {
+            'total': 0,
+            'resolved': 0,
+            'by_severity': {},
+            'by_incident_type': {},
+            'by_device_type': {},
+            'by_host_group': {},
+            'top_affected_devices': []
+        }
+        ranges = self._rollup_ranges(start, end)
+        if not ranges:
+            return summary
+
+        where = ' OR '.join(['(bucket_seconds = ? AND bucket_start >= ? AND bucket_start < ?)'] * len(ranges))
+        params = tuple(value for bucket_range in ranges for value in bucket_range)
+
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            # Deferred BEGIN pins one WAL snapshot for all three queries
+            cursor.execute("BEGIN")
+
+            cursor.execute(f"""
+                SELECT severity, incident_type, SUM(detected), SUM(resolved)
+                FROM incident_rollups
+                WHERE {where}
+                GROUP BY severity, incident_type
+            """, params)
+            for severity, incident_type, detected, resolved in cursor.fetchall():
+                summary['resolved'] += resolved
+                if not detected:
+                    continue
+                summary['total'] += detected
+                by_severity = summary['by_severity']
+                by_severity[severity] = by_severity.get(severity, 0) + detected
+                by_type = summary['by_incident_type']
+                by_type[incident_type] = by_type.get(incident_type, 0) + detected
+
+            if not summary['total']:
+                return summary
+
+            cursor.execute(f"""
+                SELECT w.device_id, w.incidents, d.device_type
+                FROM (
+                    SELECT device_id, SUM(detected) as incidents
+                    FROM incident_rollups
+                    WHERE {where}
+                    GROUP BY device_id
+                    HAVING incidents > 0
+                ) w
+                LEFT JOIN devices d ON d.device_id = w.device_id
+            """, params)
+            per_device = cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT groupid, SUM(detected) as incidents
+                FROM incident_rollups_host_group
+                WHERE {where}
+                GROUP BY groupid
+                HAVING incidents > 0
+            """, params)
+            summary['by_host_group'] = {row[0]: row[1] for row in cursor.fetchall()}
+
+        by_device_type = summary['by_device_type']
+        for device_id, incidents, device_type in per_device:
+            if device_type is not None:
+                by_device_type[device_type] = by_device_type.get(device_type, 0) + incidents
+
+        top = sorted(per_device, key=lambda row: (-row[1], row[0]))[:top_count]
+        summary['top_affected_devices'] = [
+            {'device_id': device_id, 'incidents': incidents} for device_id, incidents, _ in top
+        ]
+        return summary
+
+    def cleanup_old_rollups(self, minute_days: int = 2, hour_days: int = 400) -> int:
+        """
+        Delete old rollup buckets (raw incidents are not touched)
+
+        Args:
+            minute_days: Keep minute buckets for this many days
+            hour_days: Keep hour buckets for this many days
+
+        Returns:
+            Number of rollup rows deleted
+        """
+        deleted = 0
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for table in ('incident_rollups', 'incident_rollups_host_group'):
+                for bucket_seconds, days in ((ROLLUP_MINUTE, minute_days), (ROLLUP_HOUR, hour_days)):
+                    cursor.execute(f"""
+                        DELETE FROM {table}
+                        WHERE bucket_seconds = ?
+                        AND bucket_start < CAST(strftime('%s', 'now') AS INTEGER) - ? * 86400
+                    """, (bucket_seconds, days))
+                    deleted += cursor.rowcount
+        return deleted
 
 
 class MessageQueueDAO:
@@ -306,10 +761,11 @@ class MessageQueueDAO:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO message_queue (
-                    message_id, topic, payload, priority, max_attempts
-                ) VALUES (?, ?, ?, ?, ?)
+                    message_id, incident_id, topic, payload, priority, max_attempts
+                ) VALUES (?, ?, ?, ?, ?, ?)
             """, (
                 message['message_id'],
+                message.get('incident_id'),
                 message['topic'],
                 message['payload'],
                 message.get('priority', 3),
@@ -320,7 +776,10 @@ class MessageQueueDAO:
 
     def get_pending(self, limit: int = 50) -> List[Dict]:
         """
-        Get pending messages ordered by priority and scheduled time
+        Get pending messages that are due, ordered by priority and scheduled time
+
+        Messages waiting out a retry backoff (scheduled_at in the future)
+        are skipped.
 
         Args:
             limit: Maximum number of messages to retrieve
@@ -332,70 +791,357 @@ class MessageQueueDAO:
             SELECT * FROM message_queue
             WHERE status = 'pending'
             AND attempts < max_attempts
+            AND scheduled_at <= CURRENT_TIMESTAMP
             ORDER BY priority ASC, scheduled_at ASC
             LIMIT ?
         """, (limit,))
 
+    def claim_pending(self, limit: int = 50, lease_seconds: int = QUEUE_LEASE_SECONDS,
+                      worker_id: Optional[str] = None, min_priority: Optional[int] = None,
+                      max_priority: Optional[int] = None) -> List[Dict]:
+        """
+        Atomically claim pending messages for one worker
+
+        Expired leases are recovered first (see recover_expired_leases),
+        then the highest priority due messages are switched to
+        'inflight' with a lease in a single UPDATE ... RETURNING, so
+        concurrent workers (threads or processes) never claim the same
+        message. The worker resolves each claim with mark_sent_many,
+        increment_attempts or release before the lease expires. A priority
+        range restricts the claim to one priority lane, so a lane for
+        critical messages never waits behind a batch of routine ones.
+
+        Args:
+            limit: Maximum number of messages to claim
+            lease_seconds: Seconds until an unresolved claim may be recovered
+            worker_id: Identifies the claiming worker (stored in claimed_by)
+            min_priority: Only claim messages with priority >= this (None: no bound)
+            max_priority: Only claim messages with priority <= this (None: no bound)
+
+        Returns:
+            List of claimed message dictionaries, by priority and scheduled time
+        """
+        lane, params = '', [lease_seconds, worker_id]
+        if min_priority is not None:
+            lane += ' AND priority >= ?'
+            params.append(min_priority)
+        if max_priority is not None:
+            lane += ' AND priority <= ?'
+            params.append(max_priority)
+        params.append(limit)
+
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            self._recover_expired(cursor)
+            cursor.execute(f"""
+                UPDATE message_queue
+                SET status = 'inflight',
+                    lease_until = datetime('now', '+' || ? || ' seconds'),
+                    claimed_by = ?
+                WHERE message_id IN (
+                    SELECT message_id FROM message_queue
+                    WHERE status = 'pending'
+                    AND attempts < max_attempts
+                    AND scheduled_at <= CURRENT_TIMESTAMP{lane}
+                    ORDER BY priority ASC, scheduled_at ASC
+                    LIMIT ?
+                )
+                RETURNING *
+            """, params)
+            claimed = [dict(row) for row in cursor.fetchall()]
+
+        # RETURNING order is unspecified
+        claimed.sort(key=lambda msg: (msg['priority'], msg['scheduled_at']))
+        return claimed
+
+    @staticmethod
+    def _recover_expired(cursor) -> int:
+        """Return inflight messages with an expired lease to the queue (counts an attempt)"""
+        cursor.execute(f"""
+            UPDATE message_queue
+            SET attempts = attempts + 1,
+                last_attempt_at = CURRENT_TIMESTAMP,
+                last_error = 'Lease expired (worker ' || COALESCE(claimed_by, '?') || ')',
+                status = CASE
+                    WHEN attempts + 1 >= max_attempts THEN 'failed'
+                    ELSE 'pending'
+                END,
+                scheduled_at = datetime('now', '+' || ({QUEUE_BACKOFF_SQL}) || ' seconds'),
+                lease_until = NULL
+            WHERE status = 'inflight'
+            AND lease_until < CURRENT_TIMESTAMP
+        """)
+        recovered = cursor.rowcount
+        if recovered:
+            logger.warning(f"Recovered {recovered} message(s) with an expired lease")
+            MessageQueueDAO._dead_letter(cursor)
+        return recovered
+
+    @staticmethod
+    def _dead_letter(cursor) -> int:
+        """Move messages that used up their attempts ('failed') to message_dead_letter"""
+        cursor.execute("""
+            INSERT OR REPLACE INTO message_dead_letter (
+                message_id, incident_id, topic, payload, priority, attempts, max_attempts, last_error, created_at
+            )
+            SELECT message_id, incident_id, topic, payload, priority, attempts, max_attempts, last_error, created_at
+            FROM message_queue
+            WHERE status = 'failed'
+        """)
+        moved = cursor.rowcount
+        if moved:
+            cursor.execute("DELETE FROM message_queue WHERE status = 'failed'")
+            logger.warning(f"Moved {moved} message(s) to the dead-letter table")
+        return moved
+
+    def recover_expired_leases(self) -> int:
+        """
+        Return messages whose worker died or hung to the queue
+
+        An expired lease counts as a failed attempt (with backoff), so a
+        message that keeps killing its worker ends up dead-lettered instead
+        of looping.
+
+        Returns:
+            Number of messages recovered
+        """
+        with self.db.get_connection() as conn:
+            return self._recover_expired(conn.cursor())
+
+    def release(self, message_ids: List[str]) -> int:
+        """
+        Return claimed messages to the queue without counting an attempt
+        (claimed but not attempted, e.g. publishing stopped mid-batch)
+
+        Args:
+            message_ids: IDs of messages claimed by this worker
+
+        Returns:
+            Number of messages released
+        """
+        released = 0
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(message_ids), QUEUE_CHUNK_SIZE):
+                chunk = message_ids[i:i + QUEUE_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    UPDATE message_queue
+                    SET status = 'pending', lease_until = NULL
+                    WHERE message_id IN ({placeholders})
+                    AND status = 'inflight'
+                """, chunk)
+                released += cursor.rowcount
+        return released
+
     def mark_sent(self, message_id: str):
         """Mark message as successfully sent"""
-        self.db.execute_update("""
-            UPDATE message_queue
-            SET status = 'sent'
-            WHERE message_id = ?
-        """, (message_id,))
+        self.mark_sent_many([message_id])
+
+    def mark_sent_many(self, message_ids: List[str]) -> int:
+        """
+        Mark a batch of messages as sent in one transaction
+
+        Incidents whose outbox message is among them are marked synced
+        to cloud in the same transaction.
+
+        Args:
+            message_ids: IDs of messages acknowledged by IoT Core
+
+        Returns:
+            Number of messages updated
+        """
+        updated = 0
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(message_ids), QUEUE_CHUNK_SIZE):
+                chunk = message_ids[i:i + QUEUE_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    UPDATE message_queue
+                    SET status = 'sent', lease_until = NULL
+                    WHERE message_id IN ({placeholders})
+                """, chunk)
+                updated += cursor.rowcount
+                cursor.execute(f"""
+                    UPDATE incidents
+                    SET synced_to_cloud = 1
+                    WHERE incident_id IN (
+                        SELECT incident_id FROM message_queue
+                        WHERE message_id IN ({placeholders})
+                        AND incident_id IS NOT NULL
+                    )
+                    AND synced_to_cloud = 0
+                """, chunk)
+        return updated
 
     def increment_attempt(self, message_id: str, error: str = None):
         """
-        Increment send attempt counter
+        Increment send attempt counter (see increment_attempts)
 
         Args:
             message_id: ID of message
             error: Error message from failed attempt
         """
+        self.increment_attempts([message_id], error)
+
+    def increment_attempts(self, message_ids: List[str], error: str = None) -> int:
+        """
+        Record a failed send attempt for a batch of messages in one transaction
+
+        Each message is rescheduled after an exponential backoff with
+        jitter (QUEUE_BACKOFF_SQL, from its attempts so far), so a dead
+        uplink is not retried every poll. Messages that reach max_attempts
+        are moved to message_dead_letter.
+
+        Args:
+            message_ids: IDs of messages whose publish failed
+            error: Error message from the failed attempt
+
+        Returns:
+            Number of messages updated
+        """
+        updated = 0
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE message_queue
-                SET attempts = attempts + 1,
-                    last_attempt_at = CURRENT_TIMESTAMP,
-                    last_error = ?,
-                    status = CASE
-                        WHEN attempts + 1 >= max_attempts THEN 'failed'
-                        ELSE 'pending'
-                    END
-                WHERE message_id = ?
-            """, (error, message_id))
+            for i in range(0, len(message_ids), QUEUE_CHUNK_SIZE):
+                chunk = message_ids[i:i + QUEUE_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    UPDATE message_queue
+                    SET attempts = attempts + 1,
+                        last_attempt_at = CURRENT_TIMESTAMP,
+                        last_error = ?,
+                        status = CASE
+                            WHEN attempts + 1 >= max_attempts THEN 'failed'
+                            ELSE 'pending'
+                        END,
+                        scheduled_at = datetime('now', '+' || ({QUEUE_BACKOFF_SQL}) || ' seconds'),
+                        lease_until = NULL
+                    WHERE message_id IN ({placeholders})
+                """, [error] + chunk)
+                updated += cursor.rowcount
+            self._dead_letter(cursor)
+        return updated
+
+    def dead_letter(self, message_ids: List[str], error: str) -> int:
+        """
+        Move messages straight to message_dead_letter, without retries
+        (e.g. a payload that can never be published)
+
+        Args:
+            message_ids: IDs of messages claimed by this worker
+            error: Reason recorded as last_error
+
+        Returns:
+            Number of messages dead-lettered
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(message_ids), QUEUE_CHUNK_SIZE):
+                chunk = message_ids[i:i + QUEUE_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    UPDATE message_queue
+                    SET attempts = attempts + 1,
+                        last_attempt_at = CURRENT_TIMESTAMP,
+                        last_error = ?,
+                        status = 'failed',
+                        lease_until = NULL
+                    WHERE message_id IN ({placeholders})
+                """, [error] + chunk)
+            return self._dead_letter(cursor)
+
+    def get_dead_letters(self, limit: int = 100) -> List[Dict]:
+        """
+        Get dead-lettered messages, most recent first
+
+        Args:
+            limit: Maximum number of messages to retrieve
+
+        Returns:
+            List of dead-letter dictionaries
+        """
+        return self.db.execute_query("""
+            SELECT * FROM message_dead_letter
+            ORDER BY failed_at DESC
+            LIMIT ?
+        """, (limit,))
+
+    def requeue_dead_letters(self, message_ids: List[str]) -> int:
+        """
+        Move dead-lettered messages back to the queue with fresh attempts
+        and their original max_attempts (e.g. after fixing the cause)
+
+        Args:
+            message_ids: IDs of dead-lettered messages
 
-    def cleanup_old_messages(self, days: int = 7) -> int:
+        Returns:
+            Number of messages requeued
+        """
+        requeued = 0
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(message_ids), QUEUE_CHUNK_SIZE):
+                chunk = message_ids[i:i + QUEUE_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO message_queue (
+                        message_id, incident_id, topic, payload, priority, max_attempts
+                    )
+                    SELECT message_id, incident_id, topic, payload, priority, COALESCE(max_attempts, 3)
+                    FROM message_dead_letter
+                    WHERE message_id IN ({placeholders})
+                """, chunk)
+                requeued += cursor.rowcount
+                cursor.execute(f"""
+                    DELETE FROM message_dead_letter
+                    WHERE message_id IN ({placeholders})
+                """, chunk)
+        return requeued
+
+    def cleanup_old_messages(self, days: int = 7, dead_letter_days: int = 30) -> int:
         """
-        Delete old sent/failed messages
+        Delete old sent messages and old dead letters
 
         Args:
-            days: Delete messages older than this many days
+            days: Delete sent messages older than this many days
+            dead_letter_days: Delete dead letters that failed more than this many days ago
 
         Returns:
             Number of messages deleted
         """
-        return self.db.execute_update("""
+        deleted = self.db.execute_update("""
             DELETE FROM message_queue
             WHERE status IN ('sent', 'failed')
             AND created_at < datetime('now', '-' || ? || ' days')
         """, (days,))
+        return deleted + self.db.execute_update("""
+            DELETE FROM message_dead_letter
+            WHERE failed_at < datetime('now', '-' || ? || ' days')
+        """, (dead_letter_days,))
 
     def get_pending_count(self) -> int:
-        """Get count of pending messages"""
+        """Get count of pending messages (due or waiting out a backoff)"""
         result = self.db.execute_query("""
             SELECT COUNT(*) as count FROM message_queue
             WHERE status = 'pending' AND attempts < max_attempts
         """)
         return result[0]['count'] if result else 0
 
-    def get_failed_count(self, max_retries: int = 3) -> int:
-        """Get count of failed messages (exceeded max retries)"""
+    def get_inflight_count(self) -> int:
+        """Get count of messages claimed by a worker and not yet resolved"""
         result = self.db.execute_query("""
             SELECT COUNT(*) as count FROM message_queue
-            WHERE status = 'failed' OR attempts >= ?
-        """, (max_retries,))
+            WHERE status = 'inflight'
+        """)
+        return result[0]['count'] if result else 0
+
+    def get_failed_count(self) -> int:
+        """Get count of failed messages (dead-lettered after max attempts)"""
+        result = self.db.execute_query("""
+            SELECT COUNT(*) as count FROM message_dead_letter
+        """)
         return result[0]['count'] if result else 0
 
 
@@ -406,7 +1152,8 @@ class SyncLogDAO:
         self.db = db_manager
 
     def log(self, sync_type: str, records_synced: int, status: str,
-            error_message: str = None, duration_ms: int = None, checksum: str = None):
+            error_message: str = None, duration_ms: int = None, checksum: str = None,
+            details: Dict = None):
         """
         Log a sync operation
 
@@ -417,14 +1164,16 @@ class SyncLogDAO:
             error_message: Error message if failed
             duration_ms: Duration in milliseconds
             checksum: Optional checksum for data validation
+            details: Optional structured details (e.g. per-call API timings), stored as JSON
         """
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO sync_log (
-                    sync_type, records_synced, status, error_message, duration_ms, checksum
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (sync_type, records_synced, status, error_message, duration_ms, checksum))
+                    sync_type, records_synced, status, error_message, duration_ms, checksum, details
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (sync_type, records_synced, status, error_message, duration_ms, checksum,
+                  json.dumps(details) if details is not None else None))
         logger.info(f"Logged sync: {sync_type} - {status} ({records_synced} records)")
 
     def get_recent(self, sync_type: str = None, limit: int = 10) -> List[Dict]:
@@ -498,6 +1247,21 @@ class ConfigurationDAO:
         """, (value, key))
         logger.debug(f"Config updated: {key} = {value}")
 
+    def set_many(self, values: Dict[str, str]):
+        """
+        Set several configuration values in one transaction
+
+        Args:
+            values: Configuration key -> value (keys must exist, like set())
+        """
+        with self.db.get_connection() as conn:
+            conn.executemany("""
+                UPDATE configuration
+                SET value = ?
+                WHERE key = ?
+            """, [(value, key) for key, value in values.items()])
+        logger.debug(f"Config updated: {values}")
+
     def get_all(self) -> Dict[str, str]:
         """
         Get all configurations as dictionary
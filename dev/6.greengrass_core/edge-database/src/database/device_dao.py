@@ -3,6 +3,7 @@ Device DAO - Data Access Object for devices table (ALL Zabbix hosts)
 Generalized DAO for cameras, servers, network devices, etc.
 """
 import json
+import hashlib
 import logging
 from datetime import datetime
 from typing import List, Dict, Optional
@@ -10,6 +11,144 @@ from .connection import DatabaseManager
 
 logger = logging.getLogger(__name__)
 
+# Rows per executemany call / IN (...) lookup, well below SQLite's parameter limit
+BULK_CHUNK_SIZE = 500
+
+DEVICE_UPSERT_SQL = """
+    INSERT INTO devices (
+        device_id, zabbix_host_id, host_name, visible_name, device_type,
+        ip_address, port, status, available, maintenance_status, lastchange,
+        host_groups, location, tags, ngsi_ld_json, content_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(device_id) DO UPDATE SET
+        host_name = excluded.host_name,
+        visible_name = excluded.visible_name,
+        ip_address = excluded.ip_address,
+        port = excluded.port,
+        status = excluded.status,
+        available = excluded.available,
+        maintenance_status = excluded.maintenance_status,
+        lastchange = excluded.lastchange,
+        host_groups = excluded.host_groups,
+        location = excluded.location,
+        tags = excluded.tags,
+        ngsi_ld_json = excluded.ngsi_ld_json,
+        content_hash = excluded.content_hash,
+        last_seen = CURRENT_TIMESTAMP,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+HOST_GROUP_UPSERT_SQL = """
+    INSERT INTO host_groups (
+        groupid, name, description, internal, flags
+    ) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(groupid) DO UPDATE SET
+        name = excluded.name,
+        description = excluded.description,
+        internal = excluded.internal,
+        flags = excluded.flags,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+# Stable JSON for tags/ngsi_ld so equal content always hashes the same
+_json_encode = json.JSONEncoder(sort_keys=True).encode
+
+
+def _device_row(d: Dict) -> tuple:
+    """
+    Build the DEVICE_UPSERT_SQL parameter tuple for a device
+
+    The last element is the content hash: SHA-256 over every written field
+    except lastchange (which the sync sets to the current time).
+    """
+    row = (
+        d['device_id'],
+        d['zabbix_host_id'],
+        d['host_name'],
+        d.get('visible_name', d['host_name']),
+        d.get('device_type', 'unknown'),
+        d.get('ip_address'),
+        d.get('port', '10050'),
+        d.get('status', 'unknown'),
+        d.get('available', 0),
+        d.get('maintenance_status', 0),
+        d.get('lastchange'),
+        d.get('host_groups', ''),
+        d.get('location'),
+        _json_encode(d.get('tags', [])),
+        _json_encode(d['ngsi_ld'])
+    )
+    hashed = repr(row[:10] + row[11:])
+    return row + (hashlib.sha256(hashed.encode('utf-8')).hexdigest(),)
+
+
+def _group_ids(host_groups: Optional[str]) -> List[str]:
+    """Split a devices.host_groups string ('1,2,15') into group IDs"""
+    return [groupid.strip() for groupid in (host_groups or '').split(',') if groupid.strip()]
+
+
+def _replace_memberships(cursor, rows: List[tuple]):
+    """
+    Rewrite device_host_groups for upserted device rows (caller's transaction)
+
+    Args:
+        cursor: Cursor inside the upsert transaction
+        rows: DEVICE_UPSERT_SQL tuples (device_id first, host_groups at index 11)
+    """
+    device_ids = [(row[0],) for row in rows]
+    cursor.executemany("DELETE FROM device_host_groups WHERE device_id = ?", device_ids)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO device_host_groups (device_id, groupid) VALUES (?, ?)",
+        [(row[0], groupid) for row in rows for groupid in _group_ids(row[11])]
+    )
+
+
+def _bulk_upsert(db: DatabaseManager, table: str, key_column: str, upsert_sql: str,
+                rows: List[tuple], chunk_size: int = BULK_CHUNK_SIZE,
+                on_chunk=None) -> Dict[str, int]:
+    """
+    Upsert prebuilt parameter tuples with executemany in one transaction
+
+    Existing keys are looked up per chunk before writing so inserted and
+    updated rows can be counted (an upsert reports one change either way).
+
+    Args:
+        db: Database manager
+        table: Target table
+        key_column: Conflict key column; must be the first element of each tuple
+        upsert_sql: INSERT ... ON CONFLICT statement
+        rows: Parameter tuples
+        chunk_size: Rows per lookup/executemany call
+        on_chunk: Optional callable(cursor, chunk) run after each chunk is
+            written, in the same transaction (dependent table maintenance)
+
+    Returns:
+        {'total': n, 'inserted': n, 'updated': n}
+    """
+    inserted = 0
+    seen = set()
+    with db.get_connection() as conn:
+        # Take the write lock first so the existence lookup cannot go stale
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            keys = list({row[0] for row in chunk} - seen)
+            if keys:
+                placeholders = ','.join('?' * len(keys))
+                cursor.execute(
+                    f"SELECT {key_column} FROM {table} WHERE {key_column} IN ({placeholders})", keys
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                inserted += len(keys) - len(existing)
+                seen.update(keys)
+            cursor.executemany(upsert_sql, chunk)
+            if on_chunk:
+                on_chunk(cursor, chunk)
+
+    return {'total': len(rows), 'inserted': inserted, 'updated': len(rows) - inserted}
+
 
 class DeviceDAO:
     """Data Access Object for devices table"""
@@ -52,6 +191,10 @@ class DeviceDAO:
                 json.dumps(device.get('tags', [])),
                 json.dumps(device['ngsi_ld'])
             ))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO device_host_groups (device_id, groupid) VALUES (?, ?)",
+                [(device['device_id'], groupid) for groupid in _group_ids(device.get('host_groups'))]
+            )
         logger.info(f"Inserted device: {device['device_id']} ({device.get('device_type')})")
         return device['device_id']
 
@@ -65,51 +208,91 @@ class DeviceDAO:
         Returns:
             Number of devices processed
         """
-        count = 0
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            for device in devices:
-                cursor.execute("""
-                    INSERT INTO devices (
-                        device_id, zabbix_host_id, host_name, visible_name, device_type,
-                        ip_address, port, status, available, maintenance_status, lastchange,
-                        host_groups, location, tags, ngsi_ld_json
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(device_id) DO UPDATE SET
-                        host_name = excluded.host_name,
-                        visible_name = excluded.visible_name,
-                        ip_address = excluded.ip_address,
-                        port = excluded.port,
-                        status = excluded.status,
-                        available = excluded.available,
-                        maintenance_status = excluded.maintenance_status,
-                        lastchange = excluded.lastchange,
-                        host_groups = excluded.host_groups,
-                        location = excluded.location,
-                        tags = excluded.tags,
-                        ngsi_ld_json = excluded.ngsi_ld_json,
-                        last_seen = CURRENT_TIMESTAMP,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (
-                    device['device_id'],
-                    device['zabbix_host_id'],
-                    device['host_name'],
-                    device.get('visible_name', device['host_name']),
-                    device.get('device_type', 'unknown'),
-                    device.get('ip_address'),
-                    device.get('port', '10050'),
-                    device.get('status', 'unknown'),
-                    device.get('available', 0),
-                    device.get('maintenance_status', 0),
-                    device.get('lastchange'),
-                    device.get('host_groups', ''),
-                    device.get('location'),
-                    json.dumps(device.get('tags', [])),
-                    json.dumps(device['ngsi_ld'])
-                ))
-                count += 1
-        logger.info(f"Batch upserted {count} devices")
-        return count
+        return self.bulk_upsert(devices)['total']
+
+    def bulk_upsert(self, devices: List[Dict], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, int]:
+        """
+        Insert/update devices with executemany, reporting inserted vs updated
+
+        Args:
+            devices: List of device dictionaries
+            chunk_size: Rows per executemany call
+
+        Returns:
+            {'total': n, 'inserted': n, 'updated': n}
+        """
+        rows = [_device_row(d) for d in devices]
+
+        result = _bulk_upsert(self.db, 'devices', 'device_id', DEVICE_UPSERT_SQL, rows, chunk_size,
+                              on_chunk=_replace_memberships)
+        logger.info(
+            f"Batch upserted {result['total']} devices "
+            f"({result['inserted']} new, {result['updated']} updated)"
+        )
+        return result
+
+    def get_content_hashes(self) -> Dict[str, str]:
+        """
+        Get content hashes of devices managed by the host registry sync
+
+        Returns:
+            {device_id: content_hash} for rows with a hash (webhook-created
+            and soft-deleted devices have none)
+        """
+        rows = self.db.execute_query(
+            "SELECT device_id, content_hash FROM devices WHERE content_hash IS NOT NULL"
+        )
+        return {row['device_id']: row['content_hash'] for row in rows}
+
+    def sync_upsert(self, devices: List[Dict], delete_missing: bool = False,
+                    stored_hashes: Dict[str, str] = None,
+                    chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, int]:
+        """
+        Diff devices against their stored content hash and write only changes
+
+        Unchanged devices are not rewritten, so lastchange/updated_at keep
+        their values and scheduled syncs add nothing to the WAL. Fields set
+        by other writers (e.g. webhook status updates) are not part of the
+        stored hash and are only overwritten when the Zabbix data changes.
+
+        Args:
+            devices: Complete device dictionaries (as for bulk_upsert)
+            delete_missing: Soft-delete hashed devices absent from `devices`
+                (only correct when `devices` is a full host listing)
+            stored_hashes: Result of get_content_hashes(), so a paginated sync
+                reads the hashes once instead of once per page
+            chunk_size: Rows per executemany call
+
+        Returns:
+            {'total', 'new', 'updated', 'unchanged', 'deleted'} counts
+        """
+        stored = self.get_content_hashes() if stored_hashes is None else stored_hashes
+        rows = [_device_row(d) for d in devices]
+        changed = [row for row in rows if stored.get(row[0]) != row[-1]]
+
+        result = {'total': 0, 'inserted': 0, 'updated': 0}
+        if changed:
+            result = _bulk_upsert(self.db, 'devices', 'device_id', DEVICE_UPSERT_SQL, changed, chunk_size,
+                                  on_chunk=_replace_memberships)
+
+        deleted = []
+        if delete_missing:
+            fetched = {row[0] for row in rows}
+            deleted = [device_id for device_id in stored if device_id not in fetched]
+            self.mark_as_deleted(deleted)
+
+        stats = {
+            'total': len(rows),
+            'new': result['inserted'],
+            'updated': result['updated'],
+            'unchanged': len(rows) - len(changed),
+            'deleted': len(deleted)
+        }
+        logger.debug(
+            f"Synced {stats['total']} devices ({stats['new']} new, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted)"
+        )
+        return stats
 
     def get_by_id(self, device_id: str) -> Optional[Dict]:
         """Get device by device_id"""
@@ -181,6 +364,44 @@ class DeviceDAO:
             result = self.db.execute_query("SELECT COUNT(*) as count FROM devices")
         return result[0]['count']
 
+    def get_count_by_type(self) -> Dict[str, int]:
+        """Get device counts per device_type"""
+        results = self.db.execute_query("""
+            SELECT device_type, COUNT(*) as count FROM devices
+            GROUP BY device_type
+        """)
+        return {row['device_type']: row['count'] for row in results}
+
+    def get_count_by_status(self) -> Dict[str, int]:
+        """Get device counts per status (soft-deleted devices count as 'deleted')"""
+        results = self.db.execute_query("""
+            SELECT status, COUNT(*) as count FROM devices
+            GROUP BY status
+        """)
+        return {row['status']: row['count'] for row in results}
+
+    def get_count_by_host_group(self) -> Dict[str, int]:
+        """
+        Get device counts per host group name
+
+        Reads the device_host_groups join table (a device in several groups
+        counts once per group); groups without devices are omitted.
+
+        Returns:
+            {host group name: device count}, largest first
+        """
+        results = self.db.execute_query("""
+            SELECT hg.name, m.count
+            FROM (
+                SELECT groupid, COUNT(*) as count
+                FROM device_host_groups
+                GROUP BY groupid
+            ) m
+            JOIN host_groups hg ON hg.groupid = m.groupid
+            ORDER BY m.count DESC
+        """)
+        return {row['name']: row['count'] for row in results}
+
     def get_modified_since(self, unix_timestamp: int) -> List[Dict]:
         """
         Get devices modified since given Unix timestamp
@@ -199,18 +420,26 @@ class DeviceDAO:
         """, (unix_timestamp,))
 
     def mark_as_deleted(self, device_ids: List[str]):
-        """Mark devices as deleted (soft delete)"""
+        """
+        Mark devices as deleted (soft delete)
+
+        Clears content_hash so a host that reappears in Zabbix is rewritten
+        by the next sync, and drops its host group memberships.
+        """
         if not device_ids:
             return
 
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            placeholders = ','.join('?' * len(device_ids))
-            cursor.execute(f"""
-                UPDATE devices
-                SET status = 'deleted', updated_at = CURRENT_TIMESTAMP
-                WHERE device_id IN ({placeholders})
-            """, device_ids)
+            for i in range(0, len(device_ids), BULK_CHUNK_SIZE):
+                chunk = device_ids[i:i + BULK_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    UPDATE devices
+                    SET status = 'deleted', content_hash = NULL, updated_at = CURRENT_TIMESTAMP
+                    WHERE device_id IN ({placeholders})
+                """, chunk)
+                cursor.execute(f"DELETE FROM device_host_groups WHERE device_id IN ({placeholders})", chunk)
         logger.info(f"Marked {len(device_ids)} devices as deleted")
 
 
@@ -240,30 +469,29 @@ class HostGroupDAO:
 
     def batch_upsert(self, host_groups: List[Dict]) -> int:
         """Batch insert/update host groups"""
-        count = 0
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            for hg in host_groups:
-                cursor.execute("""
-                    INSERT INTO host_groups (
-                        groupid, name, description, internal, flags
-                    ) VALUES (?, ?, ?, ?, ?)
-                    ON CONFLICT(groupid) DO UPDATE SET
-                        name = excluded.name,
-                        description = excluded.description,
-                        internal = excluded.internal,
-                        flags = excluded.flags,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (
-                    hg['groupid'],
-                    hg['name'],
-                    hg.get('description', ''),
-                    hg.get('internal', 0),
-                    hg.get('flags', 0)
-                ))
-                count += 1
-        logger.info(f"Batch upserted {count} host groups")
-        return count
+        return self.bulk_upsert(host_groups)['total']
+
+    def bulk_upsert(self, host_groups: List[Dict], chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, int]:
+        """
+        Insert/update host groups with executemany, reporting inserted vs updated
+
+        Returns:
+            {'total': n, 'inserted': n, 'updated': n}
+        """
+        rows = [(
+            hg['groupid'],
+            hg['name'],
+            hg.get('description', ''),
+            hg.get('internal', 0),
+            hg.get('flags', 0)
+        ) for hg in host_groups]
+
+        result = _bulk_upsert(self.db, 'host_groups', 'groupid', HOST_GROUP_UPSERT_SQL, rows, chunk_size)
+        logger.info(
+            f"Batch upserted {result['total']} host groups "
+            f"({result['inserted']} new, {result['updated']} updated)"
+        )
+        return result
 
     def get_by_id(self, groupid: str) -> Optional[Dict]:
         """Get host group by ID"""
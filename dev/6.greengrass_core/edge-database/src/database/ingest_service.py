@@ -0,0 +1,376 @@
+"""
+Incident Ingest Service - single-transaction webhook ingest path
+Resolves the camera, writes the incident and updates device status
+on one pooled connection and commits once
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+from .connection import DatabaseManager
+from .camera_cache import CameraIdentityCache
+from .dao import IncidentDAO, EPOCH_MS_SQL
+
+logger = logging.getLogger(__name__)
+
+# Max host parameters per IN (...) lookup, well below SQLite's limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+@dataclass
+class IngestResult:
+    """Outcome of ingesting a single Zabbix event"""
+    incident_id: str
+    camera_id: str
+    incident_type: str
+    severity: str
+    action: str                  # inserted | resolved | inserted_recovery | duplicate
+    camera_created: bool = False
+    camera_status: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        """Convert result to plain dictionary (for JSON responses)"""
+        return asdict(self)
+
+
+class IncidentIngestService:
+    """
+    Writes Zabbix events into the edge database atomically
+
+    Camera resolution (by id, Zabbix host id, then IP), optional camera
+    auto-creation, incident insert/resolve, the outbox message for the
+    cloud and the status update all run in one transaction, so a crash
+    can never leave a partial write behind.
+    Batches are resolved with set-based lookups and written with
+    executemany, so a storm of events costs one commit. With a camera
+    cache, known cameras are resolved without reading the devices table.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, site_id: str = 'site-001',
+                 camera_cache: Optional[CameraIdentityCache] = None):
+        self.db = db_manager
+        self.site_id = site_id
+        self.camera_cache = camera_cache
+
+    def ingest_event(self, incident_data: Dict, incident_id: str, ngsi_ld: Dict,
+                     is_recovery: bool) -> IngestResult:
+        """
+        Ingest one event in a single transaction
+
+        Args:
+            incident_data: Normalized output of transform_zabbix_webhook_to_incident()
+            incident_id: Pre-generated incident ID (used if a new row is inserted)
+            ngsi_ld: NGSI-LD representation of the incident
+            is_recovery: True for OK/RESOLVED events
+
+        Returns:
+            IngestResult describing what was written
+        """
+        result = self.ingest_batch([(incident_data, incident_id, ngsi_ld, is_recovery)])[0]
+        logger.info(
+            f"Ingested event {incident_data.get('zabbix_event_id')}: {result.action} "
+            f"{result.incident_id} | Camera: {result.camera_id}"
+        )
+        return result
+
+    def ingest_batch(self, events: List[Tuple[Dict, str, Dict, bool]]) -> List[IngestResult]:
+        """
+        Ingest many events in one transaction
+
+        Events are applied in order, so a problem and its recovery in the
+        same batch resolve correctly and the last event per camera decides
+        its final status.
+
+        Args:
+            events: List of (incident_data, incident_id, ngsi_ld, is_recovery) tuples
+
+        Returns:
+            List of IngestResult, one per event in input order
+        """
+        if not events:
+            return []
+
+        with self.db.get_connection() as conn:
+            # Take the write lock before the lookups so concurrent writers
+            # (threads or worker processes) cannot plan the same camera insert
+            conn.execute("BEGIN IMMEDIATE")
+            results, touched_devices = self._ingest(conn.cursor(), events)
+
+        # Write-through only after commit, so a rollback never leaves phantom cameras
+        if self.camera_cache is not None:
+            self.camera_cache.put_many(touched_devices)
+            for result in results:
+                if result.camera_status:
+                    self.camera_cache.update_status(result.camera_id, result.camera_status)
+
+        if len(events) > 1:
+            logger.info(f"Ingested batch of {len(events)} events")
+        return results
+
+    def _ingest(self, cursor: sqlite3.Cursor,
+                events: List[Tuple[Dict, str, Dict, bool]]) -> Tuple[List[IngestResult], List[Dict]]:
+        """
+        Plan and apply a batch on an open cursor (caller owns the transaction)
+
+        Returns:
+            (results, devices read from the database or created/changed by this batch)
+        """
+        devices, touched = self._prefetch_devices(cursor, [e[0] for e in events])
+        known_incidents = self._prefetch_incidents(
+            cursor, [e[0].get('zabbix_event_id') for e in events]
+        )
+
+        new_devices = []
+        host_id_updates = []
+        incident_rows = []
+        resolve_rows = []
+        status_updates = {}
+        results = []
+
+        for incident_data, incident_id, ngsi_ld, is_recovery in events:
+            camera_id, camera_created = self._resolve_camera(
+                incident_data, devices, new_devices, host_id_updates
+            )
+            zabbix_event_id = incident_data.get('zabbix_event_id')
+            timestamp = incident_data['timestamp']
+            existing_id = known_incidents.get(zabbix_event_id) if zabbix_event_id else None
+
+            if is_recovery and existing_id:
+                incident_id = existing_id
+                resolve_rows.append((timestamp, timestamp, incident_id))
+                action = 'resolved'
+            elif existing_id:
+                # Zabbix retried a problem event we already stored
+                incident_id = existing_id
+                action = 'duplicate'
+            else:
+                # Recovery without prior problem event is stored as already resolved
+                incident_rows.append((
+                    incident_id,
+                    camera_id,
+                    zabbix_event_id,
+                    incident_data['incident_type'],
+                    incident_data['severity'],
+                    timestamp,
+                    timestamp,
+                    timestamp if is_recovery else None,
+                    0 if is_recovery else None,
+                    json.dumps(ngsi_ld)
+                ))
+                if zabbix_event_id:
+                    known_incidents[zabbix_event_id] = incident_id
+                action = 'inserted_recovery' if is_recovery else 'inserted'
+
+            camera_status = None
+            if action != 'duplicate':
+                camera_status = 'offline' if incident_data['incident_type'] == 'camera_offline' else 'online'
+                status_updates.pop(camera_id, None)  # keep insertion order = last event wins
+                status_updates[camera_id] = camera_status
+
+            results.append(IngestResult(
+                incident_id=incident_id,
+                camera_id=camera_id,
+                incident_type=incident_data['incident_type'],
+                severity=incident_data['severity'],
+                action=action,
+                camera_created=camera_created,
+                camera_status=camera_status
+            ))
+
+        touched.extend({'device_id': row[0], 'zabbix_host_id': row[1], 'ip_address': row[4],
+                        'status': 'offline'} for row in new_devices)
+        touched.extend(devices['by_host'][host_id] for host_id, _ in host_id_updates)
+
+        if new_devices:
+            cursor.executemany("""
+                INSERT INTO devices (
+                    device_id, zabbix_host_id, host_name, visible_name, device_type,
+                    ip_address, status, site_id, ngsi_ld_json
+                ) VALUES (?, ?, ?, ?, 'camera', ?, 'offline', ?, ?)
+            """, new_devices)
+            logger.info(f"Created {len(new_devices)} new camera record(s)")
+
+        if host_id_updates:
+            cursor.executemany(
+                "UPDATE devices SET zabbix_host_id = ? WHERE device_id = ?",
+                host_id_updates
+            )
+
+        if incident_rows:
+            cursor.executemany(f"""
+                INSERT INTO incidents (
+                    incident_id, camera_id, zabbix_event_id, incident_type,
+                    severity, detected_at, detected_at_ms, resolved_at, duration_seconds, ngsi_ld_json
+                ) VALUES (?, ?, ?, ?, ?, ?, {EPOCH_MS_SQL.format('?')}, ?, ?, ?)
+            """, incident_rows)
+            IncidentDAO.apply_rollups(cursor, [row[0] for row in incident_rows])
+            # Incidents inserted already resolved only need the resolution message
+            IncidentDAO.enqueue_outbox(cursor, [row[0] for row in incident_rows if row[7] is None],
+                                       site_id=self.site_id)
+
+        # Recoveries without a prior problem are inserted already resolved;
+        # retried recoveries of resolved incidents change nothing
+        resolved_ids = [row[0] for row in incident_rows if row[7] is not None]
+        if resolve_rows:
+            resolved_ids.extend(self._unresolved_incidents(cursor, [row[2] for row in resolve_rows]))
+            cursor.executemany("""
+                UPDATE incidents
+                SET resolved_at = ?,
+                    duration_seconds = CAST((julianday(?) - julianday(detected_at)) * 86400 AS INTEGER)
+                WHERE incident_id = ? AND resolved_at IS NULL
+            """, resolve_rows)
+        if resolved_ids:
+            IncidentDAO.apply_rollups(cursor, resolved_ids, resolved=True)
+            IncidentDAO.enqueue_outbox(cursor, resolved_ids, resolved=True, site_id=self.site_id)
+
+        if status_updates:
+            cursor.executemany(
+                "UPDATE devices SET status = ?, last_seen = CURRENT_TIMESTAMP WHERE device_id = ?",
+                [(status, device_id) for device_id, status in status_updates.items()]
+            )
+
+        return results, touched
+
+    @staticmethod
+    def _chunks(values: List, size: int = LOOKUP_CHUNK_SIZE):
+        """Yield successive chunks of a list"""
+        for i in range(0, len(values), size):
+            yield values[i:i + size]
+
+    def _prefetch_devices(self, cursor: sqlite3.Cursor,
+                          incidents: List[Dict]) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """
+        Load every device a batch could resolve to with set-based lookups
+
+        Cameras found in the cache (by id, then Zabbix host id, then IP)
+        are not read again. Lookups go to the devices table (cameras is a
+        VIEW over it), so a host already registered under another device
+        type is reused instead of colliding on the unique zabbix_host_id.
+
+        Returns:
+            ({'by_id': {...}, 'by_host': {...}, 'by_ip': {...}} mapping keys to
+            device rows, list of rows read from the database)
+        """
+        devices = {'by_id': {}, 'by_host': {}, 'by_ip': {}}
+        if self.camera_cache is not None:
+            identities = {(i['camera_id'], i.get('host_id'), i.get('host_ip')): i for i in incidents}
+            incidents = [i for i in identities.values() if not self._resolve_cached(i, devices)]
+
+        lookups = {
+            'by_id': ('device_id', {i['camera_id'] for i in incidents}),
+            'by_host': ('zabbix_host_id', {i.get('host_id') for i in incidents if i.get('host_id')}),
+            'by_ip': ('ip_address', {i.get('host_ip') for i in incidents
+                                     if i.get('host_ip') and i.get('host_ip') != 'unknown'})
+        }
+
+        read = []
+        for name, (column, keys) in lookups.items():
+            found = devices[name]
+            for chunk in self._chunks(sorted(keys)):
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT device_id, zabbix_host_id, ip_address, status FROM devices
+                    WHERE {column} IN ({placeholders})
+                """, chunk)
+                for row in cursor.fetchall():
+                    read.append(found.setdefault(row[column], dict(row)))
+        return devices, read
+
+    def _resolve_cached(self, incident_data: Dict, devices: Dict[str, Dict]) -> bool:
+        """Place the cached device for an event in the lookup maps; False on cache miss"""
+        host_id = incident_data.get('host_id')
+        host_ip = incident_data.get('host_ip')
+        for name, field, key in (('by_id', 'device_id', incident_data['camera_id']),
+                                 ('by_host', 'zabbix_host_id', host_id),
+                                 ('by_ip', 'ip_address', host_ip)):
+            if not key or key == 'unknown':
+                continue
+            if key in devices[name]:
+                return True
+            device = self.camera_cache.get(field, key)
+            if device:
+                devices[name][key] = device
+                return True
+        return False
+
+    def _prefetch_incidents(self, cursor: sqlite3.Cursor, event_ids: List[str]) -> Dict[str, str]:
+        """Map already-stored zabbix_event_id values to their incident_id"""
+        known = {}
+        for chunk in self._chunks(sorted({e for e in event_ids if e})):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT zabbix_event_id, incident_id FROM incidents
+                WHERE zabbix_event_id IN ({placeholders})
+            """, chunk)
+            known.update({row['zabbix_event_id']: row['incident_id'] for row in cursor.fetchall()})
+        return known
+
+    def _unresolved_incidents(self, cursor: sqlite3.Cursor, incident_ids: List[str]) -> List[str]:
+        """Subset of incident_ids that are stored and not yet resolved"""
+        unresolved = []
+        for chunk in self._chunks(sorted(set(incident_ids))):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT incident_id FROM incidents
+                WHERE incident_id IN ({placeholders}) AND resolved_at IS NULL
+            """, chunk)
+            unresolved.extend(row['incident_id'] for row in cursor.fetchall())
+        return unresolved
+
+    def _resolve_camera(self, incident_data: Dict, devices: Dict[str, Dict],
+                        new_devices: List[tuple], host_id_updates: List[tuple]) -> tuple:
+        """
+        Find the device for an event, planning a camera insert if unknown
+
+        Planned inserts and host id changes are recorded in the lookup maps
+        so later events in the same batch resolve to them.
+
+        Returns:
+            (camera_id, camera_created)
+        """
+        camera_id = incident_data['camera_id']
+        host_id = incident_data.get('host_id')
+        host_ip = incident_data.get('host_ip')
+
+        device = devices['by_id'].get(camera_id)
+        if device:
+            return device['device_id'], False
+
+        if host_id:
+            device = devices['by_host'].get(host_id)
+            if device:
+                return device['device_id'], False
+
+        if host_ip and host_ip != 'unknown':
+            device = devices['by_ip'].get(host_ip)
+            if device:
+                if host_id and device['zabbix_host_id'] != host_id:
+                    logger.warning(
+                        f"Zabbix host_id changed for {device['device_id']}: "
+                        f"{device['zabbix_host_id']} -> {host_id}"
+                    )
+                    host_id_updates.append((host_id, device['device_id']))
+                    devices['by_host'].pop(device['zabbix_host_id'], None)
+                    device['zabbix_host_id'] = host_id
+                    devices['by_host'][host_id] = device
+                return device['device_id'], False
+
+        hostname = incident_data.get('host_name') or f'Camera-{camera_id}'
+        new_devices.append((
+            camera_id,
+            host_id,
+            hostname,
+            hostname,
+            host_ip or 'unknown',
+            self.site_id,
+            json.dumps({})
+        ))
+
+        device = {'device_id': camera_id, 'zabbix_host_id': host_id, 'ip_address': host_ip}
+        devices['by_id'][camera_id] = device
+        if host_id:
+            devices['by_host'][host_id] = device
+        if host_ip and host_ip != 'unknown':
+            devices['by_ip'].setdefault(host_ip, device)
+        return camera_id, True
@@ -8,10 +8,20 @@ from .ngsi_ld import (
     create_ngsi_ld_property,
     create_ngsi_ld_relationship
 )
+from .envelope import (
+    encode_payload,
+    pack_envelopes,
+    decode_envelope,
+    ZSTD_AVAILABLE
+)
 
 __all__ = [
     "transform_camera_to_ngsi_ld",
     "transform_incident_to_ngsi_ld",
     "create_ngsi_ld_property",
-    "create_ngsi_ld_relationship"
+    "create_ngsi_ld_relationship",
+    "encode_payload",
+    "pack_envelopes",
+    "decode_envelope",
+    "ZSTD_AVAILABLE"
 ]
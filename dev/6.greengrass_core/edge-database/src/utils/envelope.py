@@ -0,0 +1,181 @@
+"""
+Message Envelope Utilities
+Coalesces queued payloads for one MQTT topic into batch envelopes up to a
+size budget, optionally compressed, and decodes them on the cloud side
+
+Wire format (one MQTT message):
+    - plain payload: compact JSON object (a batch of one, uncompressed)
+    - envelope: {"type": "MessageBatch", "version": 1, "count": N, "messages": [...]}
+    - gzip / zstd: the envelope compressed, recognized by its magic bytes
+
+decode_envelope() accepts all of them, so a consumer can switch to it
+before the edge enables envelopes. Standard library only (zstd needs the
+optional zstandard package), so the module can be copied into a Lambda as is:
+
+    python3 envelope.py message.bin    # one decoded message per line
+"""
+import sys
+import json
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+ENVELOPE_TYPE = "MessageBatch"
+ENVELOPE_VERSION = 1
+COMPRESSIONS = ('gzip', 'zstd')
+# AWS IoT Core bills messages in 5 KB increments
+DEFAULT_MAX_BYTES = 5 * 1024
+# AWS IoT Core maximum payload size
+MAX_PAYLOAD_BYTES = 128 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Envelope bytes around the joined messages (count up to 7 digits)
+ENVELOPE_OVERHEAD = len(json.dumps({
+    "type": ENVELOPE_TYPE, "version": ENVELOPE_VERSION, "count": 9999999, "messages": []
+}, separators=(',', ':')))
+
+
+def encode_payload(payload: Dict) -> bytes:
+    """Compact JSON encoding of one payload"""
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def compress_envelope(data: bytes, compression: Optional[str]) -> bytes:
+    """
+    Compress an encoded envelope
+
+    Args:
+        data: Encoded envelope
+        compression: None, 'gzip' or 'zstd'
+
+    Returns:
+        Compressed (or unchanged) bytes
+    """
+    if compression is None:
+        return data
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _envelope(items: List[bytes]) -> bytes:
+    """Join encoded payloads into an envelope"""
+    header = json.dumps({
+        "type": ENVELOPE_TYPE, "version": ENVELOPE_VERSION, "count": len(items)
+    }, separators=(',', ':'))[:-1].encode('utf-8')
+    return header + b',"messages":[' + b','.join(items) + b']}'
+
+
+def _encode(items: List[bytes], compression: Optional[str]) -> bytes:
+    """Encode a group as a plain payload (one, uncompressed) or an envelope"""
+    if len(items) == 1 and compression is None:
+        return items[0]
+    return compress_envelope(_envelope(items), compression)
+
+
+def _split(indexes: List[int], items: List[bytes], max_bytes: int,
+           compression: Optional[str]) -> List[Tuple[List[int], bytes]]:
+    """Encode a group, splitting it evenly until every part fits max_bytes"""
+    data = _encode(items, compression)
+    if len(data) <= max_bytes or len(items) == 1:
+        return [(indexes, data)]
+
+    parts = min(-(-len(data) // max_bytes), len(items))
+    size = -(-len(items) // parts)
+    groups = []
+    for start in range(0, len(items), size):
+        groups.extend(_split(indexes[start:start + size], items[start:start + size],
+                             max_bytes, compression))
+    return groups
+
+
+def pack_envelopes(payloads: List[Dict], max_bytes: int = DEFAULT_MAX_BYTES,
+                   compression: Optional[str] = None) -> List[Tuple[List[int], bytes]]:
+    """
+    Coalesce payloads for one topic into messages of at most max_bytes
+
+    Payloads keep their order. Uncompressed groups are filled greedily up
+    to max_bytes; compressed groups are filled up to MAX_PAYLOAD_BYTES
+    before compression and split evenly until each compressed part fits.
+    A single payload larger than max_bytes is sent on its own.
+
+    Args:
+        payloads: Message payloads in send order
+        max_bytes: Size budget per published message
+        compression: None, 'gzip' or 'zstd'
+
+    Returns:
+        List of (payload indexes, encoded message) tuples
+    """
+    raw_limit = max_bytes if compression is None else MAX_PAYLOAD_BYTES
+    messages = []
+    indexes, items, size = [], [], ENVELOPE_OVERHEAD
+
+    for index, payload in enumerate(payloads):
+        item = encode_payload(payload)
+        if items and size + len(item) + 1 > raw_limit:
+            messages.extend(_split(indexes, items, max_bytes, compression))
+            indexes, items, size = [], [], ENVELOPE_OVERHEAD
+        indexes.append(index)
+        items.append(item)
+        size += len(item) + 1
+
+    if items:
+        messages.extend(_split(indexes, items, max_bytes, compression))
+    return messages
+
+
+def decode_envelope(data: bytes) -> List[Dict]:
+    """
+    Decode one received MQTT message into its payloads
+
+    Args:
+        data: Message bytes (plain payload, envelope, gzip or zstd envelope)
+
+    Returns:
+        List of payload dictionaries, in send order
+
+    Raises:
+        ValueError: If the message is not valid JSON or uses an unknown envelope version
+    """
+    if data.startswith(GZIP_MAGIC):
+        data = gzip.decompress(data)
+    elif data.startswith(ZSTD_MAGIC):
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd message received but the zstandard package is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data, max_output_size=64 * MAX_PAYLOAD_BYTES)
+
+    message = json.loads(data)
+    if not isinstance(message, dict) or message.get('type') != ENVELOPE_TYPE:
+        return [message]
+    if message.get('version') != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported envelope version: {message.get('version')}")
+    return message['messages']
+
+
+def main():
+    """Decode message files (or stdin) and print one payload per line"""
+    paths = sys.argv[1:] or ['-']
+    for path in paths:
+        if path == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        for payload in decode_envelope(data):
+            print(json.dumps(payload))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-row vs executemany device upsert
+Compares the legacy per-row batch_upsert loop with DeviceDAO.bulk_upsert
+for 1k/10k/50k synthetic Zabbix hosts (insert pass + update pass), and
+a re-sync of unchanged hosts through DeviceDAO.sync_upsert (content hash diff)
+
+Runs on a temporary database created from the deployed schema, so the
+production database is never written.
+
+Usage:
+    python3 benchmark_bulk_upsert.py [--sizes 1000 10000 50000] [--schema-db PATH]
+"""
+import sys
+import os
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection import DatabaseManager
+from database.device_dao import DeviceDAO, DEVICE_UPSERT_SQL
+
+
+def make_devices(count: int, generation: int) -> list:
+    """Synthetic host-registry payload (generation changes mutable fields)"""
+    return [{
+        'device_id': f'DEV-{100000 + i}',
+        'zabbix_host_id': str(100000 + i),
+        'host_name': f'bench-host-{i:05d}',
+        'visible_name': f'Bench Host {i:05d} (gen {generation})',
+        'device_type': 'camera' if i % 3 == 0 else 'server',
+        'ip_address': f'10.{i // 65536}.{(i // 256) % 256}.{i % 256}',
+        'port': '10050',
+        'status': 'online' if (i + generation) % 5 else 'offline',
+        'available': 1,
+        'maintenance_status': 0,
+        'lastchange': 1767225600 + generation,
+        'host_groups': '1,2',
+        'tags': [{'tag': 'site', 'value': 'site-001'}],
+        'ngsi_ld': {'id': f'urn:ngsi-ld:Device:DEV-{100000 + i}', 'type': 'Device', 'gen': generation}
+    } for i in range(count)]
+
+
+def legacy_batch_upsert(db: DatabaseManager, devices: list) -> int:
+    """Pre-bulk implementation: one execute() and json.dumps per row"""
+    count = 0
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for device in devices:
+            cursor.execute(DEVICE_UPSERT_SQL, (
+                device['device_id'],
+                device['zabbix_host_id'],
+                device['host_name'],
+                device.get('visible_name', device['host_name']),
+                device.get('device_type', 'unknown'),
+                device.get('ip_address'),
+                device.get('port', '10050'),
+                device.get('status', 'unknown'),
+                device.get('available', 0),
+                device.get('maintenance_status', 0),
+                device.get('lastchange'),
+                device.get('host_groups', ''),
+                device.get('location'),
+                json.dumps(device.get('tags', [])),
+                json.dumps(device['ngsi_ld']),
+                None
+            ))
+            count += 1
+    return count
+
+
+def create_benchmark_db(schema_db: str) -> str:
+    """Create a temporary database with the deployed schema (no rows)"""
+    fd, path = tempfile.mkstemp(prefix='bench-devices-', suffix='.db')
+    os.close(fd)
+    source = sqlite3.connect(f'file:{schema_db}?mode=ro', uri=True)
+    target = sqlite3.connect(path)
+    for (sql,) in source.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY CASE type WHEN 'table' THEN 1 WHEN 'index' THEN 2 WHEN 'view' THEN 3 ELSE 4 END, rowid
+    """):
+        target.execute(sql)
+    target.commit()
+    target.close()
+    source.close()
+    return path
+
+
+def timed(fn, *args):
+    """Run fn and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark device upsert strategies')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--schema-db', default='/var/greengrass/database/greengrass.db',
+                        help='Database to copy the schema from (read-only)')
+    args = parser.parse_args()
+
+    path = create_benchmark_db(args.schema_db)
+    db = DatabaseManager(path)
+    device_dao = DeviceDAO(db)
+
+    print("\n" + "=" * 86)
+    print("  DEVICE UPSERT BENCHMARK (per-row execute vs executemany)")
+    print("=" * 86)
+    print(f"  {'hosts':>7} | {'pass':<6} | {'per-row (s)':>11} | {'bulk (s)':>9} | "
+          f"{'speedup':>7} | {'bulk rows/s':>11} | counts")
+    print("-" * 86)
+
+    try:
+        for size in args.sizes:
+            results = {}
+            for strategy in ('legacy', 'bulk'):
+                db.execute_update("DELETE FROM devices")
+                for label, generation in (('insert', 0), ('update', 1)):
+                    devices = make_devices(size, generation)
+                    if strategy == 'legacy':
+                        _, elapsed = timed(legacy_batch_upsert, db, devices)
+                        results[(label, strategy)] = (elapsed, None)
+                    else:
+                        counts, elapsed = timed(device_dao.bulk_upsert, devices)
+                        results[(label, strategy)] = (elapsed, counts)
+
+                # Scheduled sync with nothing changed since the update pass
+                devices = make_devices(size, 1)
+                if strategy == 'legacy':
+                    _, elapsed = timed(legacy_batch_upsert, db, devices)
+                    results[('resync', strategy)] = (elapsed, None)
+                else:
+                    stats, elapsed = timed(device_dao.sync_upsert, devices)
+                    results[('resync', strategy)] = (elapsed, {'inserted': stats['new'], 'updated': stats['updated']})
+
+            for label in ('insert', 'update', 'resync'):
+                legacy_s, _ = results[(label, 'legacy')]
+                bulk_s, counts = results[(label, 'bulk')]
+                print(f"  {size:>7} | {label:<6} | {legacy_s:>11.3f} | {bulk_s:>9.3f} | "
+                      f"{legacy_s / bulk_s:>6.2f}x | {size / bulk_s:>11.0f} | "
+                      f"+{counts['inserted']} ~{counts['updated']}")
+
+            expected = {'insert': (size, 0), 'update': (0, size), 'resync': (0, 0)}
+            for label, (inserted, updated) in expected.items():
+                counts = results[(label, 'bulk')][1]
+                assert (counts['inserted'], counts['updated']) == (inserted, updated), \
+                    f"Wrong {label} counts for {size} hosts: {counts}"
+        print("=" * 86 + "\n")
+        return 0
+    finally:
+        db.close()
+        for ext in ('', '-wal', '-shm'):
+            if os.path.exists(path + ext):
+                os.remove(path + ext)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark: host group counts via comma-string LIKE join vs device_host_groups
+Compares the pre-v8 inventory query (LIKE join on devices.host_groups) and the
+analytics host group count (per-incident get_by_id + split in Python) with the
+join-table queries, for growing device counts
+
+Runs on a temporary database created from the deployed schema, so the
+production database is never written.
+
+Usage:
+    python3 benchmark_host_groups.py [--sizes 1000 10000 50000] [--groups 500] [--schema-db PATH]
+"""
+import sys
+import os
+import argparse
+from collections import Counter
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection import DatabaseManager
+from database.device_dao import DeviceDAO, HostGroupDAO
+from benchmark_bulk_upsert import create_benchmark_db, timed
+
+# Groups per device and incidents per device in the synthetic data
+GROUPS_PER_DEVICE = 3
+INCIDENTS_PER_DEVICE = 1
+
+LEGACY_INVENTORY_SQL = """
+    SELECT hg.name, COUNT(d.device_id) as count
+    FROM host_groups hg
+    LEFT JOIN devices d ON (',' || d.host_groups || ',') LIKE ('%,' || hg.groupid || ',%')
+    GROUP BY hg.groupid, hg.name
+    HAVING count > 0
+    ORDER BY count DESC
+"""
+
+
+def populate(db: DatabaseManager, devices: int, groups: int):
+    """Load groups, devices (GROUPS_PER_DEVICE memberships each) and incidents"""
+    db.execute_update("DELETE FROM incidents")
+    db.execute_update("DELETE FROM device_host_groups")
+    db.execute_update("DELETE FROM devices")
+    db.execute_update("DELETE FROM host_groups")
+
+    HostGroupDAO(db).bulk_upsert([
+        {'groupid': str(g), 'name': f'Group {g:03d}'} for g in range(1, groups + 1)
+    ])
+    DeviceDAO(db).bulk_upsert([{
+        'device_id': f'DEV-{100000 + i}',
+        'zabbix_host_id': str(100000 + i),
+        'host_name': f'bench-host-{i:05d}',
+        'device_type': ('camera', 'server', 'network')[i % 3],
+        'host_groups': ','.join(str((i * 7 + k * 131) % groups + 1) for k in range(GROUPS_PER_DEVICE)),
+        'ngsi_ld': {'id': f'urn:ngsi-ld:Device:DEV-{100000 + i}', 'type': 'Device'}
+    } for i in range(devices)])
+
+    with db.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO incidents (
+                incident_id, camera_id, zabbix_event_id, incident_type, severity, detected_at, ngsi_ld_json
+            ) VALUES (?, ?, ?, 'camera_offline', 'high', '2026-01-01T10:00:00Z', '{}')
+        """, [
+            (f'INC-{n}', f'DEV-{100000 + n % devices}', str(n))
+            for n in range(devices * INCIDENTS_PER_DEVICE)
+        ])
+
+
+def legacy_inventory(db: DatabaseManager) -> dict:
+    """Pre-v8 publish_inventory_summary host group query"""
+    return {row['name']: row['count'] for row in db.execute_query(LEGACY_INVENTORY_SQL)}
+
+
+def legacy_analytics(db: DatabaseManager) -> dict:
+    """Pre-v8 aggregate_incidents host group count: get_by_id per incident, split in Python"""
+    device_dao = DeviceDAO(db)
+    by_host_group = Counter()
+    for incident in db.execute_query("SELECT camera_id FROM incidents"):
+        device = device_dao.get_by_id(incident['camera_id'])
+        if device and device.get('host_groups'):
+            for group_id in device['host_groups'].split(','):
+                by_host_group[group_id] += 1
+    return dict(by_host_group)
+
+
+def joined_analytics(db: DatabaseManager) -> dict:
+    """aggregate_incidents host group count over device_host_groups"""
+    rows = db.execute_query("""
+        SELECT m.groupid, COUNT(*) as count
+        FROM incidents i
+        JOIN device_host_groups m ON m.device_id = i.camera_id
+        GROUP BY m.groupid
+    """)
+    return {row['groupid']: row['count'] for row in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark host group membership queries')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--schema-db', default='/var/greengrass/database/greengrass.db',
+                        help='Database to copy the schema from (read-only)')
+    args = parser.parse_args()
+
+    path = create_benchmark_db(args.schema_db)
+    db = DatabaseManager(path)
+    device_dao = DeviceDAO(db)
+
+    print("\n" + "=" * 78)
+    print(f"  HOST GROUP COUNT BENCHMARK ({args.groups} groups, {GROUPS_PER_DEVICE} per device)")
+    print("=" * 78)
+    print(f"  {'devices':>7} | {'query':<10} | {'LIKE/split (s)':>14} | {'join table (s)':>14} | {'speedup':>8}")
+    print("-" * 78)
+
+    try:
+        for size in args.sizes:
+            populate(db, size, args.groups)
+
+            for label, legacy_fn, joined_fn in (
+                ('inventory', legacy_inventory, device_dao.get_count_by_host_group),
+                ('analytics', legacy_analytics, lambda: joined_analytics(db)),
+            ):
+                legacy_result, legacy_s = timed(legacy_fn, db)
+                joined_result, joined_s = timed(joined_fn)
+                assert legacy_result == joined_result, f"{label} counts differ for {size} devices"
+                print(f"  {size:>7} | {label:<10} | {legacy_s:>14.3f} | {joined_s:>14.3f} | "
+                      f"{legacy_s / joined_s:>7.1f}x")
+        print("=" * 78 + "\n")
+        return 0
+    finally:
+        db.close()
+        for ext in ('', '-wal', '-shm'):
+            if os.path.exists(path + ext):
+                os.remove(path + ext)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark: hourly incident analytics in Python vs SQL GROUP BY vs rollups
+Compares the previous aggregate_incidents (fetch every incident in the window,
+Counter in Python, get_by_id per incident for the device type) with
+IncidentDAO.get_summary (GROUP BY over raw incidents) and
+IncidentDAO.get_rollup_summary (pre-aggregated hour buckets), for growing
+numbers of incidents in the window
+
+Runs on a temporary database created from the deployed schema, so the
+production database is never written.
+
+Usage:
+    python3 benchmark_incident_analytics.py [--sizes 10000 100000] [--devices 5000] [--schema-db PATH]
+"""
+import sys
+import os
+import argparse
+from collections import Counter
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection import DatabaseManager
+from database.dao import IncidentDAO, EPOCH_MS_SQL
+from database.device_dao import DeviceDAO, HostGroupDAO
+from benchmark_bulk_upsert import create_benchmark_db, timed
+
+WINDOW_START = '2026-01-01T10:00:00Z'
+# Same window as Unix time [start, end) for the rollups
+WINDOW = (1767261600, 1767265200)
+# Incidents from earlier hours kept alongside the window (per window incident)
+HISTORY_RATIO = 3
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+INCIDENT_TYPES = ('camera_offline', 'high_cpu', 'disk_full')
+
+
+def populate(db: DatabaseManager, incidents: int, devices: int):
+    """Load devices in 20 host groups and incidents inside and before the window"""
+    db.execute_update("DELETE FROM incidents")
+    db.execute_update("DELETE FROM incident_rollups")
+    db.execute_update("DELETE FROM incident_rollups_host_group")
+    db.execute_update("DELETE FROM device_host_groups")
+    db.execute_update("DELETE FROM devices")
+    db.execute_update("DELETE FROM host_groups")
+
+    HostGroupDAO(db).bulk_upsert([{'groupid': str(g), 'name': f'Group {g}'} for g in range(1, 21)])
+    DeviceDAO(db).bulk_upsert([{
+        'device_id': f'DEV-{100000 + i}',
+        'zabbix_host_id': str(100000 + i),
+        'host_name': f'bench-host-{i:05d}',
+        'device_type': ('camera', 'server', 'network')[i % 3],
+        'host_groups': f'{i % 20 + 1},{(i * 7) % 20 + 1}',
+        'ngsi_ld': {'id': f'urn:ngsi-ld:Device:DEV-{100000 + i}', 'type': 'Device'}
+    } for i in range(devices)])
+
+    def rows(count: int, hour: str, offset: int):
+        for n in range(count):
+            # Skewed device distribution so top-N is meaningful; some incidents
+            # reference devices that are not in the registry
+            device = (n * n) % (devices + devices // 10)
+            detected_at = f'2026-01-01T{hour}:{(n // 60) % 60:02d}:{n % 60:02d}Z'
+            yield (
+                f'INC-{offset + n}', f'DEV-{100000 + device}', str(offset + n),
+                INCIDENT_TYPES[n % len(INCIDENT_TYPES)], SEVERITIES[n % len(SEVERITIES)],
+                detected_at, detected_at
+            )
+
+    with db.get_connection() as conn:
+        sql = f"""
+            INSERT INTO incidents (
+                incident_id, camera_id, zabbix_event_id, incident_type, severity,
+                detected_at, detected_at_ms, ngsi_ld_json
+            ) VALUES (?, ?, ?, ?, ?, ?, {EPOCH_MS_SQL.format('?')}, '{{}}')
+        """
+        conn.executemany(sql, rows(incidents * HISTORY_RATIO, '09', incidents))
+        conn.executemany(sql, rows(incidents, '10', 0))
+        IncidentDAO.apply_rollups(conn.cursor(), [
+            f'INC-{n}' for n in range(incidents * (HISTORY_RATIO + 1))
+        ])
+
+
+def legacy_summary(db: DatabaseManager, top_count: int) -> dict:
+    """Previous aggregate_incidents: rows into Python, get_by_id per incident"""
+    device_dao = DeviceDAO(db)
+    incidents = db.execute_query("""
+        SELECT camera_id, severity, incident_type FROM incidents
+        WHERE detected_at >= ?
+        ORDER BY detected_at DESC
+    """, (WINDOW_START,))
+    by_host_group = db.execute_query("""
+        SELECT m.groupid, COUNT(*) as count
+        FROM incidents i
+        JOIN device_host_groups m ON m.device_id = i.camera_id
+        WHERE i.detected_at >= ?
+        GROUP BY m.groupid
+    """, (WINDOW_START,))
+
+    by_device_type = Counter()
+    for incident in incidents:
+        device = device_dao.get_by_id(incident['camera_id'])
+        if device:
+            by_device_type[device['device_type']] += 1
+
+    return {
+        'total': len(incidents),
+        'by_severity': dict(Counter(i['severity'] for i in incidents)),
+        'by_incident_type': dict(Counter(i['incident_type'] for i in incidents)),
+        'by_device_type': dict(by_device_type),
+        'by_host_group': {row['groupid']: row['count'] for row in by_host_group},
+        'top_affected_devices': [
+            {'device_id': device_id, 'incidents': count}
+            for device_id, count in Counter(i['camera_id'] for i in incidents).most_common(top_count)
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incident analytics aggregation')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--top-count', type=int, default=10)
+    parser.add_argument('--schema-db', default='/var/greengrass/database/greengrass.db',
+                        help='Database to copy the schema from (read-only)')
+    args = parser.parse_args()
+
+    path = create_benchmark_db(args.schema_db)
+    db = DatabaseManager(path)
+    incident_dao = IncidentDAO(db)
+
+    print("\n" + "=" * 78)
+    print(f"  INCIDENT ANALYTICS BENCHMARK ({args.devices} devices, "
+          f"{HISTORY_RATIO}x history outside the window)")
+    print("=" * 78)
+    print(f"  {'incidents':>9} | {'python + N+1 (s)':>16} | {'GROUP BY (s)':>12} | "
+          f"{'rollups (s)':>11} | {'speedup':>8}")
+    print("-" * 78)
+
+    try:
+        for size in args.sizes:
+            populate(db, size, args.devices)
+            db.execute_update("ANALYZE")
+
+            legacy, legacy_s = timed(legacy_summary, db, args.top_count)
+            summary, sql_s = timed(incident_dao.get_summary, WINDOW[0] * 1000, args.top_count)
+            rollup, rollup_s = timed(incident_dao.get_rollup_summary, *WINDOW, args.top_count)
+            rollup.pop('resolved')
+
+            # Top-N order among equal counts may differ; compare the counts
+            top = lambda s: [d['incidents'] for d in s.pop('top_affected_devices')]
+            assert top(legacy) == top(summary) == top(rollup), f"top devices differ for {size} incidents"
+            assert legacy == summary == rollup, f"summaries differ for {size} incidents"
+            print(f"  {size:>9} | {legacy_s:>16.3f} | {sql_s:>12.3f} | {rollup_s:>11.4f} | "
+                  f"{legacy_s / rollup_s:>7.0f}x")
+        print("=" * 78 + "\n")
+        return 0
+    finally:
+        db.close()
+        for ext in ('', '-wal', '-shm'):
+            if os.path.exists(path + ext):
+                os.remove(path + ext)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,30 +1,43 @@
 #!/usr/bin/env python3
 """
 Test suite for Database DAO Layer
-Tests all DAO classes and NGSI-LD transformers
+Tests all DAO classes, NGSI-LD transformers and message envelopes
 """
 import sys
 import os
 import json
+import sqlite3
+import threading
+import time
 from datetime import datetime
 from uuid import uuid4
 
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from database.connection import DatabaseManager
+from database.connection import DatabaseManager, ConnectionPool
 from database.dao import (
     CameraDAO,
     IncidentDAO,
     MessageQueueDAO,
     SyncLogDAO,
-    ConfigurationDAO
+    ConfigurationDAO,
+    OUTBOX_ENABLED_KEY
 )
+from database.ingest_service import IncidentIngestService
+from database.camera_cache import CameraIdentityCache
 from utils.ngsi_ld import (
     transform_camera_to_ngsi_ld,
     transform_incident_to_ngsi_ld,
     transform_zabbix_webhook_to_incident
 )
+from utils.envelope import (
+    ENVELOPE_TYPE,
+    encode_payload,
+    pack_envelopes,
+    decode_envelope,
+    ZSTD_AVAILABLE
+)
 
 
 def log_test(message: str, status: str = "INFO"):
@@ -61,6 +74,65 @@ def test_database_connection():
         raise
 
 
+def test_connection_pool(db: DatabaseManager):
+    """Test pooled connection reuse and pool statistics"""
+    log_test("Testing connection pool...")
+
+    try:
+        before = db.pool_stats()
+
+        # Sequential checkouts should reuse the same connection
+        with db.get_connection() as conn:
+            first = id(conn)
+        with db.get_connection() as conn:
+            second = id(conn)
+        assert first == second, "Idle connection was not reused"
+        log_test(f"✅ Idle connection reused", "SUCCESS")
+
+        # Concurrent checkouts must never exceed the pool bound
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    db.execute_query("SELECT COUNT(*) as count FROM configuration")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(db.pool.max_size * 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, f"Concurrent queries failed: {errors[0] if errors else ''}"
+
+        after = db.pool_stats()
+        assert after['checkouts'] >= before['checkouts'] + 2 + 20 * len(threads), "Checkouts not counted"
+        assert after['open'] <= after['max_size'], "Pool exceeded max size"
+        assert after['in_use'] == 0, "Connections leaked after release"
+        log_test(f"✅ Pool stats: {after['checkouts']} checkouts, {after['waits']} waits, "
+                 f"{after['open']}/{after['max_size']} open", "SUCCESS")
+
+        # After close_all, a connection still checked out is closed on release
+        pool = ConnectionPool(db.db_path, max_size=2)
+        idle, busy = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        pool.close_all()
+        pool.release(busy)
+        assert pool.stats()['open'] == 0 and pool.stats()['idle'] == 0, "Connection pooled after close_all"
+        try:
+            busy.execute("SELECT 1")
+            raise AssertionError("Connection released after close_all left open")
+        except sqlite3.ProgrammingError:
+            pass
+        log_test(f"✅ Connections released after close_all are closed", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Connection pool test failed: {e}", "ERROR")
+        raise
+
+
 def test_configuration_dao(db: DatabaseManager):
     """Test ConfigurationDAO operations"""
     log_test("Testing ConfigurationDAO...")
@@ -103,7 +175,8 @@ def test_camera_dao(db: DatabaseManager):
     log_test("Testing CameraDAO...")
 
     try:
-        camera_dao = CameraDAO(db)
+        cache = CameraIdentityCache()
+        camera_dao = CameraDAO(db, cache=cache)
 
         # Create test camera
         test_camera_id = f"CAM-TEST-{uuid4().hex[:8]}"
@@ -129,6 +202,11 @@ def test_camera_dao(db: DatabaseManager):
         # Test insert
         camera_id = camera_dao.insert(test_camera)
         assert camera_id == test_camera_id, "Insert returned wrong ID"
+        device = db.execute_query(
+            "SELECT device_type, host_name FROM devices WHERE device_id = ?", (camera_id,)
+        )
+        assert device and device[0]['device_type'] == 'camera', "Camera not stored in devices"
+        assert cache.get('device_id', camera_id) is not None, "Inserted camera not cached"
         log_test(f"✅ Camera inserted: {camera_id}", "SUCCESS")
 
         # Test get by ID
@@ -160,6 +238,8 @@ def test_camera_dao(db: DatabaseManager):
 
         updated = camera_dao.get_by_id(camera_id)
         assert updated['model'] == 'Updated Model', "Batch upsert failed"
+        assert cache.get('zabbix_host_id', test_camera['zabbix_host_id'])['status'] == 'online', \
+            "Cache not updated by batch upsert"
         log_test(f"✅ Batch upsert successful", "SUCCESS")
 
         return camera_id
@@ -195,6 +275,10 @@ def test_incident_dao(db: DatabaseManager, camera_id: str):
             }, incident_id, 'site-001')
         }
 
+        # Rollup window covering this test (minute buckets)
+        window_start = int(time.time()) - 60
+        rollup_before = incident_dao.get_rollup_summary(window_start, window_start + 180)
+
         # Test insert
         inserted_id = incident_dao.insert(test_incident)
         assert inserted_id == incident_id, "Insert returned wrong ID"
@@ -224,6 +308,13 @@ def test_incident_dao(db: DatabaseManager, camera_id: str):
         assert resolved['resolved_at'] is not None, "Incident not marked as resolved"
         log_test(f"✅ Incident marked as resolved", "SUCCESS")
 
+        # Test rollups (a second resolve must not count twice)
+        incident_dao.update_resolved(incident_id, resolved_at)
+        rollup = incident_dao.get_rollup_summary(window_start, window_start + 180)
+        assert rollup['total'] == rollup_before['total'] + 1, "Insert not counted in rollups"
+        assert rollup['resolved'] == rollup_before['resolved'] + 1, "Resolve not counted once in rollups"
+        log_test(f"✅ Incident rollups updated ({rollup['total']} detected, {rollup['resolved']} resolved)", "SUCCESS")
+
         return incident_id
 
     except Exception as e:
@@ -231,6 +322,200 @@ def test_incident_dao(db: DatabaseManager, camera_id: str):
         raise
 
 
+def test_incident_ingest_service(db: DatabaseManager):
+    """Test single-transaction webhook ingest (problem, duplicate, recovery)"""
+    log_test("Testing IncidentIngestService...")
+
+    try:
+        ingest_service = IncidentIngestService(db, 'site-001')
+        incident_dao = IncidentDAO(db)
+
+        host_id = f"9{uuid4().int % 10**8}"
+        event_id = f"ZABBIX-{uuid4().hex[:8]}"
+        webhook_payload = {
+            'event_id': event_id,
+            'event_status': '1',
+            'event_severity': '4',
+            'host_id': host_id,
+            'host_name': f'test-ingest-{host_id}',
+            'host_ip': f'10.{uuid4().int % 250}.{uuid4().int % 250}.{uuid4().int % 250}'
+        }
+
+        # Problem event: camera auto-created, incident inserted, status offline
+        incident_data = transform_zabbix_webhook_to_incident(webhook_payload)
+        incident_id = f"INC-TEST-{uuid4().hex[:8]}"
+        ngsi_ld = transform_incident_to_ngsi_ld(incident_data, incident_id, 'site-001')
+        result = ingest_service.ingest_event(incident_data, incident_id, ngsi_ld, is_recovery=False)
+
+        assert result.action == 'inserted', f"Unexpected action: {result.action}"
+        assert result.camera_created, "Camera should have been created"
+        assert result.camera_status == 'offline', "Camera status not set offline"
+        assert incident_dao.get_by_zabbix_event(event_id)['incident_id'] == incident_id, "Incident not stored"
+        log_test(f"✅ Problem event ingested: {incident_id}", "SUCCESS")
+
+        # Retried problem event is idempotent
+        retry = ingest_service.ingest_event(incident_data, f"INC-TEST-{uuid4().hex[:8]}", ngsi_ld, is_recovery=False)
+        assert retry.action == 'duplicate' and retry.incident_id == incident_id, "Duplicate event re-inserted"
+        log_test(f"✅ Duplicate event ignored", "SUCCESS")
+
+        # Recovery event resolves the existing incident
+        recovery_data = transform_zabbix_webhook_to_incident({**webhook_payload, 'event_status': '0'})
+        recovery = ingest_service.ingest_event(recovery_data, f"INC-TEST-{uuid4().hex[:8]}", ngsi_ld, is_recovery=True)
+        assert recovery.action == 'resolved' and recovery.incident_id == incident_id, "Recovery not applied"
+        assert recovery.camera_status == 'online', "Camera status not set online"
+        assert incident_dao.get_by_zabbix_event(event_id)['resolved_at'] is not None, "Incident not resolved"
+        log_test(f"✅ Recovery event resolved incident", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ IncidentIngestService test failed: {e}", "ERROR")
+        raise
+
+
+def test_incident_outbox(db: DatabaseManager, camera_id: str):
+    """Test outbox messages queued with incident writes"""
+    log_test("Testing incident outbox...")
+
+    config_dao = ConfigurationDAO(db)
+    outbox_setting = config_dao.get(OUTBOX_ENABLED_KEY)
+    assert outbox_setting is not None, "outbox_enabled key missing (schema_update_v12.sql not applied)"
+
+    try:
+        incident_dao = IncidentDAO(db)
+        queue_dao = MessageQueueDAO(db)
+        ingest_service = IncidentIngestService(db, 'site-outbox')
+
+        def new_incident(severity: str) -> dict:
+            incident_id = f"INC-TEST-{uuid4().hex[:8]}"
+            detected_at = datetime.utcnow().isoformat() + 'Z'
+            data = {'camera_id': camera_id, 'incident_type': 'camera_offline',
+                    'severity': severity, 'timestamp': detected_at}
+            return {
+                'incident_id': incident_id,
+                'camera_id': camera_id,
+                'incident_type': 'camera_offline',
+                'severity': severity,
+                'detected_at': detected_at,
+                'ngsi_ld': transform_incident_to_ngsi_ld(data, incident_id, 'site-001')
+            }
+
+        def queued(message_id: str):
+            rows = db.execute_query("SELECT * FROM message_queue WHERE message_id = ?", (message_id,))
+            return rows[0] if rows else None
+
+        # Disabled: incident writes queue nothing
+        config_dao.set(OUTBOX_ENABLED_KEY, 'false')
+        incident = new_incident('high')
+        incident_dao.insert(incident)
+        assert queued(f"{incident['incident_id']}:detected") is None, "Message queued while outbox disabled"
+        log_test("✅ Nothing queued while the outbox is disabled", "SUCCESS")
+
+        # Enabled: insert and resolve each queue one message in the same write
+        config_dao.set(OUTBOX_ENABLED_KEY, 'true')
+        incident = new_incident('critical')
+        incident_id = incident['incident_id']
+        incident_dao.insert(incident)
+        detected = queued(f"{incident_id}:detected")
+        assert detected is not None, "Detection not queued"
+        assert detected['incident_id'] == incident_id and detected['priority'] == 1, "Wrong outbox message"
+        assert detected['topic'].startswith('aismc/incidents/'), f"Unexpected topic: {detected['topic']}"
+        assert json.loads(detected['payload'])['id'] == incident['ngsi_ld']['id'], "Payload is not the NGSI-LD entity"
+
+        resolved_at = datetime.utcnow().isoformat() + 'Z'
+        incident_dao.update_resolved(incident_id, resolved_at)
+        incident_dao.update_resolved(incident_id, resolved_at)
+        resolution = queued(f"{incident_id}:resolved")
+        payload = json.loads(resolution['payload'])
+        assert payload['status']['value'] == 'resolved', "Resolution payload not resolved"
+        assert payload['resolvedAt']['value'] == resolved_at, "Resolution time missing"
+        log_test("✅ Detection and resolution queued with the incident writes", "SUCCESS")
+
+        # Sending the messages marks the incident synced
+        queue_dao.mark_sent_many([f"{incident_id}:detected", f"{incident_id}:resolved"])
+        synced = db.execute_query("SELECT synced_to_cloud FROM incidents WHERE incident_id = ?", (incident_id,))
+        assert synced[0]['synced_to_cloud'] == 1, "Incident not synced after its message was sent"
+        log_test("✅ Sent outbox messages mark the incident synced", "SUCCESS")
+
+        # Ingest: a recovery without prior problem only queues the resolution
+        recovery_data = transform_zabbix_webhook_to_incident({
+            'event_id': f"ZABBIX-{uuid4().hex[:8]}",
+            'event_status': '0',
+            'event_severity': '2',
+            'host_id': f"9{uuid4().int % 10**8}",
+            'host_ip': f'10.{uuid4().int % 250}.{uuid4().int % 250}.{uuid4().int % 250}'
+        })
+        recovery_id = f"INC-TEST-{uuid4().hex[:8]}"
+        ingest_service.ingest_event(recovery_data, recovery_id,
+                                    transform_incident_to_ngsi_ld(recovery_data, recovery_id, 'site-outbox'),
+                                    is_recovery=True)
+        assert queued(f"{recovery_id}:detected") is None, "Detection queued for a resolved insert"
+        resolution = queued(f"{recovery_id}:resolved")
+        assert resolution is not None and resolution['topic'] == 'aismc/incidents/site-outbox', \
+            "Ingest resolution not queued for the service site"
+        queue_dao.mark_sent(f"{recovery_id}:resolved")
+        log_test("✅ Ingest service queues outbox messages", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Incident outbox test failed: {e}", "ERROR")
+        raise
+
+    finally:
+        config_dao.set(OUTBOX_ENABLED_KEY, outbox_setting)
+
+
+def test_camera_cache(db: DatabaseManager):
+    """Test camera identity cache (bounds, write-through from ingest)"""
+    log_test("Testing CameraIdentityCache...")
+
+    try:
+        # Lookups by every identity field, LRU size bound
+        cache = CameraIdentityCache(max_size=2, ttl=60)
+        cache.put({'camera_id': 'CAM-A', 'zabbix_host_id': '1', 'ip_address': '10.0.0.1'})
+        cache.put({'camera_id': 'CAM-B', 'zabbix_host_id': '2', 'ip_address': '10.0.0.2'})
+        assert cache.get('zabbix_host_id', '1')['device_id'] == 'CAM-A', "Host id lookup failed"
+        cache.put({'camera_id': 'CAM-C', 'zabbix_host_id': '3', 'ip_address': '10.0.0.3'})
+        assert cache.get('ip_address', '10.0.0.2') is None, "LRU entry not evicted"
+        assert cache.get('device_id', 'CAM-A') is not None, "Recently used entry evicted"
+        stats = cache.stats()
+        assert stats['size'] == 2 and stats['evictions'] == 1, f"Unexpected stats: {stats}"
+        log_test(f"✅ Cache lookups and eviction: {stats}", "SUCCESS")
+
+        # TTL expiry
+        expiring = CameraIdentityCache(ttl=0)
+        expiring.put({'camera_id': 'CAM-X', 'zabbix_host_id': '9'})
+        assert expiring.get('device_id', 'CAM-X') is None, "Expired entry returned"
+        log_test("✅ Expired entries treated as misses", "SUCCESS")
+
+        # Ingest writes through: second event for the camera needs no device lookup
+        cache = CameraIdentityCache()
+        ingest_service = IncidentIngestService(db, 'site-001', camera_cache=cache)
+        host_id = f"9{uuid4().int % 10**8}"
+        webhook_payload = {
+            'event_id': f"ZABBIX-{uuid4().hex[:8]}",
+            'event_status': '1',
+            'host_id': host_id,
+            'host_name': f'test-cache-{host_id}',
+            'host_ip': '10.254.254.254'
+        }
+        incident_data = transform_zabbix_webhook_to_incident(webhook_payload)
+        first = ingest_service.ingest_event(
+            incident_data, f"INC-TEST-{uuid4().hex[:8]}", {}, is_recovery=False
+        )
+        cached = cache.get('zabbix_host_id', host_id)
+        assert cached and cached['device_id'] == first.camera_id, "Created camera not cached"
+        assert cached['status'] == 'offline', "Cached status not updated"
+
+        hits = cache.stats()['hits']
+        recovery_data = transform_zabbix_webhook_to_incident({**webhook_payload, 'event_status': '0'})
+        ingest_service.ingest_event(recovery_data, f"INC-TEST-{uuid4().hex[:8]}", {}, is_recovery=True)
+        assert cache.stats()['hits'] > hits, "Known camera not served from cache"
+        assert cache.get('device_id', first.camera_id)['status'] == 'online', "Cached status not updated"
+        log_test(f"✅ Ingest write-through: {cache.stats()}", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ CameraIdentityCache test failed: {e}", "ERROR")
+        raise
+
+
 def test_message_queue_dao(db: DatabaseManager):
     """Test MessageQueueDAO operations"""
     log_test("Testing MessageQueueDAO...")
@@ -259,12 +544,21 @@ def test_message_queue_dao(db: DatabaseManager):
         assert any(msg['message_id'] == message_id for msg in pending), "Test message not in pending"
         log_test(f"✅ Pending messages: {len(pending)}", "SUCCESS")
 
-        # Test increment attempt
+        def queued(message_id: str):
+            rows = db.execute_query("""
+                SELECT *, scheduled_at > CURRENT_TIMESTAMP as deferred FROM message_queue WHERE message_id = ?
+            """, (message_id,))
+            return rows[0] if rows else None
+
+        # Test increment attempt: still pending, but deferred by the backoff
         queue_dao.increment_attempt(message_id, "Test error")
-        updated = [msg for msg in queue_dao.get_pending() if msg['message_id'] == message_id]
-        assert len(updated) > 0, "Message should still be pending after 1 attempt"
-        assert updated[0]['attempts'] == 1, "Attempt count not incremented"
-        log_test(f"✅ Attempt incremented", "SUCCESS")
+        updated = queued(message_id)
+        assert updated['status'] == 'pending', "Message should still be pending after 1 attempt"
+        assert updated['attempts'] == 1, "Attempt count not incremented"
+        assert updated['deferred'], "Failed message not rescheduled"
+        assert not any(msg['message_id'] == message_id for msg in queue_dao.get_pending()), \
+            "Message returned before its backoff elapsed"
+        log_test(f"✅ Attempt incremented, retry deferred to {updated['scheduled_at']}", "SUCCESS")
 
         # Test mark sent
         queue_dao.mark_sent(message_id)
@@ -272,6 +566,81 @@ def test_message_queue_dao(db: DatabaseManager):
         assert not any(msg['message_id'] == message_id for msg in pending_after), "Message still pending after mark sent"
         log_test(f"✅ Message marked as sent", "SUCCESS")
 
+        # Test mark sent (batch)
+        batch_ids = [str(uuid4()) for _ in range(3)]
+        for batch_id in batch_ids:
+            queue_dao.enqueue({**test_message, 'message_id': batch_id})
+        assert queue_dao.mark_sent_many(batch_ids) == 3, "Batch mark sent updated wrong count"
+        pending_after = queue_dao.get_pending()
+        assert not any(msg['message_id'] in batch_ids for msg in pending_after), "Batch still pending after mark sent"
+        log_test(f"✅ Batch of {len(batch_ids)} messages marked as sent", "SUCCESS")
+
+        # Test claim: a claimed message is not claimed again until released
+        claim_id = str(uuid4())
+        queue_dao.enqueue({**test_message, 'message_id': claim_id, 'priority': 0})
+        claimed = queue_dao.claim_pending(limit=1, worker_id='test-worker-1')
+        assert [msg['message_id'] for msg in claimed] == [claim_id], "Highest priority message not claimed"
+        assert claimed[0]['status'] == 'inflight', "Claimed message not inflight"
+        assert not any(msg['message_id'] == claim_id for msg in queue_dao.claim_pending(limit=100, worker_id='test-worker-2')), \
+            "Message claimed twice"
+        assert queue_dao.release([claim_id]) == 1, "Claimed message not released"
+        log_test(f"✅ Message claimed, not reclaimed while leased, released", "SUCCESS")
+
+        # Test priority lanes: a claim only takes messages in its priority range
+        routine = queue_dao.claim_pending(limit=100, worker_id='test-worker-2', min_priority=1)
+        assert not any(msg['message_id'] == claim_id for msg in routine), "Lane claimed a message outside its range"
+        queue_dao.release([msg['message_id'] for msg in routine])
+        critical = queue_dao.claim_pending(limit=100, worker_id='test-worker-1', max_priority=0)
+        assert [msg['message_id'] for msg in critical] == [claim_id], "Critical lane did not claim its message"
+        queue_dao.release([claim_id])
+        log_test(f"✅ Priority lanes claim only their range", "SUCCESS")
+
+        # Test expired lease recovery (counts an attempt)
+        db.execute_update(
+            "UPDATE message_queue SET status = 'inflight', lease_until = datetime('now', '-1 seconds') WHERE message_id = ?",
+            (claim_id,)
+        )
+        assert queue_dao.recover_expired_leases() >= 1, "Expired lease not recovered"
+        recovered = queued(claim_id)
+        assert recovered['status'] == 'pending' and recovered['attempts'] == 1, \
+            "Recovered message not pending with one attempt"
+        queue_dao.mark_sent(claim_id)
+        log_test(f"✅ Expired lease recovered", "SUCCESS")
+
+        # Test batch failure marking: messages at max attempts are dead-lettered
+        failing_ids = [str(uuid4()) for _ in range(3)]
+        for failing_id in failing_ids:
+            queue_dao.enqueue({**test_message, 'message_id': failing_id, 'max_attempts': 2})
+        failed_before = queue_dao.get_failed_count()
+        assert queue_dao.increment_attempts(failing_ids, "Uplink down") == 3, "Batch failure updated wrong count"
+        assert all(queued(failing_id)['deferred'] for failing_id in failing_ids), "Batch not rescheduled"
+        queue_dao.increment_attempts(failing_ids, "Uplink down")
+        assert not any(queued(failing_id) for failing_id in failing_ids), "Exhausted messages left in the queue"
+        assert queue_dao.get_failed_count() == failed_before + 3, "Exhausted messages not dead-lettered"
+        dead = {msg['message_id']: msg for msg in queue_dao.get_dead_letters(limit=100)}
+        assert dead[failing_ids[0]]['attempts'] == 2 and dead[failing_ids[0]]['last_error'] == "Uplink down", \
+            "Dead letter lost its attempts/error"
+        log_test(f"✅ Batch failure marked, exhausted messages dead-lettered", "SUCCESS")
+
+        # Test immediate dead-lettering (no retries left to burn)
+        poison_id = str(uuid4())
+        queue_dao.enqueue({**test_message, 'message_id': poison_id})
+        assert queue_dao.dead_letter([poison_id], "Invalid payload") == 1, "Message not dead-lettered"
+        assert not queued(poison_id), "Dead-lettered message left in the queue"
+        dead = {msg['message_id']: msg for msg in queue_dao.get_dead_letters(limit=100)}
+        assert dead[poison_id]['attempts'] == 1 and dead[poison_id]['last_error'] == "Invalid payload", \
+            "Dead letter lost its attempts/error"
+        failing_ids.append(poison_id)
+        log_test(f"✅ Message dead-lettered on its first attempt", "SUCCESS")
+
+        # Test requeue from the dead-letter table
+        assert queue_dao.requeue_dead_letters(failing_ids) == 4, "Dead letters not requeued"
+        assert queue_dao.get_failed_count() == failed_before, "Requeued messages still dead-lettered"
+        assert queued(failing_ids[0])['attempts'] == 0, "Requeued message kept its attempts"
+        assert queued(failing_ids[0])['max_attempts'] == 2, "Requeued message lost its max_attempts"
+        queue_dao.mark_sent_many(failing_ids)
+        log_test(f"✅ Dead letters requeued", "SUCCESS")
+
     except Exception as e:
         log_test(f"❌ MessageQueueDAO test failed: {e}", "ERROR")
         raise
@@ -371,6 +740,63 @@ def test_ngsi_ld_transformers():
         raise
 
 
+def test_message_envelopes():
+    """Test MQTT envelope packing and decoding"""
+    log_test("Testing message envelopes...")
+
+    try:
+        # Payloads of varying size, so groups split at different points
+        payloads = [
+            {'id': f"urn:ngsi-ld:CameraIncident:INC-{i:04d}", 'seq': i, 'detail': uuid4().hex * (1 + i % 7)}
+            for i in range(200)
+        ]
+        max_bytes = 2048
+
+        # Round trip: every payload decoded once, in order, from the message its indexes name
+        for compression in (None, 'gzip', 'zstd'):
+            if compression == 'zstd' and not ZSTD_AVAILABLE:
+                log_test("zstandard not installed - skipping zstd round trip")
+                continue
+            messages = pack_envelopes(payloads, max_bytes=max_bytes, compression=compression)
+            indexes = [index for members, _ in messages for index in members]
+            assert indexes == list(range(len(payloads))), f"Member indexes not preserved ({compression})"
+            decoded = []
+            for members, data in messages:
+                batch = decode_envelope(data)
+                assert batch == [payloads[index] for index in members], f"Members do not match message ({compression})"
+                assert len(data) <= max_bytes or len(members) == 1, \
+                    f"Message of {len(data)} bytes exceeds {max_bytes} ({compression})"
+                decoded.extend(batch)
+            assert decoded == payloads, f"Round trip changed payloads ({compression})"
+            assert len(messages) < len(payloads), f"Payloads not coalesced ({compression})"
+            log_test(f"✅ {len(payloads)} payloads round-tripped in {len(messages)} "
+                     f"{compression or 'plain'} messages", "SUCCESS")
+
+        # A payload larger than max_bytes goes out on its own, unwrapped
+        oversized = {'id': 'urn:ngsi-ld:CameraIncident:INC-BIG', 'detail': 'x' * (max_bytes * 2)}
+        messages = pack_envelopes([payloads[0], oversized, payloads[1]], max_bytes=max_bytes)
+        assert [members for members, _ in messages] == [[0], [1], [2]], "Oversized payload not sent on its own"
+        assert messages[1][1] == encode_payload(oversized), "Oversized payload wrapped"
+        log_test(f"✅ Oversized payload sent on its own", "SUCCESS")
+
+        # A plain (non-envelope) message decodes to a batch of one
+        assert decode_envelope(encode_payload(payloads[0])) == [payloads[0]], "Plain payload not decoded"
+        log_test(f"✅ Plain payload decoded", "SUCCESS")
+
+        # Unknown envelope versions are rejected
+        future = json.dumps({'type': ENVELOPE_TYPE, 'version': 99, 'count': 0, 'messages': []}).encode('utf-8')
+        try:
+            decode_envelope(future)
+            raise AssertionError("Unknown envelope version accepted")
+        except ValueError:
+            pass
+        log_test(f"✅ Unknown envelope version rejected", "SUCCESS")
+
+    except Exception as e:
+        log_test(f"❌ Message envelope test failed: {e}", "ERROR")
+        raise
+
+
 def main():
     """Run all tests"""
     print("\n" + "=" * 70)
@@ -382,30 +808,50 @@ def main():
         db = test_database_connection()
         print()
 
-        # Test 2: Configuration DAO
+        # Test 2: Connection Pool
+        test_connection_pool(db)
+        print()
+
+        # Test 3: Configuration DAO
         test_configuration_dao(db)
         print()
 
-        # Test 3: Camera DAO
+        # Test 4: Camera DAO
         camera_id = test_camera_dao(db)
         print()
 
-        # Test 4: Incident DAO
+        # Test 5: Incident DAO
         test_incident_dao(db, camera_id)
         print()
 
-        # Test 5: Message Queue DAO
+        # Test 6: Incident Ingest Service
+        test_incident_ingest_service(db)
+        print()
+
+        # Test 7: Incident Outbox
+        test_incident_outbox(db, camera_id)
+        print()
+
+        # Test 8: Camera Identity Cache
+        test_camera_cache(db)
+        print()
+
+        # Test 9: Message Queue DAO
         test_message_queue_dao(db)
         print()
 
-        # Test 6: Sync Log DAO
+        # Test 10: Sync Log DAO
         test_sync_log_dao(db)
         print()
 
-        # Test 7: NGSI-LD Transformers
+        # Test 11: NGSI-LD Transformers
         test_ngsi_ld_transformers()
         print()
 
+        # Test 12: Message Envelopes
+        test_message_envelopes()
+        print()
+
         print("=" * 70)
         log_test("✅ ALL TESTS PASSED", "SUCCESS")
         print("=" * 70 + "\n")
@@ -142,12 +142,26 @@ def main():
     count = device_dao.batch_upsert(batch_devices)
     print(f"✅ Batch upserted {count} devices")
 
+    result = device_dao.bulk_upsert(batch_devices)
+    if result == {'total': 2, 'inserted': 0, 'updated': 2}:
+        print(f"✅ Bulk upsert counted {result['inserted']} new / {result['updated']} updated")
+    else:
+        print(f"❌ Unexpected bulk upsert counts: {result}")
+
+    stats = device_dao.sync_upsert(batch_devices)
+    if stats['unchanged'] == 2 and stats['new'] + stats['updated'] == 0:
+        print(f"✅ Sync upsert skipped {stats['unchanged']} unchanged devices")
+    else:
+        print(f"❌ Unexpected sync upsert counts: {stats}")
+
     # Test 10: Get all host groups
     print("\n[TEST 10] Testing HostGroupDAO.get_all()...")
     all_groups = hostgroup_dao.get_all()
     print(f"✅ Found {len(all_groups)} host group(s)")
     for group in all_groups:
         print(f"   - {group['groupid']}: {group['name']}")
+    by_host_group = device_dao.get_count_by_host_group()
+    print(f"✅ Devices per host group: {by_host_group}")
 
     # Test 11: Update device status
     print("\n[TEST 11] Testing DeviceDAO.update_status()...")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Query plan regression tests for the DAO layer
+Runs every DAO method against a schema-only copy of the deployed database,
+records the SQL it issues and fails if a hot query needs a full table scan
+"""
+import sys
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection import DatabaseManager
+from database.dao import (
+    CameraDAO,
+    IncidentDAO,
+    MessageQueueDAO,
+    SyncLogDAO,
+    ConfigurationDAO
+)
+from database.device_dao import DeviceDAO, HostGroupDAO
+from database.ingest_service import IncidentIngestService
+from utils.ngsi_ld import transform_zabbix_webhook_to_incident
+
+# Statements whose plan is checked (INSERT ... VALUES has no scan to report)
+PLANNED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def log_test(message: str, status: str = "INFO"):
+    """Log test output with color"""
+    colors = {
+        "INFO": "\033[0;36m",     # Cyan
+        "SUCCESS": "\033[0;32m",   # Green
+        "ERROR": "\033[0;31m",     # Red
+        "RESET": "\033[0m"
+    }
+    color = colors.get(status, colors["INFO"])
+    print(f"{color}[{status}]{colors['RESET']} {message}")
+
+
+class RecordingDatabase:
+    """
+    DatabaseManager stand-in backed by an in-memory copy of the deployed schema
+
+    Exposes the same get_connection/execute_query/execute_update interface
+    the DAOs use and records every statement they execute (with bound
+    parameters expanded) so its plan can be inspected. The copy has no rows
+    and no ANALYZE statistics, so plans depend on the indexes alone.
+    """
+
+    def __init__(self, source: DatabaseManager):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.statements = []
+
+        schema = source.execute_query("""
+            SELECT type, sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 1 WHEN 'index' THEN 2 WHEN 'view' THEN 3 ELSE 4 END, rowid
+        """)
+        for obj in schema:
+            self.conn.execute(obj['sql'])
+        self.conn.commit()
+        self.conn.set_trace_callback(self.statements.append)
+
+    @contextmanager
+    def get_connection(self):
+        try:
+            yield self.conn
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def execute_query(self, query: str, params: tuple = ()) -> List[Dict]:
+        with self.get_connection() as conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def execute_update(self, query: str, params: tuple = ()) -> int:
+        with self.get_connection() as conn:
+            return conn.execute(query, params).rowcount
+
+    def explain(self, statement: str) -> List[str]:
+        """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+        self.conn.set_trace_callback(None)
+        try:
+            return [row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+        finally:
+            self.conn.set_trace_callback(self.statements.append)
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """
+    Plan steps that read a whole table (SCAN without an index)
+
+    Scans of a subquery's result (CO-ROUTINE/MATERIALIZE steps) are not
+    table scans; the subquery's own steps are checked instead.
+    """
+    subqueries = {
+        step.split()[-1] for step in plan
+        if step.startswith(('CO-ROUTINE ', 'MATERIALIZE '))
+    }
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and 'USING' not in step and 'CONSTANT ROW' not in step
+        and step.split()[1] not in subqueries
+    ]
+
+
+def build_cases(db: RecordingDatabase) -> List[tuple]:
+    """
+    Every DAO call to plan, as (name, callable, hot)
+
+    hot=False marks queries that read a whole table by design (unfiltered
+    listings and counts of small tables); they are reported, not failed.
+    """
+    camera_dao = CameraDAO(db)
+    incident_dao = IncidentDAO(db)
+    queue_dao = MessageQueueDAO(db)
+    sync_log_dao = SyncLogDAO(db)
+    config_dao = ConfigurationDAO(db)
+    device_dao = DeviceDAO(db)
+    hostgroup_dao = HostGroupDAO(db)
+    ingest_service = IncidentIngestService(db, 'site-001')
+
+    incident_data = transform_zabbix_webhook_to_incident({
+        'event_id': '90001',
+        'event_status': '1',
+        'event_severity': '4',
+        'host_id': '10770',
+        'host_name': 'IP Camera 01',
+        'host_ip': '192.168.1.11',
+        'timestamp': '2026-01-01T10:00:00Z'
+    })
+
+    device_data = {
+        'device_id': 'DEV-10771',
+        'zabbix_host_id': '10771',
+        'host_name': 'IP Camera 02',
+        'device_type': 'camera',
+        'ip_address': '192.168.1.12',
+        'ngsi_ld': {'id': 'urn:ngsi-ld:Device:DEV-10771', 'type': 'Device'}
+    }
+
+    return [
+        # Webhook hot path
+        ('IncidentIngestService.ingest_batch',
+         lambda: ingest_service.ingest_batch([(incident_data, 'INC-PLAN-1', {}, False)]), True),
+        ('IncidentIngestService.ingest_batch (recovery)',
+         lambda: ingest_service.ingest_batch([(incident_data, 'INC-PLAN-2', {}, True)]), True),
+
+        # CameraDAO (cameras VIEW over devices)
+        ('CameraDAO.get_by_id', lambda: camera_dao.get_by_id('CAM-10770'), True),
+        ('CameraDAO.get_by_zabbix_host_id', lambda: camera_dao.get_by_zabbix_host_id('10770'), True),
+        ('CameraDAO.get_all', lambda: camera_dao.get_all(), True),
+        ('CameraDAO.get_all(status)', lambda: camera_dao.get_all(status='offline'), True),
+        ('CameraDAO.update_status', lambda: camera_dao.update_status('CAM-10770', 'online'), True),
+        ('CameraDAO.get_count', lambda: camera_dao.get_count(), True),
+
+        # IncidentDAO
+        ('IncidentDAO.update_resolved',
+         lambda: incident_dao.update_resolved('INC-PLAN-1', '2026-01-01T11:00:00Z'), True),
+        ('IncidentDAO.get_pending_sync', lambda: incident_dao.get_pending_sync(limit=100), True),
+        ('IncidentDAO.mark_synced', lambda: incident_dao.mark_synced(['INC-PLAN-1', 'INC-PLAN-2']), True),
+        ('IncidentDAO.increment_retry', lambda: incident_dao.increment_retry('INC-PLAN-1', 'timeout'), True),
+        ('IncidentDAO.get_by_zabbix_event', lambda: incident_dao.get_by_zabbix_event('90001'), True),
+        ('IncidentDAO.get_recent', lambda: incident_dao.get_recent(hours=24, limit=50), True),
+        ('IncidentDAO.get_summary', lambda: incident_dao.get_summary(1767225600000, top_count=10), True),
+        ('IncidentDAO.backfill_detected_at_ms', lambda: incident_dao.backfill_detected_at_ms(), True),
+        ('IncidentDAO.cleanup_old_incidents', lambda: incident_dao.cleanup_old_incidents(days=30), True),
+        ('IncidentDAO.get_rollup_summary', lambda: incident_dao.get_rollup_summary(1767223800, 1767314100, top_count=10), True),
+        ('IncidentDAO.cleanup_old_rollups', lambda: incident_dao.cleanup_old_rollups(), True),
+
+        # MessageQueueDAO
+        ('MessageQueueDAO.get_pending', lambda: queue_dao.get_pending(limit=50), True),
+        ('MessageQueueDAO.claim_pending', lambda: queue_dao.claim_pending(limit=50, worker_id='plan'), True),
+        ('MessageQueueDAO.claim_pending(lane)',
+         lambda: queue_dao.claim_pending(limit=20, worker_id='plan', max_priority=1), True),
+        ('MessageQueueDAO.recover_expired_leases', lambda: queue_dao.recover_expired_leases(), True),
+        ('MessageQueueDAO.release', lambda: queue_dao.release(['MSG-PLAN-1', 'MSG-PLAN-2']), True),
+        ('MessageQueueDAO.mark_sent', lambda: queue_dao.mark_sent('MSG-PLAN-1'), True),
+        ('MessageQueueDAO.mark_sent_many', lambda: queue_dao.mark_sent_many(['MSG-PLAN-1', 'MSG-PLAN-2']), True),
+        ('MessageQueueDAO.increment_attempt', lambda: queue_dao.increment_attempt('MSG-PLAN-1', 'timeout'), True),
+        ('MessageQueueDAO.increment_attempts',
+         lambda: queue_dao.increment_attempts(['MSG-PLAN-1', 'MSG-PLAN-2'], 'timeout'), True),
+        ('MessageQueueDAO.get_dead_letters', lambda: queue_dao.get_dead_letters(limit=100), True),
+        ('MessageQueueDAO.requeue_dead_letters', lambda: queue_dao.requeue_dead_letters(['MSG-PLAN-1']), True),
+        ('MessageQueueDAO.cleanup_old_messages', lambda: queue_dao.cleanup_old_messages(days=7), True),
+        ('MessageQueueDAO.get_pending_count', lambda: queue_dao.get_pending_count(), True),
+        ('MessageQueueDAO.get_inflight_count', lambda: queue_dao.get_inflight_count(), True),
+        ('MessageQueueDAO.get_failed_count', lambda: queue_dao.get_failed_count(), True),
+
+        # SyncLogDAO
+        ('SyncLogDAO.get_recent', lambda: sync_log_dao.get_recent(limit=10), True),
+        ('SyncLogDAO.get_recent(sync_type)', lambda: sync_log_dao.get_recent('incident', limit=10), True),
+        ('SyncLogDAO.get_last_successful_sync', lambda: sync_log_dao.get_last_successful_sync('incident'), True),
+
+        # ConfigurationDAO
+        ('ConfigurationDAO.get', lambda: config_dao.get('site_id'), True),
+        ('ConfigurationDAO.set', lambda: config_dao.set('site_id', 'site-001'), True),
+        ('ConfigurationDAO.get_multiple', lambda: config_dao.get_multiple(['site_id', 'database_version']), True),
+        ('ConfigurationDAO.get_all', lambda: config_dao.get_all(), False),
+
+        # DeviceDAO
+        ('DeviceDAO.get_by_id', lambda: device_dao.get_by_id('CAM-10770'), True),
+        ('DeviceDAO.get_by_zabbix_host_id', lambda: device_dao.get_by_zabbix_host_id('10770'), True),
+        ('DeviceDAO.get_by_type', lambda: device_dao.get_by_type('camera'), True),
+        ('DeviceDAO.get_all', lambda: device_dao.get_all(), False),
+        ('DeviceDAO.update_status', lambda: device_dao.update_status('CAM-10770', 'online', 1), True),
+        ('DeviceDAO.get_count(device_type)', lambda: device_dao.get_count('camera'), True),
+        ('DeviceDAO.get_count', lambda: device_dao.get_count(), False),
+        ('DeviceDAO.get_modified_since', lambda: device_dao.get_modified_since(1767225600), True),
+        ('DeviceDAO.mark_as_deleted', lambda: device_dao.mark_as_deleted(['CAM-10770']), True),
+        ('DeviceDAO.bulk_upsert', lambda: device_dao.bulk_upsert([device_data]), True),
+        ('DeviceDAO.get_content_hashes', lambda: device_dao.get_content_hashes(), False),
+        ('DeviceDAO.get_count_by_host_group', lambda: device_dao.get_count_by_host_group(), False),
+        ('DeviceDAO.get_count_by_type', lambda: device_dao.get_count_by_type(), False),
+        ('DeviceDAO.get_count_by_status', lambda: device_dao.get_count_by_status(), False),
+
+        # HostGroupDAO
+        ('HostGroupDAO.get_by_id', lambda: hostgroup_dao.get_by_id('1'), True),
+        ('HostGroupDAO.get_by_name', lambda: hostgroup_dao.get_by_name('Cameras'), True),
+        ('HostGroupDAO.get_all', lambda: hostgroup_dao.get_all(), False),
+        ('HostGroupDAO.get_count', lambda: hostgroup_dao.get_count(), False),
+    ]
+
+
+def test_query_plans(db: RecordingDatabase) -> int:
+    """
+    Plan every statement issued by each DAO call
+
+    Returns:
+        Number of hot queries that fell back to a full table scan
+    """
+    log_test("Planning DAO queries...")
+    failures = 0
+
+    for name, call, hot in build_cases(db):
+        db.statements.clear()
+        try:
+            call()
+        except sqlite3.Error as e:
+            failures += 1
+            log_test(f"❌ {name}: {e}", "ERROR")
+            continue
+        statements = [s for s in db.statements if s.lstrip().upper().startswith(PLANNED_PREFIXES)]
+        assert statements, f"{name} issued no plannable statement"
+
+        for statement in statements:
+            plan = db.explain(statement)
+            scans = full_scans(plan)
+            sql = ' '.join(statement.split())[:90]
+            if scans and hot:
+                failures += 1
+                log_test(f"❌ {name}: full table scan ({'; '.join(scans)})\n         {sql}", "ERROR")
+            elif scans:
+                log_test(f"⚠️  {name}: full scan allowed ({'; '.join(scans)})", "INFO")
+            else:
+                log_test(f"✅ {name}: {' | '.join(plan)}", "SUCCESS")
+
+    return failures
+
+
+def test_schema_version(source: DatabaseManager):
+    """Hot-query indexes arrive with schema v4"""
+    versions = [row['schema_version'] for row in source.execute_query("SELECT schema_version FROM _metadata")]
+    assert '4.0.0' in versions, f"schema_update_v4.sql not applied (versions: {json.dumps(versions)})"
+    log_test("✅ Schema v4 indexes applied", "SUCCESS")
+
+
+def main():
+    """Run query plan tests"""
+    print("\n" + "=" * 70)
+    print("  DAO QUERY PLAN TEST SUITE")
+    print("=" * 70 + "\n")
+
+    try:
+        # Test 1: Schema version
+        source = DatabaseManager()
+        test_schema_version(source)
+        print()
+
+        # Test 2: Query plans on a schema-only copy
+        failures = test_query_plans(RecordingDatabase(source))
+        print()
+
+        assert failures == 0, f"{failures} hot queries use a full table scan"
+
+        print("=" * 70)
+        log_test("✅ ALL QUERY PLANS USE INDEXES", "SUCCESS")
+        print("=" * 70 + "\n")
+        return 0
+
+    except Exception as e:
+        print("\n" + "=" * 70)
+        log_test(f"❌ QUERY PLAN TESTS FAILED: {e}", "ERROR")
+        print("=" * 70 + "\n")
+        return 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
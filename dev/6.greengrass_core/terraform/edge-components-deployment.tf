@@ -55,8 +55,21 @@ resource "local_file" "edge_components_deployment_v2" {
             enabled = "false"  # DISABLED in v2.0
             site_id = "site-001"
             poll_interval = 10
-            batch_size = 10
-            max_retries = 5
+            min_poll_interval = 1
+            batch_size = 100
+            max_in_flight = 20
+            envelope = "off"
+            envelope_max_bytes = 5120
+            workers = 1
+            lease_seconds = 60
+            shadow_debounce = 2
+            shadow_max_dirty = 100
+            breaker_threshold = 5
+            breaker_probe_interval = 30
+            critical_max_priority = 1
+            critical_batch_size = 20
+            critical_max_in_flight = 5
+            critical_poll_interval = 1
             log_level = "INFO"
           })
         }
@@ -107,6 +107,57 @@ resource "null_resource" "deploy_database_device_dao" {
   }
 }
 
+resource "null_resource" "deploy_database_ingest_service" {
+  triggers = {
+    file_md5 = filemd5("${local.edge_database_source}/database/ingest_service.py")
+  }
+
+  depends_on = [null_resource.create_dao_directories]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      sudo cp ${local.edge_database_source}/database/ingest_service.py ${local.dao_database_path}/ingest_service.py
+      sudo chown ggc_user:ggc_group ${local.dao_database_path}/ingest_service.py
+      sudo chmod 644 ${local.dao_database_path}/ingest_service.py
+      echo "✅ Deployed database/ingest_service.py"
+    EOT
+  }
+}
+
+resource "null_resource" "deploy_database_camera_cache" {
+  triggers = {
+    file_md5 = filemd5("${local.edge_database_source}/database/camera_cache.py")
+  }
+
+  depends_on = [null_resource.create_dao_directories]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      sudo cp ${local.edge_database_source}/database/camera_cache.py ${local.dao_database_path}/camera_cache.py
+      sudo chown ggc_user:ggc_group ${local.dao_database_path}/camera_cache.py
+      sudo chmod 644 ${local.dao_database_path}/camera_cache.py
+      echo "✅ Deployed database/camera_cache.py"
+    EOT
+  }
+}
+
+resource "null_resource" "deploy_database_change_watcher" {
+  triggers = {
+    file_md5 = filemd5("${local.edge_database_source}/database/change_watcher.py")
+  }
+
+  depends_on = [null_resource.create_dao_directories]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      sudo cp ${local.edge_database_source}/database/change_watcher.py ${local.dao_database_path}/change_watcher.py
+      sudo chown ggc_user:ggc_group ${local.dao_database_path}/change_watcher.py
+      sudo chmod 644 ${local.dao_database_path}/change_watcher.py
+      echo "✅ Deployed database/change_watcher.py"
+    EOT
+  }
+}
+
 # ============================================================================
 # Deploy Utils Package Files
 # ============================================================================
@@ -145,6 +196,23 @@ resource "null_resource" "deploy_utils_ngsi_ld" {
   }
 }
 
+resource "null_resource" "deploy_utils_envelope" {
+  triggers = {
+    file_md5 = filemd5("${local.edge_database_source}/utils/envelope.py")
+  }
+
+  depends_on = [null_resource.create_dao_directories]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      sudo cp ${local.edge_database_source}/utils/envelope.py ${local.dao_utils_path}/envelope.py
+      sudo chown ggc_user:ggc_group ${local.dao_utils_path}/envelope.py
+      sudo chmod 644 ${local.dao_utils_path}/envelope.py
+      echo "✅ Deployed utils/envelope.py"
+    EOT
+  }
+}
+
 # ============================================================================
 # Apply Database Schema Updates
 # ============================================================================
@@ -168,6 +236,208 @@ resource "null_resource" "apply_schema_update_v3" {
   }
 }
 
+resource "null_resource" "apply_schema_update_v4" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v4.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v3]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v4 (hot query indexes)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v4.sql
+      echo "✅ Schema update v4 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v5" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v5.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v4]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v5 (device content hash)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v5.sql
+      echo "✅ Schema update v5 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v6" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v6.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v5]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v6 (sync log details)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v6.sql
+      echo "✅ Schema update v6 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v7" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v7.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v6]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v7 (host sync state)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v7.sql
+      echo "✅ Schema update v7 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v8" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v8.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v7]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v8 (device_host_groups join table)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v8.sql
+      echo "✅ Schema update v8 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v9" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v9.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v8]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v9 (incident analytics rollups)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v9.sql
+      echo "✅ Schema update v9 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v10" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v10.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v9]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v10 (incidents.detected_at_ms)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v10.sql
+      echo "✅ Schema update v10 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v11" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v11.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v10]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v11 (message_queue leases)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v11.sql
+      echo "✅ Schema update v11 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v12" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v12.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v11]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v12 (incident outbox)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v12.sql
+      echo "✅ Schema update v12 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v13" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v13.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v12]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v13 (message dead-letter table)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v13.sql
+      echo "✅ Schema update v13 applied successfully"
+    EOT
+  }
+}
+
+resource "null_resource" "apply_schema_update_v14" {
+  triggers = {
+    schema_md5 = filemd5("${path.module}/../edge-database/schema/schema_update_v14.sql")
+  }
+
+  depends_on = [null_resource.apply_schema_update_v13]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Applying schema update v14 (dead-letter max_attempts)..."
+      sudo sqlite3 /var/greengrass/database/greengrass.db < ${path.module}/../edge-database/schema/schema_update_v14.sql
+      echo "✅ Schema update v14 applied successfully"
+    EOT
+  }
+}
+
+# Backfill incidents.detected_at_ms in short transactions (webhook keeps writing)
+resource "null_resource" "backfill_incidents_detected_at_ms" {
+  triggers = {
+    schema_update = null_resource.apply_schema_update_v10.id
+  }
+
+  depends_on = [
+    null_resource.apply_schema_update_v10,
+    null_resource.deploy_database_init,
+    null_resource.deploy_database_connection,
+    null_resource.deploy_database_dao,
+    null_resource.deploy_database_device_dao,
+    null_resource.deploy_database_ingest_service,
+    null_resource.deploy_database_camera_cache,
+    null_resource.deploy_database_change_watcher
+  ]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      echo "Backfilling incidents.detected_at_ms..."
+      sudo python3 -c "import sys; sys.path.insert(0, '${local.dao_base_path}'); from database import DatabaseManager, IncidentDAO; print(IncidentDAO(DatabaseManager()).backfill_detected_at_ms(), 'incidents backfilled')"
+      echo "✅ detected_at_ms backfill complete"
+    EOT
+  }
+}
+
 # ============================================================================
 # Deploy Verification Script
 # ============================================================================
@@ -182,9 +452,25 @@ resource "null_resource" "deploy_verification_script" {
     null_resource.deploy_database_connection,
     null_resource.deploy_database_dao,
     null_resource.deploy_database_device_dao,
+    null_resource.deploy_database_ingest_service,
+    null_resource.deploy_database_camera_cache,
+    null_resource.deploy_database_change_watcher,
     null_resource.deploy_utils_init,
     null_resource.deploy_utils_ngsi_ld,
-    null_resource.apply_schema_update_v3
+    null_resource.deploy_utils_envelope,
+    null_resource.apply_schema_update_v3,
+    null_resource.apply_schema_update_v4,
+    null_resource.apply_schema_update_v5,
+    null_resource.apply_schema_update_v6,
+    null_resource.apply_schema_update_v7,
+    null_resource.apply_schema_update_v8,
+    null_resource.apply_schema_update_v9,
+    null_resource.apply_schema_update_v10,
+    null_resource.apply_schema_update_v11,
+    null_resource.apply_schema_update_v12,
+    null_resource.apply_schema_update_v13,
+    null_resource.apply_schema_update_v14,
+    null_resource.backfill_incidents_detected_at_ms
   ]
 
   provisioner "local-exec" {
@@ -232,14 +518,29 @@ output "deployed_files" {
       "${local.dao_database_path}/__init__.py",
       "${local.dao_database_path}/connection.py",
       "${local.dao_database_path}/dao.py",
-      "${local.dao_database_path}/device_dao.py"
+      "${local.dao_database_path}/device_dao.py",
+      "${local.dao_database_path}/ingest_service.py",
+      "${local.dao_database_path}/camera_cache.py",
+      "${local.dao_database_path}/change_watcher.py"
     ]
     utils_package = [
       "${local.dao_utils_path}/__init__.py",
-      "${local.dao_utils_path}/ngsi_ld.py"
+      "${local.dao_utils_path}/ngsi_ld.py",
+      "${local.dao_utils_path}/envelope.py"
     ]
     schema_updates = [
-      "schema_update_v3.sql (applied)"
+      "schema_update_v3.sql (applied)",
+      "schema_update_v4.sql (applied)",
+      "schema_update_v5.sql (applied)",
+      "schema_update_v6.sql (applied)",
+      "schema_update_v7.sql (applied)",
+      "schema_update_v8.sql (applied)",
+      "schema_update_v9.sql (applied)",
+      "schema_update_v10.sql (applied)",
+      "schema_update_v11.sql (applied)",
+      "schema_update_v12.sql (applied)",
+      "schema_update_v13.sql (applied)",
+      "schema_update_v14.sql (applied)"
     ]
   }
 }
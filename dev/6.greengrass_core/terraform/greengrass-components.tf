@@ -728,8 +728,8 @@ output "incident_forwarder_status" {
     component_version = "1.0.0"
     mqtt_topic        = "aismc/incidents/site-001"
     poll_interval     = 10
-    batch_size        = 10
-    max_retries       = 5
+    batch_size        = 100
+    max_in_flight     = 20
     artifacts_path    = "${local.artifacts_path}/com.aismc.IncidentMessageForwarder/1.0.0"
     recipe_path       = "${local.recipes_path}/com.aismc.IncidentMessageForwarder-1.0.0.yaml"
   }
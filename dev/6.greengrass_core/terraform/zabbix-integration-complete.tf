@@ -15,8 +15,9 @@
 
 locals {
   # Webhook source paths (from edge-components)
-  webhook_src_path = "${local.edge_components_path}/zabbix-event-subscriber/src/webhook_server.py"
-  dao_src_path     = "${local.edge_components_path}/python-dao/dao.py"
+  webhook_src_path      = "${local.edge_components_path}/zabbix-event-subscriber/src/webhook_server.py"
+  ingest_queue_src_path = "${local.edge_components_path}/zabbix-event-subscriber/src/ingest_queue.py"
+  dao_src_path          = "${local.edge_components_path}/python-dao/dao.py"
 
   # Webhook deployment paths
   webhook_deploy_path = "/greengrass/v2/components/artifacts/com.aismc.ZabbixEventSubscriber/1.0.0"
@@ -93,6 +94,7 @@ resource "null_resource" "deploy_webhook_handler_fixes" {
   # Trigger redeployment when source files change
   triggers = {
     webhook_server_md5 = filemd5(local.webhook_src_path)
+    ingest_queue_md5   = filemd5(local.ingest_queue_src_path)
     dao_md5            = filemd5(local.dao_src_path)
   }
 
@@ -121,6 +123,13 @@ resource "null_resource" "deploy_webhook_handler_fixes" {
       sudo chmod 644 ${local.webhook_deploy_path}/webhook_server.py
       echo "    ✅ webhook_server.py deployed"
 
+      # Deploy ingest_queue.py (async ingest writer imported by webhook_server.py)
+      echo "  - Deploying ingest_queue.py (async ingest writer)..."
+      sudo cp ${local.ingest_queue_src_path} ${local.webhook_deploy_path}/ingest_queue.py
+      sudo chown ggc_user:ggc_group ${local.webhook_deploy_path}/ingest_queue.py
+      sudo chmod 644 ${local.webhook_deploy_path}/ingest_queue.py
+      echo "    ✅ ingest_queue.py deployed"
+
       # Deploy updated dao.py
       echo "  - Deploying dao.py (optional ngsi_ld field)..."
       sudo cp ${local.dao_src_path} ${local.dao_deploy_path}/dao.py